@@ -21,10 +21,11 @@
 
 from __future__ import absolute_import, division, print_function, with_statement
 
+import collections
 import re
 
-from tornado.concurrent import Future
-from tornado.escape import native_str, utf8
+from tornado.concurrent import Future, chain_future
+from tornado.escape import utf8
 from tornado import gen
 from tornado import httputil
 from tornado import iostream
@@ -60,7 +61,10 @@ class HTTP1ConnectionParameters(object):
     """
     def __init__(self, no_keep_alive=False, chunk_size=None,
                  max_header_size=None, header_timeout=None, max_body_size=None,
-                 body_timeout=None, decompress=False):
+                 body_timeout=None, decompress=False,
+                 write_high_water=None, write_low_water=None,
+                 write_cork_threshold=None, lazy_headers=False,
+                 pipeline_depth=None):
         """
         :arg bool no_keep_alive: If true, always close the connection after
             one request.
@@ -71,6 +75,22 @@ class HTTP1ConnectionParameters(object):
         :arg float body_timeout: how long to wait while reading body (seconds)
         :arg bool decompress: if true, decode incoming
             ``Content-Encoding: gzip``
+        :arg int write_high_water: if set, the stream's write watermarks
+            (see `.BaseIOStream.set_write_watermarks`); the futures returned
+            by ``write`` then resolve as soon as the stream can take more
+            data instead of when everything has been written
+        :arg int write_low_water: the low write watermark
+        :arg int write_cork_threshold: if set, cork the stream's writes
+            (see `.BaseIOStream.set_write_cork`) so that the headers and
+            body of a response are sent together
+        :arg bool lazy_headers: if true, incoming headers are a
+            `.LazyHTTPHeaders`, which only decodes the headers that are
+            looked up
+        :arg int pipeline_depth: if greater than 1, `.HTTP1ServerConnection`
+            reads and dispatches up to this many pipelined requests from a
+            connection before their responses have been sent, instead of
+            one at a time.  Responses are still sent in the order of the
+            requests.
         """
         self.no_keep_alive = no_keep_alive
         self.chunk_size = chunk_size or 65536
@@ -79,6 +99,11 @@ class HTTP1ConnectionParameters(object):
         self.max_body_size = max_body_size
         self.body_timeout = body_timeout
         self.decompress = decompress
+        self.write_high_water = write_high_water
+        self.write_low_water = write_low_water
+        self.write_cork_threshold = write_cork_threshold
+        self.lazy_headers = lazy_headers
+        self.pipeline_depth = pipeline_depth
 
 
 class HTTP1Connection(httputil.HTTPConnection):
@@ -107,6 +132,16 @@ class HTTP1Connection(httputil.HTTPConnection):
         self._max_body_size = (self.params.max_body_size or
                                self.stream.max_buffer_size)
         self._body_timeout = self.params.body_timeout
+        if self.params.write_high_water is not None:
+            self.stream.set_write_watermarks(self.params.write_high_water,
+                                             self.params.write_low_water)
+        if self.params.write_cork_threshold is not None:
+            self.stream.set_write_cork(self.params.write_cork_threshold)
+        # True for the requests of a pipelining HTTP1ServerConnection:
+        # read_response returns once the request has been read, and the
+        # stream's close callback belongs to the server connection.
+        self._pipelined = (not is_client and
+                           (params.pipeline_depth or 1) > 1)
         # _write_finished is set to True when finish() has been called,
         # i.e. there will be no more data sent.  Data may still be in the
         # stream's write buffer.
@@ -134,6 +169,10 @@ class HTTP1Connection(httputil.HTTPConnection):
         self._expected_content_remaining = None
         # A Future for our outgoing writes, returned by IOStream.write.
         self._pending_write = None
+        # While the previous pipelined response is being sent, our
+        # writes are held here (see _hold_writes_until).
+        self._write_gate = None
+        self._held_writes = None
 
     def read_response(self, delegate):
         """Read a single HTTP response.
@@ -181,6 +220,12 @@ class HTTP1Connection(httputil.HTTPConnection):
             self._disconnect_on_finish = not self._can_keep_alive(
                 start_line, headers)
             need_delegate_close = True
+            if self._write_gate is not None and "Upgrade" in headers:
+                # Whatever takes over the stream must not do so before
+                # the responses to earlier requests have been sent.
+                # (HTTP1ServerConnection doesn't read past this request
+                # until it is done.)
+                yield self._write_gate
             with _ExceptionLoggingContext(app_log):
                 header_future = delegate.headers_received(start_line, headers)
                 if header_future is not None:
@@ -213,7 +258,7 @@ class HTTP1Connection(httputil.HTTPConnection):
             else:
                 if (headers.get("Expect") == "100-continue" and
                         not self._write_finished):
-                    self.stream.write(b"HTTP/1.1 100 (Continue)\r\n\r\n")
+                    self._stream_write(b"HTTP/1.1 100 (Continue)\r\n\r\n")
             if not skip_body:
                 body_future = self._read_body(
                     start_line.code if self.is_client else 0, headers, delegate)
@@ -238,8 +283,11 @@ class HTTP1Connection(httputil.HTTPConnection):
                     delegate.finish()
             # If we're waiting for the application to produce an asynchronous
             # response, and we're not detached, register a close callback
-            # on the stream (we didn't need one while we were reading)
+            # on the stream (we didn't need one while we were reading).
+            # Pipelined requests don't wait: the server connection goes on
+            # to read the next one.
             if (not self._finish_future.done() and
+                    not self._pipelined and
                     self.stream is not None and
                     not self.stream.closed()):
                 self.stream.set_close_callback(self._on_connection_close)
@@ -248,6 +296,9 @@ class HTTP1Connection(httputil.HTTPConnection):
                 self.close()
             if self.stream is None:
                 raise gen.Return(False)
+            if self._pipelined and self._disconnect_on_finish:
+                # Don't read past a request that ends the connection.
+                raise gen.Return(False)
         except httputil.HTTPInputError as e:
             gen_log.info("Malformed HTTP message from %s: %s",
                          self.context, e)
@@ -257,7 +308,12 @@ class HTTP1Connection(httputil.HTTPConnection):
             if need_delegate_close:
                 with _ExceptionLoggingContext(app_log):
                     delegate.on_connection_close()
-            self._clear_callbacks()
+            # The response to a pipelined request that has been
+            # dispatched may still be using the callbacks;
+            # _finish_request clears them once it has been sent.
+            if (not self._pipelined or need_delegate_close or
+                    self._finish_future.done()):
+                self._clear_callbacks()
         raise gen.Return(True)
 
     def _clear_callbacks(self):
@@ -269,7 +325,7 @@ class HTTP1Connection(httputil.HTTPConnection):
         self._write_callback = None
         self._write_future = None
         self._close_callback = None
-        if self.stream is not None:
+        if self.stream is not None and not self._pipelined:
             self.stream.set_close_callback(None)
 
     def set_close_callback(self, callback):
@@ -310,6 +366,9 @@ class HTTP1Connection(httputil.HTTPConnection):
         self._clear_callbacks()
         stream = self.stream
         self.stream = None
+        if self._pipelined:
+            # Drop the server connection's close callback.
+            stream.set_close_callback(None)
         if not self._finish_future.done():
             self._finish_future.set_result(None)
         return stream
@@ -389,18 +448,22 @@ class HTTP1Connection(httputil.HTTPConnection):
             data = b"\r\n".join(lines) + b"\r\n\r\n"
             if chunk:
                 data += self._format_chunk(chunk)
-            self._pending_write = self.stream.write(data)
-            self._pending_write.add_done_callback(self._on_write_complete)
+            self._pending_write = self._stream_write(data)
+            self._flow_control(self._pending_write).add_done_callback(
+                self._on_write_complete)
         return future
 
-    def _format_chunk(self, chunk):
+    def _check_content_remaining(self, length):
         if self._expected_content_remaining is not None:
-            self._expected_content_remaining -= len(chunk)
+            self._expected_content_remaining -= length
             if self._expected_content_remaining < 0:
                 # Close the stream now to stop further framing errors.
                 self.stream.close()
                 raise httputil.HTTPOutputError(
                     "Tried to write more data than Content-Length")
+
+    def _format_chunk(self, chunk):
+        self._check_content_remaining(len(chunk))
         if self._chunking_output and chunk:
             # Don't write out empty chunks because that means END-OF-STREAM
             # with chunked encoding
@@ -425,7 +488,41 @@ class HTTP1Connection(httputil.HTTPConnection):
                 self._write_callback = stack_context.wrap(callback)
             else:
                 future = self._write_future = Future()
-            self._pending_write = self.stream.write(self._format_chunk(chunk))
+            self._pending_write = self._stream_write(self._format_chunk(chunk))
+            self._flow_control(self._pending_write).add_done_callback(
+                self._on_write_complete)
+        return future
+
+    def write_file(self, fileobj, offset, count, callback=None):
+        """Writes ``count`` bytes of ``fileobj`` starting at ``offset``
+        as body data.
+
+        Like `write`, but uses `.BaseIOStream.write_file` so the file's
+        contents can be sent without being read into Python.
+
+        .. versionadded:: 4.3
+        """
+        future = None
+        if self.stream.closed():
+            future = self._write_future = Future()
+            self._write_future.set_exception(iostream.StreamClosedError())
+            self._write_future.exception()
+        else:
+            if callback is not None:
+                self._write_callback = stack_context.wrap(callback)
+            else:
+                future = self._write_future = Future()
+            self._check_content_remaining(count)
+            chunking = self._chunking_output and count
+            if chunking:
+                self._stream_write(utf8("%x" % count) + b"\r\n")
+            self._pending_write = self._stream_write_file(fileobj, offset,
+                                                          count)
+            if chunking:
+                self._pending_write = self._stream_write(b"\r\n")
+            # No write watermarks here: the stream reads from fileobj
+            # until the file has been sent, so the caller must not get
+            # to close it before then.
             self._pending_write.add_done_callback(self._on_write_complete)
         return future
 
@@ -440,7 +537,7 @@ class HTTP1Connection(httputil.HTTPConnection):
                 self._expected_content_remaining)
         if self._chunking_output:
             if not self.stream.closed():
-                self._pending_write = self.stream.write(b"0\r\n\r\n")
+                self._pending_write = self._stream_write(b"0\r\n\r\n")
                 self._pending_write.add_done_callback(self._on_write_complete)
         self._write_finished = True
         # If the app finished the request while we're still reading,
@@ -452,11 +549,64 @@ class HTTP1Connection(httputil.HTTPConnection):
             self._disconnect_on_finish = True
         # No more data is coming, so instruct TCP to send any remaining
         # data immediately instead of waiting for a full packet or ack.
-        self.stream.set_nodelay(True)
-        if self._pending_write is None:
-            self._finish_request(None)
-        else:
+        # (Held writes do this when they are released.)
+        if self._held_writes is None:
+            self.stream.set_nodelay(True)
+        if self._pending_write is not None:
             self._pending_write.add_done_callback(self._finish_request)
+        elif self._held_writes is not None:
+            self._write_gate.add_done_callback(self._finish_request)
+        else:
+            self._finish_request(None)
+
+    def _hold_writes_until(self, future):
+        """Holds back writes to the stream until ``future`` resolves.
+
+        Used by `HTTP1ServerConnection` so that the responses to pipelined
+        requests are sent in order: ``future`` is the previous request's
+        ``_finish_future``.
+        """
+        self._write_gate = future
+        self._held_writes = []
+        self.stream.io_loop.add_future(future, self._release_writes)
+
+    def _release_writes(self, future):
+        held = self._held_writes
+        self._held_writes = None
+        for method, args, write_future in held:
+            if self.stream is None or self.stream.closed():
+                write_future.set_exception(iostream.StreamClosedError())
+                write_future.exception()
+            else:
+                chain_future(method(*args), write_future)
+        if (self._write_finished and self.stream is not None and
+                not self.stream.closed()):
+            self.stream.set_nodelay(True)
+
+    def _stream_write(self, data):
+        if self._held_writes is None:
+            return self.stream.write(data)
+        future = Future()
+        self._held_writes.append((self.stream.write, (data,), future))
+        return future
+
+    def _stream_write_file(self, fileobj, offset, count):
+        if self._held_writes is None:
+            return self.stream.write_file(fileobj, offset, count)
+        future = Future()
+        self._held_writes.append((self.stream.write_file,
+                                  (fileobj, offset, count), future))
+        return future
+
+    def _flow_control(self, write_future):
+        # With write watermarks the writer may go on as soon as the
+        # stream is below its high watermark (or has drained to the low
+        # one) rather than waiting for every byte to be sent.
+        # Held writes wait for the stream, as they have not reached it.
+        if (self.params.write_high_water is None or
+                self._held_writes is not None):
+            return write_future
+        return self.stream.wait_for_drain()
 
     def _on_write_complete(self, future):
         exc = future.exception()
@@ -497,21 +647,13 @@ class HTTP1Connection(httputil.HTTPConnection):
             self._finish_future.set_result(None)
 
     def _parse_headers(self, data):
-        # The lstrip removes newlines that some implementations sometimes
-        # insert between messages of a reused connection.  Per RFC 7230,
-        # we SHOULD ignore at least one empty line before the request.
+        # parse_header_block skips the newlines that some implementations
+        # sometimes insert between messages of a reused connection.  Per
+        # RFC 7230, we SHOULD ignore at least one empty line before the
+        # request.
         # http://tools.ietf.org/html/rfc7230#section-3.5
-        data = native_str(data.decode('latin1')).lstrip("\r\n")
-        # RFC 7230 section allows for both CRLF and bare LF.
-        eol = data.find("\n")
-        start_line = data[:eol].rstrip("\r")
-        try:
-            headers = httputil.HTTPHeaders.parse(data[eol:])
-        except ValueError:
-            # probably form split() if there was no ':' in the line
-            raise httputil.HTTPInputError("Malformed HTTP headers: %r" %
-                                          data[eol:100])
-        return start_line, headers
+        return httputil.parse_header_block(data,
+                                           lazy=self.params.lazy_headers)
 
     def _read_body(self, code, headers, delegate):
         if "Content-Length" in headers:
@@ -656,6 +798,9 @@ class HTTP1ServerConnection(object):
         self.params = params
         self.context = context
         self._serving_future = None
+        # The requests that have been read but whose responses have not
+        # been sent yet, oldest first (only when pipelining).
+        self._pipeline = collections.deque()
 
     @gen.coroutine
     def close(self):
@@ -684,10 +829,21 @@ class HTTP1ServerConnection(object):
 
     @gen.coroutine
     def _server_request_loop(self, delegate):
+        depth = self.params.pipeline_depth or 1
+        pipeline = self._pipeline
+        if depth > 1:
+            self.stream.set_close_callback(self._on_pipeline_close)
         try:
             while True:
+                while pipeline and pipeline[0]._finish_future.done():
+                    pipeline.popleft()
+                if len(pipeline) >= depth:
+                    yield pipeline[0]._finish_future
+                    continue
                 conn = HTTP1Connection(self.stream, False,
                                        self.params, self.context)
+                if pipeline:
+                    conn._hold_writes_until(pipeline[-1]._finish_future)
                 request_delegate = delegate.start_request(self, conn)
                 try:
                     ret = yield conn.read_response(request_delegate)
@@ -702,8 +858,28 @@ class HTTP1ServerConnection(object):
                     gen_log.error("Uncaught exception", exc_info=True)
                     conn.close()
                     return
+                if not conn._finish_future.done():
+                    pipeline.append(conn)
+                    if ret and "Upgrade" in conn._request_headers:
+                        # The handler may take over the stream (see
+                        # HTTP1Connection.detach), so read nothing more
+                        # until it is done.
+                        yield conn._finish_future
+                        if conn.stream is None:
+                            return
                 if not ret:
+                    if self.stream.closed():
+                        self._on_pipeline_close()
+                    else:
+                        # Let the responses to earlier requests be sent.
+                        yield [c._finish_future for c in pipeline]
                     return
                 yield gen.moment
         finally:
             delegate.on_close(self)
+
+    def _on_pipeline_close(self):
+        # The stream's close callback while pipelining: tell every
+        # request still waiting for its response.
+        for conn in list(self._pipeline):
+            conn._on_connection_close()
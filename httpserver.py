@@ -124,6 +124,18 @@ class HTTPServer(TCPServer, Configurable,
 
     .. versionchanged:: 4.2
        `HTTPServer` is now a subclass of `tornado.util.Configurable`.
+
+    .. versionchanged:: 4.3
+       Added ``write_high_water`` and ``write_low_water`` arguments to
+       limit how much response data is buffered for slow clients (see
+       `.BaseIOStream.set_write_watermarks`).  With them set, the futures
+       returned by `.RequestHandler.flush` resolve once the connection
+       can take more data.  Added ``write_cork_threshold`` to send the
+       writes made for a response in one go (see
+       `.BaseIOStream.set_write_cork`).  Added ``lazy_headers`` to
+       decode request headers only when they are used (see
+       `.LazyHTTPHeaders`).  Added ``pipeline_depth`` to handle up to
+       that many pipelined requests on a connection at once.
     """
     def __init__(self, *args, **kwargs):
         # Ignore args to __init__; real initialization belongs in
@@ -138,7 +150,10 @@ class HTTPServer(TCPServer, Configurable,
                    decompress_request=False,
                    chunk_size=None, max_header_size=None,
                    idle_connection_timeout=None, body_timeout=None,
-                   max_body_size=None, max_buffer_size=None):
+                   max_body_size=None, max_buffer_size=None,
+                   write_high_water=None, write_low_water=None,
+                   write_cork_threshold=None, lazy_headers=False,
+                   pipeline_depth=None):
         self.request_callback = request_callback
         self.no_keep_alive = no_keep_alive
         self.xheaders = xheaders
@@ -149,7 +164,12 @@ class HTTPServer(TCPServer, Configurable,
             max_header_size=max_header_size,
             header_timeout=idle_connection_timeout or 3600,
             max_body_size=max_body_size,
-            body_timeout=body_timeout)
+            body_timeout=body_timeout,
+            write_high_water=write_high_water,
+            write_low_water=write_low_water,
+            write_cork_threshold=write_cork_threshold,
+            lazy_headers=lazy_headers,
+            pipeline_depth=pipeline_depth)
         TCPServer.__init__(self, io_loop=io_loop, ssl_options=ssl_options,
                            max_buffer_size=max_buffer_size,
                            read_chunk_size=chunk_size)
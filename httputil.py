@@ -97,6 +97,39 @@ class _NormalizedHeaderCache(dict):
 
 _normalized_headers = _NormalizedHeaderCache(1000)
 
+# Header names as they usually appear on the wire, mapped to their
+# normalized form, so parse_header_block can skip decoding and
+# normalizing them.
+_COMMON_HEADER_NAMES = [
+    "Accept", "Accept-Charset", "Accept-Encoding", "Accept-Language",
+    "Accept-Ranges", "Access-Control-Allow-Origin", "Age", "Allow",
+    "Authorization", "Cache-Control", "Connection", "Content-Disposition",
+    "Content-Encoding", "Content-Language", "Content-Length",
+    "Content-Location", "Content-MD5", "Content-Range", "Content-Type",
+    "Cookie", "DNT", "Date", "ETag", "Expect", "Expires", "From", "Host",
+    "If-Match", "If-Modified-Since", "If-None-Match", "If-Range",
+    "If-Unmodified-Since", "Keep-Alive", "Last-Modified", "Location",
+    "Origin", "Pragma", "Proxy-Authenticate", "Proxy-Authorization",
+    "Range", "Referer", "Retry-After", "Server", "Set-Cookie", "TE",
+    "Trailer", "Transfer-Encoding", "Upgrade", "User-Agent", "Vary", "Via",
+    "WWW-Authenticate", "Warning", "X-Forwarded-For", "X-Forwarded-Host",
+    "X-Forwarded-Proto", "X-Real-Ip", "X-Requested-With",
+]
+_header_name_table = {}
+for _name in _COMMON_HEADER_NAMES:
+    for _spelling in (_name, _name.lower(), _normalized_headers[_name]):
+        _header_name_table[_spelling.encode("latin1")] = \
+            _normalized_headers[_name]
+del _name, _spelling
+
+if bytes is str:  # py2
+    def _decode_header(data):
+        # Same result as native_str(data.decode('latin1')).
+        return data.decode('latin1').encode('utf-8')
+else:
+    def _decode_header(data):
+        return data.decode('latin1')
+
 
 class HTTPHeaders(dict):
     """A dictionary that maintains ``Http-Header-Case`` for all keys.
@@ -243,6 +276,140 @@ class HTTPHeaders(dict):
         return self.copy()
 
 
+class LazyHTTPHeaders(HTTPHeaders):
+    """An `HTTPHeaders` that decodes each header's value on first use.
+
+    Created from the raw bytes of a header block (the header lines in
+    ``data[start:]``).  The header names are known from the start, in
+    the order they were received, so ``len``, ``in``, iteration and
+    `keys` cost nothing extra; each header's line is kept undecoded
+    until its value is needed.  Looking up a header (``headers[name]``,
+    `get`, `get_list`) only decodes that header; anything that needs
+    all the values (`values`, `items`, `get_all`, comparisons, `copy`,
+    `json.dumps`, ``dict(headers)``, ``|``) decodes the rest first.
+    Otherwise it behaves exactly like the `HTTPHeaders` that
+    `parse_header_block` would have returned, and may be modified in
+    the same ways.
+
+    Reading the dict storage directly, bypassing the methods of this
+    class (e.g. ``dict.values(headers)``), shows the raw lines of the
+    headers that have not been decoded yet.
+
+    Blocks with (obsolete) multi-line headers are decoded up front.
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, data, start=0):
+        # Like HTTPHeaders.__init__, without the (empty) update.
+        dict.__init__(self)
+        self._as_list = {}
+        self._last_key = None
+        # A header is decoded once it has an entry in _as_list; until
+        # then its value in the dict is its line (or a list of lines).
+        # _lazy is true while any header may still be undecoded.
+        index = _index_header_lines(data, start)
+        if index is None:
+            self._lazy = False
+            _parse_header_lines(self, data, start)
+        else:
+            self._lazy = bool(index)
+            dict.update(self, index)
+
+    def _materialize(self, norm_name):
+        if norm_name in self._as_list:
+            return
+        lines = dict.get(self, norm_name)
+        if lines is None:
+            return
+        if type(lines) is list:
+            values = [_header_line_value(line) for line in lines]
+            dict.__setitem__(self, norm_name, ",".join(values))
+        else:
+            values = [_header_line_value(lines)]
+            dict.__setitem__(self, norm_name, values[0])
+        self._as_list[norm_name] = values
+
+    def _materialize_all(self):
+        for norm_name in list(dict.keys(self)):
+            self._materialize(norm_name)
+        self._lazy = False
+        # get_all follows _as_list, which is in the order the headers
+        # were decoded; put it back in the dict's order.
+        as_list = self._as_list
+        self._as_list = dict((name, as_list[name])
+                             for name in dict.keys(self))
+
+    def add(self, name, value):
+        if self._lazy:
+            self._materialize(_normalized_headers[name])
+        super(LazyHTTPHeaders, self).add(name, value)
+
+    def get_list(self, name):
+        norm_name = _normalized_headers[name]
+        if self._lazy:
+            self._materialize(norm_name)
+        return self._as_list.get(norm_name, [])
+
+    def get_all(self):
+        if self._lazy:
+            self._materialize_all()
+        return super(LazyHTTPHeaders, self).get_all()
+
+    def parse_line(self, line):
+        if self._lazy:
+            self._materialize_all()
+        if self._last_key is None and self._as_list:
+            self._last_key = list(self._as_list)[-1]
+        super(LazyHTTPHeaders, self).parse_line(line)
+
+    def __getitem__(self, name):
+        norm_name = _normalized_headers[name]
+        if self._lazy:
+            self._materialize(norm_name)
+        return dict.__getitem__(self, norm_name)
+
+    def __delitem__(self, name):
+        norm_name = _normalized_headers[name]
+        if self._lazy:
+            self._materialize(norm_name)
+        super(LazyHTTPHeaders, self).__delitem__(name)
+
+    def get(self, name, default=None):
+        norm_name = _normalized_headers[name]
+        if self._lazy:
+            self._materialize(norm_name)
+        return dict.get(self, norm_name, default)
+
+    def __iter__(self):
+        # The keys are already right, but overriding __iter__ keeps
+        # dict(headers), dict.update and ** from copying the dict
+        # storage directly; they use keys() and __getitem__ instead.
+        return dict.__iter__(self)
+
+
+def _materializing(name):
+    # Wraps a dict method of LazyHTTPHeaders so that it sees every
+    # header's value.
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        if self._lazy:
+            self._materialize_all()
+        for arg in args:
+            if isinstance(arg, LazyHTTPHeaders) and arg._lazy:
+                arg._materialize_all()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = name
+    return wrapper
+
+for _name in ("__eq__", "__ne__", "__repr__", "__or__", "__ror__",
+              "__ior__", "values", "items", "pop", "popitem", "setdefault",
+              "itervalues", "iteritems", "viewvalues", "viewitems"):
+    if hasattr(dict, _name):
+        setattr(LazyHTTPHeaders, _name, _materializing(_name))
+del _name
+
+
 class HTTPServerRequest(object):
     """A single HTTP request.
 
@@ -826,6 +993,120 @@ def parse_response_start_line(line):
     return ResponseStartLine(match.group(1), int(match.group(2)),
                              match.group(3))
 
+
+def parse_header_block(data, lazy=False):
+    """Parses a start line and headers from an HTTP/1.x message.
+
+    ``data`` is the bytes of the message up to (and optionally
+    including) the blank line that ends the headers.  Returns the start
+    line as a native string and the headers as an `HTTPHeaders`; this
+    gives the same result as decoding ``data`` as latin1 and passing
+    everything after the first line to `HTTPHeaders.parse`, but works
+    on the bytes in one pass.  Leading blank lines (which some clients
+    send between requests) are skipped.
+
+    >>> start_line, headers = parse_header_block(
+    ...     b"GET / HTTP/1.1\\r\\nHost: example.com\\r\\n\\r\\n")
+    >>> start_line
+    'GET / HTTP/1.1'
+    >>> headers["host"]
+    'example.com'
+
+    If ``lazy`` is true the headers are a `LazyHTTPHeaders`, which only
+    decodes the headers that are used.
+
+    .. versionadded:: 4.3
+    """
+    data = data.lstrip(b"\r\n")
+    # RFC 7230 section 3.5 allows for both CRLF and bare LF.
+    eol = data.find(b"\n")
+    if eol < 0:
+        eol = len(data)
+    start_line = _decode_header(data[:eol].rstrip(b"\r"))
+    if lazy:
+        headers = LazyHTTPHeaders(data, eol + 1)
+    else:
+        headers = HTTPHeaders()
+        _parse_header_lines(headers, data, eol + 1)
+    return start_line, headers
+
+
+def _parse_header_lines(headers, data, pos):
+    # Adds the header lines in data[pos:] to the empty HTTPHeaders
+    # ``headers``.
+    as_list = headers._as_list
+    # Local names for what the loop uses on every line.
+    names = _header_name_table
+    decode = _decode_header
+    setitem = dict.__setitem__
+    last_key = None
+    for line in data[pos:].split(b"\n"):
+        if not line or line == b"\r":
+            continue
+        if line[:1].isspace():
+            # continuation of a multi-line header
+            if last_key is None:
+                raise HTTPInputError("Malformed HTTP headers: %r" %
+                                     data[pos:pos + 100])
+            if line[-1:] == b"\r":
+                line = line[:-1]
+            new_part = " " + decode(line.lstrip())
+            as_list[last_key][-1] += new_part
+            setitem(headers, last_key,
+                    dict.__getitem__(headers, last_key) + new_part)
+            continue
+        colon = line.find(b":")
+        if colon < 0:
+            raise HTTPInputError("Malformed HTTP headers: %r" %
+                                 data[pos:pos + 100])
+        name = line[:colon]
+        norm_name = names.get(name)
+        if norm_name is None:
+            norm_name = _normalized_headers[decode(name)]
+        value = decode(line[colon + 1:].strip())
+        if norm_name not in as_list:
+            as_list[norm_name] = [value]
+            setitem(headers, norm_name, value)
+        else:
+            as_list[norm_name].append(value)
+            setitem(headers, norm_name,
+                    dict.__getitem__(headers, norm_name) + "," + value)
+        last_key = norm_name
+    headers._last_key = last_key
+
+
+def _index_header_lines(data, pos):
+    # Maps the normalized name of each header in data[pos:] to its line,
+    # or to a list of lines if it is repeated.  Returns None if there
+    # are continuation lines.
+    index = {}
+    names = _header_name_table
+    for line in data[pos:].split(b"\n"):
+        if not line or line == b"\r":
+            continue
+        if line[:1].isspace():
+            return None
+        colon = line.find(b":")
+        if colon < 0:
+            raise HTTPInputError("Malformed HTTP headers: %r" %
+                                 data[pos:pos + 100])
+        name = line[:colon]
+        norm_name = names.get(name)
+        if norm_name is None:
+            norm_name = _normalized_headers[_decode_header(name)]
+        lines = index.get(norm_name)
+        if lines is None:
+            index[norm_name] = line
+        elif type(lines) is list:
+            lines.append(line)
+        else:
+            index[norm_name] = [lines, line]
+    return index
+
+
+def _header_line_value(line):
+    return _decode_header(line[line.find(b":") + 1:].strip())
+
 # _parseparam and _parse_header are copied and modified from python2.7's cgi.py
 # The original 2.7 version of this code did not correctly support some
 # combinations of semicolons and double quotes.
@@ -16,6 +16,8 @@
 
 from __future__ import absolute_import, division, print_function, with_statement
 
+import bisect
+import collections
 import datetime
 import errno
 import functools
@@ -24,6 +26,7 @@ import itertools
 import logging
 import numbers
 import os
+import random
 import select
 import sys
 import threading
@@ -31,11 +34,16 @@ import time
 import traceback
 import math
 
-from tornado.concurrent import TracebackFuture, is_future
+from tornado.concurrent import TracebackFuture, is_future, chain_future
 from tornado.log import app_log, gen_log
 from tornado import stack_context
 from tornado.util import Configurable, errno_from_exception, timedelta_to_seconds
 
+try:
+    from concurrent.futures import ThreadPoolExecutor
+except ImportError:
+    ThreadPoolExecutor = None
+
 try:
     import signal
 except ImportError:
@@ -46,11 +54,15 @@ try:
 except ImportError:
     import _thread as thread  # py3
 
-from tornado.platform.auto import set_close_exec, Waker
+from tornado.platform.auto import set_close_exec, Waker, monotonic_time
 
 
 _POLL_TIMEOUT = 3600.0
 
+# With coarse_time, a callback that moves the clock on by at least this
+# many seconds refreshes the cached time for the callbacks after it.
+_COARSE_TIME_THRESHOLD = 0.001
+
 
 class TimeoutError(Exception):
     """
@@ -59,6 +71,15 @@ class TimeoutError(Exception):
     pass
 
 
+class ExecutorFull(Exception):
+    """`BoundedExecutor`等待的任务已达``max_waiting``时，`~BoundedExecutor.submit`
+    返回的`.Future`以此异常失败。
+
+    .. versionadded:: 4.3
+    """
+    pass
+
+
 class IOLoop(Configurable):
     """epoll的触发模式有两种：
     1. 水平触发：当监控的fd有事件发生时，程序会通知相关的程序去读写数据，如果没有相关程序来进行操作，或者数据未全部进行操作，则会一直通知。该IOLoop使用的是水平触发。
@@ -103,6 +124,11 @@ class IOLoop(Configurable):
        :hide:
     默认情况下，如果之前没有IOLoop循环，则生成的IOLoop实例是当前线程的事件循环，
     如果传递参数‘make_current=True’则会使新构造的IOLoop成为当前的事件循环对象，如果之前已经存在IOLoop对象，则会抛出异常。
+
+    用`IOLoop.configure`选择其他实现时注意：事件循环统计（`enable_stats`）
+    和看门狗（`enable_watchdog`）只有`PollIOLoop`（epoll、kqueue和select）支持；
+    在`.AsyncIOLoop`、`.TwistedIOLoop`等实现上调用它们不会出错，但什么也不做，
+    `get_stats`和`get_watchdog`返回None。
     """
 
     # epoll模块的常量
@@ -120,6 +146,11 @@ class IOLoop(Configurable):
     READ = _EPOLLIN
     WRITE = _EPOLLOUT
     ERROR = _EPOLLERR | _EPOLLHUP
+    # 边缘触发标志，只有在``edge_triggered``为True的IOLoop上才能传给`add_handler`
+    EDGE = _EPOLLET
+
+    # 是否支持边缘触发模式，参见`tornado.platform.epoll.EPollIOLoop`
+    edge_triggered = False
 
     # 用于创建全局IOLoop实例的全局锁
     # 线程加锁机制，防止多线程操作同一个fd，发生数据错乱。
@@ -223,6 +254,9 @@ class IOLoop(Configurable):
         return SelectIOLoop
 
     def initialize(self, make_current=None):
+        # run_in_executor的默认线程池，第一次使用时才创建
+        self._executor = None
+        self._owns_executor = False
         if make_current is None:
             if IOLoop.current(instance=False) is None:
                 self.make_current()
@@ -277,6 +311,13 @@ class IOLoop(Configurable):
 
         action参数是一个Python信号处理程序。
         如果``action``为None，如果被阻塞的时间过长，进程将被杀死。
+
+        .. versionchanged:: 4.3
+           `PollIOLoop`不再在每次迭代中调用``setitimer``，而是由看门狗线程
+           （`enable_watchdog`）在检测到阻塞时向IOLoop线程发送``SIGALRM``，
+           所以信号最多会晚一个看门狗的检查间隔（``seconds``的四分之一）。
+           它和`enable_watchdog`、`set_blocking_log_threshold`共用同一个看门狗，
+           后面的调用会替换前面的设置。
         """
         raise NotImplementedError()
 
@@ -284,6 +325,10 @@ class IOLoop(Configurable):
         """如果`IOLoop`被阻塞超过“seconds”秒，记录一个堆栈跟踪。
 
         相当于``set_blocking_signal_threshold（seconds，self.log_stack）``
+
+        .. versionchanged:: 4.3
+           `PollIOLoop`改用看门狗线程（`enable_watchdog`）实现，不再依赖``SIGALRM``，
+           也可以用于非主线程中的IOLoop。
         """
         self.set_blocking_signal_threshold(seconds, self.log_stack)
 
@@ -296,6 +341,72 @@ class IOLoop(Configurable):
                         self._blocking_signal_threshold,
                         ''.join(traceback.format_stack(frame)))
 
+    def enable_stats(self, report_interval=None, report_callback=None):
+        """开启事件循环的统计（默认关闭，关闭时几乎没有开销）。
+
+        统计结果是一个`IOLoopStats`对象，可以通过`get_stats`读取，例如
+        ``IOLoop.current().get_stats().snapshot()``。
+
+        如果给出``report_interval``（秒），每隔这段时间把统计快照传给
+        ``report_callback(snapshot)``（默认写入``tornado.general``日志），然后清零。
+
+        只有`PollIOLoop`实现了统计；其他实现（例如`.AsyncIOLoop`、`.TwistedIOLoop`）
+        中这个方法什么也不做，`get_stats`始终返回None，所以调用方应该检查返回值。
+
+        .. versionadded:: 4.3
+        """
+        pass
+
+    def disable_stats(self):
+        """关闭事件循环的统计，并停止定期报告。
+
+        不支持统计的实现中什么也不做。
+
+        .. versionadded:: 4.3
+        """
+        pass
+
+    def get_stats(self):
+        """返回当前的`IOLoopStats`对象，统计未开启时返回None。
+
+        .. versionadded:: 4.3
+        """
+        return None
+
+    def enable_watchdog(self, threshold, on_block=None, interval=None):
+        """启动一个看门狗线程，检测单个回调或处理函数阻塞IOLoop超过``threshold``秒的情况。
+
+        与`set_blocking_signal_threshold`不同，它不依赖``SIGALRM``，
+        也可以用于在其他线程中运行的IOLoop。发生阻塞时，看门狗通过
+        ``sys._current_frames()``采样IOLoop线程的堆栈，按调用位置汇总次数和时间，
+        并调用``on_block(seconds, stack)``（默认写一条警告日志）。
+        ``on_block``在看门狗线程中运行。
+
+        返回`BlockingWatchdog`对象，可以用它的`~BlockingWatchdog.report`方法读取汇总结果。
+
+        看门狗依赖事件循环在每个回调前更新计数，只有`PollIOLoop`实现了它；
+        其他实现（例如`.AsyncIOLoop`、`.TwistedIOLoop`）中这个方法什么也不做，返回None。
+
+        .. versionadded:: 4.3
+        """
+        return None
+
+    def disable_watchdog(self):
+        """停止看门狗线程。
+
+        不支持看门狗的实现中什么也不做。
+
+        .. versionadded:: 4.3
+        """
+        pass
+
+    def get_watchdog(self):
+        """返回当前的`BlockingWatchdog`，没有启用时返回None。
+
+        .. versionadded:: 4.3
+        """
+        return None
+
     def start(self):
         """启动I / O循环
 
@@ -387,6 +498,17 @@ class IOLoop(Configurable):
         """
         return time.time()
 
+    def precise_time(self):
+        """返回IOLoop时钟的当前时间，不使用任何缓存。
+
+        与`time`使用同一个时钟；只有在开启了粗粒度时钟（见`PollIOLoop`的
+        ``coarse_time``参数）时两者才有区别，需要精确计时的代码（例如测量一段
+        同步代码的耗时）应该使用这个方法。
+
+        .. versionadded:: 4.3
+        """
+        return self.time()
+
     def add_timeout(self, deadline, callback, *args, **kwargs):
         """在I / O循环的“deadline”时间运行``callback``。
 
@@ -473,6 +595,64 @@ class IOLoop(Configurable):
         future.add_done_callback(
             lambda future: self.add_callback(callback, future))
 
+    def run_in_executor(self, executor, func, *args):
+        """在``executor``中运行``func(*args)``，返回一个在本IOLoop上完成的`.Future`。
+
+        ``executor``为None时使用默认的线程池：第一次使用时创建一个
+        ``process.cpu_count() * 5``个线程的`concurrent.futures.ThreadPoolExecutor`，
+        并用`BoundedExecutor`包装，同时提交到线程池的任务最多是线程数的两倍，
+        多出的任务在IOLoop上排队，不会在线程池内部无限堆积。
+        可以用`set_default_executor`替换默认的线程池。
+
+        ``executor``可以是任何`concurrent.futures.Executor`或`BoundedExecutor`。
+        必须在IOLoop的线程上调用。
+
+        .. versionadded:: 4.3
+        """
+        if executor is None:
+            executor = self.get_default_executor()
+        if isinstance(executor, BoundedExecutor):
+            return executor.submit(func, *args)
+        c_future = executor.submit(func, *args)
+        # Copy the result on the IOLoop's thread; TracebackFuture
+        # is not thread-safe.
+        t_future = TracebackFuture()
+        self.add_future(c_future, lambda f: chain_future(f, t_future))
+        return t_future
+
+    def set_default_executor(self, executor):
+        """设置`run_in_executor`使用的默认执行器。
+
+        传入的执行器由调用者负责关闭；IOLoop只会关闭它自己创建的默认线程池。
+
+        .. versionadded:: 4.3
+        """
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+        self._executor = executor
+        self._owns_executor = False
+
+    def get_default_executor(self):
+        """返回`run_in_executor`使用的默认执行器，需要时创建它。
+
+        默认线程池是一个`BoundedExecutor`，可以通过它的`~BoundedExecutor.get_stats`
+        查看排队深度和延迟。
+
+        .. versionadded:: 4.3
+        """
+        if self._executor is None:
+            if ThreadPoolExecutor is None:
+                raise RuntimeError("concurrent.futures is required to use "
+                                   "IOLoop.run_in_executor")
+            # tornado.process imports this module.
+            from tornado.process import cpu_count
+            max_workers = cpu_count() * 5
+            self._executor = BoundedExecutor(
+                ThreadPoolExecutor(max_workers), max_pending=max_workers * 2,
+                io_loop=self)
+            self._owns_executor = True
+        return self._executor
+
     def _run_callback(self, callback):
         """运行带错误处理的回调。
         用于子类。
@@ -528,21 +708,245 @@ class IOLoop(Configurable):
             pass
 
 
+class IOLoopStats(object):
+    """事件循环的统计数据，由`IOLoop.enable_stats`创建。
+
+    累计的计数器：
+
+    * ``iterations``: 循环迭代次数
+    * ``callbacks``, ``timeouts``, ``handlers``: 运行的回调、到期超时和fd处理函数的数量
+    * ``callback_time``, ``timeout_time``, ``handler_time``, ``poll_time``:
+      每个阶段花费的时间（秒）
+    * ``poll_timeout``: 最近一次传给``poll()``的超时时间；
+      ``zero_timeout_polls``是超时为0（还有待运行的回调）的次数
+    * ``lateness``: 超时执行时比预定时间晚了多少的直方图，
+      第i个计数对应``LATENESS_BUCKETS[i-1] < 延迟 <= LATENESS_BUCKETS[i]``，
+      最后一个计数是超过最大边界的部分；``max_lateness``是最大延迟
+
+    所有的计数只在IOLoop的线程中修改；其他线程应该使用`snapshot`读取。
+
+    .. versionadded:: 4.3
+    """
+    LATENESS_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+    def __init__(self):
+        self.clock = monotonic_time or time.time
+        self.reset()
+
+    def reset(self):
+        """把所有计数清零。"""
+        self.started = self.clock()
+        self.iterations = 0
+        self.callbacks = 0
+        self.timeouts = 0
+        self.handlers = 0
+        self.callback_time = 0.0
+        self.timeout_time = 0.0
+        self.handler_time = 0.0
+        self.poll_time = 0.0
+        self.poll_timeout = None
+        self.zero_timeout_polls = 0
+        self.lateness = [0] * (len(self.LATENESS_BUCKETS) + 1)
+        self.max_lateness = 0.0
+
+    def record_lateness(self, now, timeouts):
+        """记录一批到期超时相对于``now``的延迟。"""
+        buckets = self.LATENESS_BUCKETS
+        for timeout in timeouts:
+            late = now - timeout.deadline
+            self.lateness[bisect.bisect_left(buckets, late)] += 1
+            if late > self.max_lateness:
+                self.max_lateness = late
+
+    def snapshot(self):
+        """以字典形式返回当前的统计数据。"""
+        return dict(
+            elapsed=self.clock() - self.started,
+            iterations=self.iterations,
+            callbacks=self.callbacks,
+            timeouts=self.timeouts,
+            handlers=self.handlers,
+            callback_time=self.callback_time,
+            timeout_time=self.timeout_time,
+            handler_time=self.handler_time,
+            poll_time=self.poll_time,
+            poll_timeout=self.poll_timeout,
+            zero_timeout_polls=self.zero_timeout_polls,
+            lateness=list(self.lateness),
+            max_lateness=self.max_lateness)
+
+
+class BlockingWatchdog(object):
+    """检测阻塞IOLoop的回调，由`IOLoop.enable_watchdog`创建。
+
+    IOLoop在运行每个回调、超时和fd处理函数之前把``seq``加一，
+    在``poll()``等待期间把``polling``设为True，所以事件循环中的开销只是一次整数加法。
+    看门狗线程每隔``interval``秒（默认为``threshold``的四分之一）醒来一次，
+    如果发现``seq``在超过``threshold``秒的时间里都没有变化，
+    就采样IOLoop线程的堆栈并记录下来。
+
+    由于只在醒来时检查，报告的阻塞时间最多会比实际少一个``interval``。
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, io_loop, threshold, on_block=None, interval=None,
+                 max_depth=30):
+        if threshold <= 0:
+            raise ValueError("threshold must be positive")
+        self.io_loop = io_loop
+        self.threshold = threshold
+        self.interval = interval or threshold / 4.0
+        self.max_depth = max_depth
+        self.on_block = on_block or self._log_block
+        # Updated by the IOLoop thread.
+        self.seq = 0
+        self.polling = False
+        self._clock = monotonic_time or time.time
+        self._sites = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """启动看门狗线程。"""
+        self._thread = threading.Thread(target=self._run,
+                                        name="tornado-watchdog")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """停止看门狗线程。"""
+        self._stop_event.set()
+        if (self._thread is not None and
+                self._thread is not threading.current_thread()):
+            self._thread.join()
+        self._thread = None
+
+    def report(self):
+        """返回汇总的阻塞记录，按总阻塞时间从大到小排序。
+
+        每条记录是一个字典，包含``site``（最内层的调用位置）、``stack``
+        （格式化后的堆栈）、``count``（次数）、``total_time``和``max_time``（秒）。
+        """
+        with self._lock:
+            sites = [dict(site) for site in self._sites.values()]
+        sites.sort(key=lambda site: site['total_time'], reverse=True)
+        return sites
+
+    def reset(self):
+        """清空汇总的记录。"""
+        with self._lock:
+            self._sites = {}
+
+    def _log_block(self, seconds, stack):
+        gen_log.warning('IOLoop blocked for %f seconds in\n%s',
+                        seconds, stack)
+
+    def _run(self):
+        last_seq = None
+        since = None
+        site = None
+        reported = 0
+        while not self._stop_event.wait(self.interval):
+            seq = self.seq
+            now = self._clock()
+            if self.polling or not self.io_loop._running:
+                last_seq = site = None
+                continue
+            if seq != last_seq:
+                last_seq = seq
+                since = now
+                site = None
+                continue
+            blocked = now - since
+            if blocked < self.threshold:
+                continue
+            if site is None:
+                site = self._sample()
+                if site is None:
+                    continue
+                with self._lock:
+                    site['count'] += 1
+                    site['total_time'] += blocked
+                    site['max_time'] = max(site['max_time'], blocked)
+                reported = blocked
+                try:
+                    self.on_block(blocked, site['stack'])
+                except Exception:
+                    app_log.error("Exception in watchdog callback",
+                                  exc_info=True)
+            else:
+                # The same callback is still running; extend its record.
+                with self._lock:
+                    site['total_time'] += blocked - reported
+                    site['max_time'] = max(site['max_time'], blocked)
+                reported = blocked
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.io_loop._thread_ident)
+        if frame is None:
+            return None
+        stack = traceback.extract_stack(frame, limit=self.max_depth)
+        del frame
+        key = tuple((filename, lineno, name)
+                    for filename, lineno, name, line in stack)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                filename, lineno, name = key[-1]
+                site = self._sites[key] = dict(
+                    site='%s:%d in %s' % (filename, lineno, name),
+                    stack=''.join(traceback.format_list(stack)),
+                    count=0, total_time=0.0, max_time=0.0)
+        return site
+
+
+def _in_main_thread():
+    if hasattr(threading, 'main_thread'):
+        return threading.current_thread() is threading.main_thread()
+    return isinstance(threading.current_thread(), threading._MainThread)
+
+
 class PollIOLoop(IOLoop):
     """基于类选择函数构建的IOLoops的基类。
     """
-    def initialize(self, impl, time_func=None, **kwargs):
+    def initialize(self, impl, time_func=None, timer_store=None, waker=None,
+                   coarse_time=False, **kwargs):
+        """``timer_store``是一个无参数的可调用对象（通常是类），返回保存超时的容器，
+        默认为`TimeoutHeap`。大量超时频繁添加/取消时可以传入`TimingWheel`，例如::
+
+            IOLoop.configure(None, timer_store=functools.partial(TimingWheel, resolution=0.01))
+
+        ``waker``是一个`~tornado.platform.interface.Waker`实例，默认使用平台的管道实现。
+
+        ``coarse_time=True``时开启粗粒度时钟：IOLoop在每次迭代开始、运行完回调和
+        超时之后以及``poll``返回之后各读取一次时钟，在这之间`time`直接返回缓存的值，
+        所以``call_later``、`gen.with_timeout`等大量调用`time`的代码不再每次都读取时钟。
+        每个回调、超时或fd处理函数运行完之后还会读取一次时钟，如果时间比缓存的值前进了
+        至少1毫秒（例如回调阻塞了一段时间）就更新缓存，所以后面的回调看到的时间最多落后
+        1毫秒。代价是一个回调在自己运行期间看到的时间不会前进；需要精确时间时使用
+        `precise_time`。
+        """
         super(PollIOLoop, self).initialize(**kwargs)
         self._impl = impl
         if hasattr(self._impl, 'fileno'):
             set_close_exec(self._impl.fileno())
         self.time_func = time_func or time.time
+        self._coarse_time = coarse_time
+        # 粗粒度时钟缓存的时间；None表示每次调用time()都读取时钟
+        self._cached_time = None
         self._handlers = {}
         self._events = {}
-        self._callbacks = []
+        # 跨线程的回调队列。deque.append和popleft在GIL下是原子操作，
+        # 所以添加回调时不需要加锁；_waker_pending保证每次循环迭代
+        # 最多向waker写一次。_callback_lock只用于唤醒和关闭之间的同步。
+        self._callbacks = collections.deque()
         self._callback_lock = threading.Lock()
-        self._timeouts = []
-        self._cancellations = 0
+        self._waker_pending = False
+        self._timeouts = (timer_store or TimeoutHeap)()
+        self._stats = None
+        self._stats_reporter = None
+        self._watchdog = None
         self._running = False
         self._stopped = False
         self._closing = False
@@ -551,7 +955,7 @@ class PollIOLoop(IOLoop):
         self._timeout_counter = itertools.count()
 
         # 创建一个管道，当我们想要唤醒I / O循环时，它空闲时发送伪造数据
-        self._waker = Waker()
+        self._waker = waker or Waker()
 
         # self._waker.consume()函数实现了无线循环监听，若有事件触发，读取内容
         self.add_handler(self._waker.fileno(),
@@ -566,13 +970,19 @@ class PollIOLoop(IOLoop):
         """
         with self._callback_lock:
             self._closing = True
+        self.disable_stats()
+        self.disable_watchdog()
         self.remove_handler(self._waker.fileno())
         if all_fds:
             for fd, handler in self._handlers.values():
                 self.close_fd(fd)
         self._waker.close()
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+            self._owns_executor = False
         self._impl.close()
-        self._callbacks = None
+        self._callbacks.clear()
         self._timeouts = None
 
     def add_handler(self, fd, handler, events):
@@ -604,14 +1014,86 @@ class PollIOLoop(IOLoop):
             gen_log.debug("Error deleting fd from IOLoop", exc_info=True)
 
     def set_blocking_signal_threshold(self, seconds, action):
-        if not hasattr(signal, "setitimer"):
+        if not hasattr(signal, "SIGALRM"):
             gen_log.error("set_blocking_signal_threshold requires a signal module "
-                          "with the setitimer method")
+                          "with SIGALRM")
             return
         self._blocking_signal_threshold = seconds
-        if seconds is not None:
+        if seconds is None:
+            self.disable_watchdog()
+        else:
             signal.signal(signal.SIGALRM,
                           action if action is not None else signal.SIG_DFL)
+            # The watchdog thread sends the signal, so the loop does not
+            # have to re-arm an itimer on every iteration.
+            self.enable_watchdog(seconds, on_block=self._send_blocking_signal)
+
+    def _send_blocking_signal(self, seconds, stack):
+        if hasattr(signal, "pthread_kill"):
+            signal.pthread_kill(self._thread_ident, signal.SIGALRM)
+        else:
+            os.kill(os.getpid(), signal.SIGALRM)
+
+    def enable_stats(self, report_interval=None, report_callback=None):
+        self.disable_stats()
+        self._stats = IOLoopStats()
+        if report_interval is not None:
+            self._stats_reporter = PeriodicCallback(
+                functools.partial(self._report_stats,
+                                  report_callback or self._log_stats),
+                report_interval * 1000, io_loop=self)
+            self._stats_reporter.start()
+
+    def disable_stats(self):
+        if self._stats_reporter is not None:
+            self._stats_reporter.stop()
+            self._stats_reporter = None
+        self._stats = None
+
+    def get_stats(self):
+        return self._stats
+
+    def _report_stats(self, report_callback):
+        stats = self._stats
+        if stats is None:
+            return
+        snapshot = stats.snapshot()
+        stats.reset()
+        report_callback(snapshot)
+
+    def _log_stats(self, snapshot):
+        gen_log.info("IOLoop stats: %d iterations in %.3fs; "
+                     "%d callbacks (%.3fs), %d timeouts (%.3fs), "
+                     "%d handlers (%.3fs), poll %.3fs; "
+                     "max timeout lateness %.3fs",
+                     snapshot['iterations'], snapshot['elapsed'],
+                     snapshot['callbacks'], snapshot['callback_time'],
+                     snapshot['timeouts'], snapshot['timeout_time'],
+                     snapshot['handlers'], snapshot['handler_time'],
+                     snapshot['poll_time'], snapshot['max_lateness'])
+
+    def set_blocking_log_threshold(self, seconds):
+        # Logging does not need a signal handler, so use the watchdog
+        # thread instead of SIGALRM; this also works off the main thread.
+        if seconds is None:
+            self.disable_watchdog()
+        else:
+            self.enable_watchdog(seconds)
+
+    def enable_watchdog(self, threshold, on_block=None, interval=None):
+        self.disable_watchdog()
+        self._watchdog = BlockingWatchdog(self, threshold, on_block=on_block,
+                                          interval=interval)
+        self._watchdog.start()
+        return self._watchdog
+
+    def disable_watchdog(self):
+        if self._watchdog is not None:
+            self._watchdog.stop()
+            self._watchdog = None
+
+    def get_watchdog(self):
+        return self._watchdog
 
     def start(self):
         if self._running:
@@ -638,7 +1120,7 @@ class PollIOLoop(IOLoop):
             # requires python 2.6+, unix.  set_wakeup_fd exists but crashes
             # the python process on windows.
             try:
-                old_wakeup_fd = signal.set_wakeup_fd(self._waker.write_fileno())
+                old_wakeup_fd = signal.set_wakeup_fd(self._signal_wakeup_fd())
                 if old_wakeup_fd != -1:
                     # Already set, restore previous value.  This is a little racy,
                     # but there's no clean get_wakeup_fd and in real use the
@@ -650,12 +1132,17 @@ class PollIOLoop(IOLoop):
                 # is no longer valid.
                 old_wakeup_fd = None
 
+        coarse_time = self._coarse_time
+        time_func = self.time_func
         try:
             while True:
+                if coarse_time:
+                    self._cached_time = time_func()
                 # 通过将新的回调延迟到事件循环的下一次迭代来防止IO事件饥饿。
-                with self._callback_lock:
-                    callbacks = self._callbacks
-                    self._callbacks = []
+                # Clear the wake flag before looking at the queue: a thread
+                # that adds a callback after this point must wake us again.
+                self._waker_pending = False
+                ncallbacks = len(self._callbacks)
 
                 # Add any timeouts that have come due to the callback list.
                 # Do not run anything until we have determined which ones
@@ -664,34 +1151,49 @@ class PollIOLoop(IOLoop):
                 due_timeouts = []
                 if self._timeouts:
                     now = self.time()
-                    while self._timeouts:
-                        if self._timeouts[0].callback is None:
-                            # The timeout was cancelled.  Note that the
-                            # cancellation check is repeated below for timeouts
-                            # that are cancelled by another timeout or callback.
-                            heapq.heappop(self._timeouts)
-                            self._cancellations -= 1
-                        elif self._timeouts[0].deadline <= now:
-                            due_timeouts.append(heapq.heappop(self._timeouts))
-                        else:
-                            break
-                    if (self._cancellations > 512
-                            and self._cancellations > (len(self._timeouts) >> 1)):
-                        # Clean up the timeout queue when it gets large and it's
-                        # more than half cancellations.
-                        self._cancellations = 0
-                        self._timeouts = [x for x in self._timeouts
-                                          if x.callback is not None]
-                        heapq.heapify(self._timeouts)
-
-                for callback in callbacks:
-                    self._run_callback(callback)
+                    due_timeouts = self._timeouts.pop_due(now)
+
+                # Statistics are opt-in; when they are disabled the only
+                # cost is checking this local variable.
+                stats = self._stats
+                watchdog = self._watchdog
+                if stats is not None:
+                    stats.iterations += 1
+                    stats.callbacks += ncallbacks
+                    stats.timeouts += len(due_timeouts)
+                    if due_timeouts:
+                        stats.record_lateness(now, due_timeouts)
+                    phase_start = stats.clock()
+
+                callbacks = self._callbacks
+                for i in range(ncallbacks):
+                    if watchdog is not None:
+                        watchdog.seq += 1
+                    self._run_callback(callbacks.popleft())
+                    if coarse_time:
+                        now = time_func()
+                        if abs(now - self._cached_time) >= _COARSE_TIME_THRESHOLD:
+                            self._cached_time = now
+                if stats is not None:
+                    phase_end = stats.clock()
+                    stats.callback_time += phase_end - phase_start
+                    phase_start = phase_end
                 for timeout in due_timeouts:
                     if timeout.callback is not None:
+                        if watchdog is not None:
+                            watchdog.seq += 1
                         self._run_callback(timeout.callback)
+                        if coarse_time:
+                            now = time_func()
+                            if abs(now - self._cached_time) >= _COARSE_TIME_THRESHOLD:
+                                self._cached_time = now
+                if stats is not None:
+                    stats.timeout_time += stats.clock() - phase_start
                 # Closures may be holding on to a lot of memory, so allow
                 # them to be freed before we go into our poll wait.
-                callbacks = callback = due_timeouts = timeout = None
+                callbacks = due_timeouts = timeout = None
+                if coarse_time:
+                    self._cached_time = time_func()
 
                 if self._callbacks:
                     # If any callbacks or timeouts called add_callback,
@@ -701,7 +1203,7 @@ class PollIOLoop(IOLoop):
                     # If there are any timeouts, schedule the first one.
                     # Use self.time() instead of 'now' to account for time
                     # spent running callbacks.
-                    poll_timeout = self._timeouts[0].deadline - self.time()
+                    poll_timeout = self._timeouts.next_deadline() - self.time()
                     poll_timeout = max(0, min(poll_timeout, _POLL_TIMEOUT))
                 else:
                     # No timeouts and no callbacks, so use the default.
@@ -710,10 +1212,13 @@ class PollIOLoop(IOLoop):
                 if not self._running:
                     break
 
-                if self._blocking_signal_threshold is not None:
-                    # clear alarm so it doesn't fire while poll is waiting for
-                    # events.
-                    signal.setitimer(signal.ITIMER_REAL, 0, 0)
+                if stats is not None:
+                    stats.poll_timeout = poll_timeout
+                    if poll_timeout == 0:
+                        stats.zero_timeout_polls += 1
+                    phase_start = stats.clock()
+                if watchdog is not None:
+                    watchdog.polling = True
 
                 try:
                     event_pairs = self._impl.poll(poll_timeout)
@@ -728,17 +1233,26 @@ class PollIOLoop(IOLoop):
                     else:
                         raise
 
-                if self._blocking_signal_threshold is not None:
-                    signal.setitimer(signal.ITIMER_REAL,
-                                     self._blocking_signal_threshold, 0)
+                if watchdog is not None:
+                    watchdog.polling = False
+                    watchdog.seq += 1
+                if coarse_time:
+                    self._cached_time = time_func()
 
                 # Pop one fd at a time from the set of pending fds and run
                 # its handler. Since that handler may perform actions on
                 # other file descriptors, there may be reentrant calls to
                 # this IOLoop that update self._events
                 self._events.update(event_pairs)
+                if stats is not None:
+                    phase_end = stats.clock()
+                    stats.poll_time += phase_end - phase_start
+                    stats.handlers += len(self._events)
+                    phase_start = phase_end
                 while self._events:
                     fd, events = self._events.popitem()
+                    if watchdog is not None:
+                        watchdog.seq += 1
                     try:
                         fd_obj, handler_func = self._handlers[fd]
                         handler_func(fd_obj, events)
@@ -750,23 +1264,61 @@ class PollIOLoop(IOLoop):
                             self.handle_callback_exception(self._handlers.get(fd))
                     except Exception:
                         self.handle_callback_exception(self._handlers.get(fd))
+                    if coarse_time:
+                        now = time_func()
+                        if abs(now - self._cached_time) >= _COARSE_TIME_THRESHOLD:
+                            self._cached_time = now
                 fd_obj = handler_func = None
+                if stats is not None:
+                    stats.handler_time += stats.clock() - phase_start
 
         finally:
             # reset the stopped flag so another start/stop pair can be issued
             self._stopped = False
-            if self._blocking_signal_threshold is not None:
-                signal.setitimer(signal.ITIMER_REAL, 0, 0)
+            self._cached_time = None
+            if self._watchdog is not None:
+                self._watchdog.polling = True
             IOLoop._current.instance = old_current
             if old_wakeup_fd is not None:
                 signal.set_wakeup_fd(old_wakeup_fd)
 
+    def _signal_wakeup_fd(self):
+        """返回传给``signal.set_wakeup_fd``的文件描述符。
+
+        eventfd实现的waker不接受单字节的写入。这时如果IOLoop在主线程上启动，
+        就把它换成管道实现的Waker，而不是再多打开一个管道：主线程上的IOLoop
+        和以前一样占用两个文件描述符，只有其他线程上的IOLoop才能省下一个。
+        其他线程不能设置唤醒fd，也就不需要替换。
+        """
+        fd = self._waker.write_fileno()
+        if fd is not None:
+            return fd
+        if not _in_main_thread():
+            raise ValueError("set_wakeup_fd only works in main thread")
+        waker = Waker()
+        # add_callback wakes the loop while holding the lock, so no
+        # other thread can be writing to the old waker as it is closed.
+        with self._callback_lock:
+            self.remove_handler(self._waker.fileno())
+            self._waker.close()
+            self._waker = waker
+            self.add_handler(waker.fileno(),
+                             lambda fd, events: self._waker.consume(),
+                             self.READ)
+        return waker.write_fileno()
+
     def stop(self):
         self._running = False
         self._stopped = True
         self._waker.wake()
 
     def time(self):
+        cached_time = self._cached_time
+        if cached_time is not None:
+            return cached_time
+        return self.time_func()
+
+    def precise_time(self):
         return self.time_func()
 
     def call_at(self, deadline, callback, *args, **kwargs):
@@ -774,32 +1326,42 @@ class PollIOLoop(IOLoop):
             deadline,
             functools.partial(stack_context.wrap(callback), *args, **kwargs),
             self)
-        heapq.heappush(self._timeouts, timeout)
+        self._timeouts.add(timeout)
         return timeout
 
     def remove_timeout(self, timeout):
-        # Removing from a heap is complicated, so just leave the defunct
-        # timeout object in the queue (see discussion in
-        # http://docs.python.org/library/heapq.html).
-        # If this turns out to be a problem, we could add a garbage
-        # collection pass whenever there are too many dead timeouts.
         timeout.callback = None
-        self._cancellations += 1
+        self._timeouts.remove(timeout)
 
     def add_callback(self, callback, *args, **kwargs):
-        with self._callback_lock:
-            if self._closing:
-                raise RuntimeError("IOLoop is closing")
-            list_empty = not self._callbacks
-            self._callbacks.append(functools.partial(
-                stack_context.wrap(callback), *args, **kwargs))
-            if list_empty and thread.get_ident() != self._thread_ident:
-                # If we're in the IOLoop's thread, we know it's not currently
-                # polling.  If we're not, and we added the first callback to an
-                # empty list, we may need to wake it up (it may wake up on its
-                # own, but an occasional extra wake is harmless).  Waking
-                # up a polling IOLoop is relatively expensive, so we try to
-                # avoid it when we can.
+        if self._closing:
+            raise RuntimeError("IOLoop is closing")
+        callback = stack_context.wrap(callback)
+        if args or kwargs:
+            callback = functools.partial(callback, *args, **kwargs)
+        self._callbacks.append(callback)
+        if self._closing:
+            # close() may have started after the check above and already
+            # cleared the queue; take the callback back out rather than
+            # losing it silently.
+            try:
+                self._callbacks.remove(callback)
+            except ValueError:
+                pass
+            raise RuntimeError("IOLoop is closing")
+        if (not self._waker_pending and
+                thread.get_ident() != self._thread_ident):
+            # If we're in the IOLoop's thread, we know it's not currently
+            # polling.  If we're not, we may need to wake it up, unless
+            # another thread has already done so since the loop last
+            # looked at the queue (an occasional extra wake is harmless).
+            # Waking up a polling IOLoop is relatively expensive, so this
+            # happens at most about once per loop iteration.  The lock
+            # only guards against waking a loop that is being closed.
+            with self._callback_lock:
+                if self._closing:
+                    raise RuntimeError("IOLoop is closing")
+                self._waker_pending = True
                 self._waker.wake()
 
     def add_callback_from_signal(self, callback, *args, **kwargs):
@@ -809,14 +1371,9 @@ class PollIOLoop(IOLoop):
                 # it normally (modulo the NullContext)
                 self.add_callback(callback, *args, **kwargs)
             else:
-                # If we're on the IOLoop's thread, we cannot use
-                # the regular add_callback because it may deadlock on
-                # _callback_lock.  Blindly insert into self._callbacks.
-                # This is safe because the GIL makes list.append atomic.
-                # One subtlety is that if the signal interrupted the
-                # _callback_lock block in IOLoop.start, we may modify
-                # either the old or new version of self._callbacks,
-                # but either way will work.
+                # If we're on the IOLoop's thread, blindly insert into
+                # self._callbacks without touching _callback_lock.  This
+                # is safe because the GIL makes deque.append atomic.
                 self._callbacks.append(functools.partial(
                     stack_context.wrap(callback), *args, **kwargs))
 
@@ -825,7 +1382,8 @@ class _Timeout(object):
     """IOLoop超时，UNIX时间戳和回调"""
 
     # 当有大量待处理的回调时，减少内存开销
-    __slots__ = ['deadline', 'callback', 'tiebreaker']
+    # bucket: 由`TimingWheel`使用，记录该超时所在的槽，以便O(1)取消
+    __slots__ = ['deadline', 'callback', 'tiebreaker', 'bucket']
 
     def __init__(self, deadline, callback, io_loop):
         if not isinstance(deadline, numbers.Real):
@@ -833,6 +1391,7 @@ class _Timeout(object):
         self.deadline = deadline
         self.callback = callback
         self.tiebreaker = next(io_loop._timeout_counter)
+        self.bucket = None
 
     # Comparison methods to sort by deadline, with object id as a tiebreaker
     # to guarantee a consistent ordering.  The heapq module uses __le__
@@ -847,6 +1406,502 @@ class _Timeout(object):
                 (other.deadline, other.tiebreaker))
 
 
+class TimeoutHeap(object):
+    """`PollIOLoop`默认的超时容器，基于``heapq``实现的最小堆。
+
+    取消超时只是把``callback``置为None，失效的对象留在堆中，
+    等到它们到达堆顶或者失效对象超过一半时再统一清理
+    （参见 http://docs.python.org/library/heapq.html 中的讨论）。
+
+    其他超时容器（如`TimingWheel`）需要实现相同的方法：
+    ``add``、``remove``、``pop_due``、``next_deadline``和``__len__``。
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self):
+        self._heap = []
+        self._cancellations = 0
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, timeout):
+        """加入一个`_Timeout`对象。"""
+        heapq.heappush(self._heap, timeout)
+
+    def remove(self, timeout):
+        """取消一个超时；调用前``timeout.callback``已被置为None。"""
+        self._cancellations += 1
+
+    def pop_due(self, now):
+        """取出所有``deadline <= now``的超时，按到期顺序返回列表。"""
+        heap = self._heap
+        due = []
+        while heap:
+            if heap[0].callback is None:
+                # The timeout was cancelled.  Note that the
+                # cancellation check is repeated in the IOLoop for timeouts
+                # that are cancelled by another timeout or callback.
+                heapq.heappop(heap)
+                self._cancellations -= 1
+            elif heap[0].deadline <= now:
+                due.append(heapq.heappop(heap))
+            else:
+                break
+        if (self._cancellations > 512 and
+                self._cancellations > (len(heap) >> 1)):
+            # Clean up the timeout queue when it gets large and it's
+            # more than half cancellations.
+            self._cancellations = 0
+            self._heap = [x for x in heap if x.callback is not None]
+            heapq.heapify(self._heap)
+        return due
+
+    def next_deadline(self):
+        """返回最早的到期时间；容器为空时返回None。"""
+        if self._heap:
+            return self._heap[0].deadline
+        return None
+
+
+class _Bucket(set):
+    """`TimingWheel`中的一个槽，记录自己所在的层。"""
+    __slots__ = ['level']
+
+    def __init__(self, level):
+        super(_Bucket, self).__init__()
+        self.level = level
+
+
+class TimingWheel(object):
+    """分层时间轮（hierarchical timing wheel）超时容器。
+
+    添加和取消超时的复杂度都是O(1)，被取消的超时会立即从槽中移除，
+    适合大量超时被频繁添加、又大多在到期前被取消的场景
+    （例如每个长连接上的`gen.with_timeout`）。
+
+    时间被划分为长度为``resolution``秒的刻度（tick）。第0层有``wheel_size``个槽，
+    每个槽对应一个刻度；第n层的每个槽对应``wheel_size ** n``个刻度。
+    较远的超时放在高层，当时间推进到对应边界时逐层下移（cascade）。
+    超过最高层范围的超时放在溢出槽中，等最高层转完一圈时再重新放置。
+
+    超时不会提前执行：每个到期的超时都会再与当前时间比较，
+    所以``resolution``只影响内部簿记的粒度，而不会推迟回调。
+
+    用法::
+
+        IOLoop.configure(None, timer_store=TimingWheel)
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, resolution=0.01, wheel_size=256, levels=4):
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+        if wheel_size < 2 or levels < 1:
+            raise ValueError("invalid timing wheel shape")
+        self.resolution = resolution
+        self._size = wheel_size
+        self._spans = [wheel_size ** level for level in range(levels + 1)]
+        self._wheels = [[_Bucket(level) for i in range(wheel_size)]
+                        for level in range(levels)]
+        # Timeouts beyond the range of the top level wait here until the
+        # top level wraps around.
+        self._overflow = _Bucket(levels)
+        self._counts = [0] * (levels + 1)
+        self._len = 0
+        # The wheel is anchored to the clock on the first call to pop_due;
+        # until then timeouts wait in a plain list.
+        self._tick = None
+        self._pending = []
+        self._next = None
+
+    def __len__(self):
+        return self._len
+
+    def add(self, timeout):
+        """加入一个`_Timeout`对象。"""
+        if self._tick is None:
+            self._pending.append(timeout)
+        else:
+            self._place(timeout, int(timeout.deadline / self.resolution))
+        self._len += 1
+        if self._next is not None and timeout.deadline < self._next:
+            self._next = timeout.deadline
+
+    def remove(self, timeout):
+        """取消一个超时，直接把它从所在的槽中删除。"""
+        bucket = timeout.bucket
+        if bucket is None:
+            if self._tick is None and timeout in self._pending:
+                self._pending.remove(timeout)
+                self._len -= 1
+            # Otherwise it has already run or been cancelled.
+            return
+        bucket.discard(timeout)
+        timeout.bucket = None
+        self._counts[bucket.level] -= 1
+        self._len -= 1
+        if timeout.deadline == self._next:
+            self._next = None
+
+    def pop_due(self, now):
+        """推进时间轮到``now``，按到期顺序返回所有``deadline <= now``的超时。"""
+        due = []
+        target = int(now / self.resolution)
+        if self._tick is None:
+            self._tick = target
+            pending, self._pending = self._pending, None
+            for timeout in pending:
+                self._place(timeout, int(timeout.deadline / self.resolution))
+        level0 = self._wheels[0]
+        while self._tick < target:
+            bucket = level0[self._tick % self._size]
+            if bucket:
+                self._take(bucket, now, due)
+            self._advance(target)
+        bucket = level0[self._tick % self._size]
+        if bucket:
+            self._take(bucket, now, due)
+        if due:
+            self._next = None
+            due.sort()
+        return due
+
+    def next_deadline(self):
+        """返回下一次需要唤醒的时间；容器为空时返回None。
+
+        如果第0层在下一个边界前没有超时，返回该边界的时间，
+        此时IOLoop会被唤醒一次以便高层的超时下移。
+        """
+        if not self._len:
+            return None
+        if self._tick is None:
+            return min(t.deadline for t in self._pending)
+        if self._next is None:
+            size = self._size
+            boundary = (self._tick // size + 1) * size
+            level0 = self._wheels[0]
+            if self._counts[0]:
+                for tick in range(self._tick, boundary):
+                    bucket = level0[tick % size]
+                    if bucket:
+                        self._next = min(t.deadline for t in bucket)
+                        return self._next
+            self._next = boundary * self.resolution
+        return self._next
+
+    def _take(self, bucket, now, due):
+        # Buckets behind the current tick are entirely due, but the
+        # current tick's bucket may still hold later deadlines.
+        later = []
+        for timeout in bucket:
+            if timeout.deadline <= now:
+                timeout.bucket = None
+                due.append(timeout)
+            else:
+                later.append(timeout)
+        if len(later) == len(bucket):
+            return
+        taken = len(bucket) - len(later)
+        self._counts[bucket.level] -= len(bucket)
+        self._len -= taken
+        bucket.clear()
+        for timeout in later:
+            self._place(timeout, int(timeout.deadline / self.resolution))
+
+    def _slot(self, tick, level):
+        return (tick // self._spans[level]) % self._size
+
+    def _place(self, timeout, tick):
+        delta = tick - self._tick
+        if delta < 0:
+            tick = self._tick
+            delta = 0
+        for level in range(len(self._wheels)):
+            if delta < self._spans[level + 1]:
+                bucket = self._wheels[level][self._slot(tick, level)]
+                break
+        else:
+            bucket = self._overflow
+        bucket.add(timeout)
+        timeout.bucket = bucket
+        self._counts[bucket.level] += 1
+
+    def _advance(self, target):
+        # Skip over whole blocks of empty levels, then cascade the
+        # higher levels whose boundary we land on.
+        step = 1
+        for level in range(len(self._wheels)):
+            if self._counts[level]:
+                break
+            step = self._spans[level + 1]
+        if step > 1:
+            tick = (self._tick // step + 1) * step
+            if tick > target:
+                self._tick = target
+                self._next = None
+                return
+        else:
+            tick = self._tick + 1
+        self._tick = tick
+        self._next = None
+        for level in range(1, len(self._wheels) + 1):
+            if tick % self._spans[level]:
+                break
+            if level == len(self._wheels):
+                bucket = self._overflow
+            else:
+                bucket = self._wheels[level][self._slot(tick, level)]
+            if bucket:
+                cascaded = list(bucket)
+                bucket.clear()
+                self._counts[level] -= len(cascaded)
+                for timeout in cascaded:
+                    self._place(timeout,
+                                int(timeout.deadline / self.resolution))
+
+
+class BoundedExecutor(object):
+    """包装一个`concurrent.futures.Executor`，限制同时提交的任务数并统计排队情况。
+
+    最多有``max_pending``个任务同时提交给``executor``（正在运行或在执行器内部排队），
+    其余的任务按提交顺序在IOLoop上等待，有任务完成时才提交下一个。
+    这样执行器内部的队列不会无限增长。``max_pending``为None时不做限制。
+
+    在IOLoop上等待的任务最多有``max_waiting``个；超出时`submit`不再排队，
+    返回的`.Future`立即以`ExecutorFull`失败，由调用者决定重试、降级还是报错，
+    过载时内存不会无限增长。``max_waiting``为None时等待的任务数不做限制。
+
+    `submit`返回在``io_loop``上完成的`.Future`，只能在该IOLoop的线程上调用。
+    通常通过`IOLoop.run_in_executor`使用。
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, executor, max_pending=None, io_loop=None,
+                 max_waiting=None):
+        if max_pending is not None and max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        if max_waiting is not None and max_waiting < 0:
+            raise ValueError("max_waiting must not be negative")
+        self.executor = executor
+        self.max_pending = max_pending
+        self.max_waiting = max_waiting
+        self.io_loop = io_loop or IOLoop.current()
+        self.clock = monotonic_time or time.time
+        self._waiting = collections.deque()
+        self._pending = 0
+        self.reset()
+
+    def reset(self):
+        """清零累计的计数和时间；不影响正在排队或运行的任务。"""
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_time = 0.0
+        self.max_queue_time = 0.0
+        self.run_time = 0.0
+        self.max_run_time = 0.0
+
+    def submit(self, fn, *args, **kwargs):
+        """安排``fn(*args, **kwargs)``在执行器中运行，返回一个`.Future`。
+
+        等待的任务已达``max_waiting``时，返回的`.Future`以`ExecutorFull`失败。
+        """
+        future = TracebackFuture()
+        item = (future, fn, args, kwargs, self.clock())
+        if self.max_pending is None or self._pending < self.max_pending:
+            self._start(item)
+        elif (self.max_waiting is not None and
+                len(self._waiting) >= self.max_waiting):
+            self.rejected += 1
+            future.set_exception(ExecutorFull())
+        else:
+            self._waiting.append(item)
+        return future
+
+    def shutdown(self, wait=True):
+        """关闭被包装的执行器。
+
+        还在IOLoop上等待的任务不会再运行，它们的`.Future`以`RuntimeError`失败。
+        """
+        waiting = self._waiting
+        self._waiting = collections.deque()
+        for future, fn, args, kwargs, queued in waiting:
+            future.set_exception(RuntimeError("executor shut down"))
+        self.executor.shutdown(wait=wait)
+
+    def get_stats(self):
+        """返回当前状态的字典。
+
+        ``queue_depth``是还没有开始运行的任务数（在IOLoop上等待的和
+        在执行器内部排队的，后者包括正在运行的任务，因为无法区分）；
+        ``*_queue_time``是从`submit`到开始运行的时间，``*_run_time``是运行时间，
+        都是已完成的任务的统计，单位为秒；``rejected``是因``max_waiting``
+        而以`ExecutorFull`失败的任务数。
+        """
+        finished = self.completed + self.failed
+        return dict(
+            submitted=self.submitted,
+            completed=self.completed,
+            failed=self.failed,
+            rejected=self.rejected,
+            waiting=len(self._waiting),
+            pending=self._pending,
+            queue_depth=len(self._waiting) + self._pending,
+            avg_queue_time=self.queue_time / finished if finished else 0.0,
+            max_queue_time=self.max_queue_time,
+            avg_run_time=self.run_time / finished if finished else 0.0,
+            max_run_time=self.max_run_time,
+        )
+
+    def _start(self, item):
+        future, fn, args, kwargs, queued = item
+        clock = self.clock
+        # Filled in by the worker thread; read on the IOLoop once done.
+        times = []
+
+        def run():
+            times.append(clock())
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                times.append(clock())
+        self._pending += 1
+        self.submitted += 1
+        c_future = self.executor.submit(run)
+        self.io_loop.add_future(
+            c_future, functools.partial(self._done, future, queued, times))
+
+    def _done(self, future, queued, times, c_future):
+        self._pending -= 1
+        if len(times) == 2:
+            queue_time = times[0] - queued
+            run_time = times[1] - times[0]
+            self.queue_time += queue_time
+            self.max_queue_time = max(self.max_queue_time, queue_time)
+            self.run_time += run_time
+            self.max_run_time = max(self.max_run_time, run_time)
+        if c_future.cancelled() or c_future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+        chain_future(c_future, future)
+        while self._waiting and self._pending < self.max_pending:
+            self._start(self._waiting.popleft())
+
+
+class IOLoopGroup(object):
+    """在多个线程中各运行一个`IOLoop`。
+
+    配合``SO_REUSEPORT``（见`.TCPServer.listen_on_group`），每个IOLoop都有
+    自己的监听socket，由内核在它们之间分配连接。与`~tornado.process.fork_processes`
+    不同，所有IOLoop都在同一个进程中，可以共享内存中的缓存；由于GIL的存在，
+    只有处理程序中有较多释放GIL的操作（zlib、ssl、哈希等）时才能用上多个CPU。
+
+    ``num_loops``默认为`~tornado.process.cpu_count`，其余关键字参数传给每个
+    `IOLoop`的构造函数。例如::
+
+        group = IOLoopGroup(4)
+        app.listen(8888, group=group)
+        group.start()
+        ...
+        group.close()
+
+    每个IOLoop只能在自己的线程中使用；要把工作交给某个IOLoop，使用`run_on`
+    或线程安全的`IOLoop.add_callback`。
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, num_loops=None, **kwargs):
+        if num_loops is None:
+            # tornado.process imports this module.
+            from tornado.process import cpu_count
+            num_loops = cpu_count()
+        if num_loops < 1:
+            raise ValueError("num_loops must be at least 1")
+        kwargs.setdefault('make_current', False)
+        self.loops = [IOLoop(**kwargs) for i in range(num_loops)]
+        self._threads = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.loops)
+
+    def start(self):
+        """为每个IOLoop启动一个守护线程并在其中运行`IOLoop.start`。"""
+        if self._threads:
+            raise RuntimeError("IOLoopGroup is already started")
+        for i, io_loop in enumerate(self.loops):
+            thread = threading.Thread(target=io_loop.start,
+                                      name="tornado-ioloop-%d" % i)
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=None):
+        """停止所有的IOLoop，并等待它们的线程退出。"""
+        for io_loop in self.loops:
+            io_loop.add_callback(io_loop.stop)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def close(self, all_fds=False):
+        """停止（如果正在运行）并关闭所有的IOLoop。"""
+        if self._threads:
+            self.stop()
+        for io_loop in self.loops:
+            io_loop.close(all_fds=all_fds)
+
+    def next_loop(self):
+        """轮流返回组内的IOLoop。"""
+        return self.loops[next(self._counter) % len(self.loops)]
+
+    def loop_for(self, key):
+        """根据``key``的哈希值返回一个IOLoop。
+
+        同一个key总是对应同一个IOLoop，可以用来按key把状态分配到各个线程，
+        访问时不需要加锁。
+        """
+        return self.loops[hash(key) % len(self.loops)]
+
+    def current(self):
+        """如果当前线程正在运行组内的某个IOLoop，返回它，否则返回None。"""
+        io_loop = IOLoop.current(instance=False)
+        for loop in self.loops:
+            if loop is io_loop:
+                return loop
+        return None
+
+    def run_on(self, io_loop, callback, *args, **kwargs):
+        """在指定的IOLoop（或它在`loops`中的下标）上调用``callback``。
+
+        返回一个`.Future`，它在调用者的IOLoop（`IOLoop.current`）上
+        得到``callback``的结果；如果``callback``返回的是`.Future`（例如协程），
+        则得到这个Future的结果。
+        """
+        if not isinstance(io_loop, IOLoop):
+            io_loop = self.loops[io_loop]
+        caller = IOLoop.current()
+        future = TracebackFuture()
+
+        def run():
+            try:
+                result = callback(*args, **kwargs)
+            except Exception:
+                caller.add_callback(future.set_exc_info, sys.exc_info())
+                return
+            if is_future(result):
+                io_loop.add_future(
+                    result,
+                    lambda f: caller.add_callback(chain_future, f, future))
+            else:
+                caller.add_callback(future.set_result, result)
+        io_loop.add_callback(run)
+        return future
+
+
 class PeriodicCallback(object):
     """调度要定期调用的给定回调。
 
@@ -855,26 +1910,42 @@ class PeriodicCallback(object):
 
     如果回调运行的时间比``callback_time``毫秒更长，则后续调用将被跳过以按计划返回。
 
+    传入``scheduler``（一个`PeriodicScheduler`）时，所有``callback_time``相同的
+    回调共享同一个超时，而不是各自调用`IOLoop.add_timeout`。
+
     `start`必须在创建“PeriodicCallback”后调用。
+
+    .. versionchanged:: 4.3
+       添加了``scheduler``参数。
     """
-    def __init__(self, callback, callback_time, io_loop=None):
+    def __init__(self, callback, callback_time, io_loop=None, scheduler=None):
         self.callback = callback
         if callback_time <= 0:
             raise ValueError("Periodic callback must have a positive callback_time")
         self.callback_time = callback_time
+        if scheduler is not None:
+            if io_loop is not None and io_loop is not scheduler.io_loop:
+                raise ValueError("scheduler belongs to a different IOLoop")
+            io_loop = scheduler.io_loop
         self.io_loop = io_loop or IOLoop.current()
+        self.scheduler = scheduler
         self._running = False
         self._timeout = None
 
     def start(self):
         """Starts the timer."""
         self._running = True
+        if self.scheduler is not None:
+            self.scheduler.add(self)
+            return
         self._next_timeout = self.io_loop.time()
         self._schedule_next()
 
     def stop(self):
         """Stops the timer."""
         self._running = False
+        if self.scheduler is not None:
+            self.scheduler.remove(self)
         if self._timeout is not None:
             self.io_loop.remove_timeout(self._timeout)
             self._timeout = None
@@ -897,7 +1968,7 @@ class PeriodicCallback(object):
             self._schedule_next()
 
     def _schedule_next(self):
-        if self._running:
+        if self._running and self.scheduler is None:
             current_time = self.io_loop.time()
 
             if self._next_timeout <= current_time:
@@ -905,3 +1976,106 @@ class PeriodicCallback(object):
                 self._next_timeout += (math.floor((current_time - self._next_timeout) / callback_time_sec) + 1) * callback_time_sec
 
             self._timeout = self.io_loop.add_timeout(self._next_timeout, self._run)
+
+
+class _SharedTick(object):
+    """`PeriodicScheduler`中一组``callback_time``相同的`PeriodicCallback`。"""
+    def __init__(self, callback_time, start_time):
+        self.callback_time = callback_time
+        self.period = callback_time / 1000.0
+        # 插入顺序即调用顺序；值没有用到
+        self.members = collections.OrderedDict()
+        # 不含抖动的理想触发时间，每次只按整数个周期前进，所以不会累积漂移
+        self.next_time = start_time + self.period
+        self.timeout = None
+
+
+class PeriodicScheduler(object):
+    """把周期相同的`PeriodicCallback`合并到一个共享超时上的调度器。
+
+    成千上万个心跳之类的周期回调各自调用`IOLoop.add_timeout`会让超时堆变得很大；
+    使用调度器后，每种``callback_time``只有一个超时，到期时按加入顺序依次调用
+    该组的所有回调。例如::
+
+        scheduler = PeriodicScheduler(jitter=0.1)
+        PeriodicCallback(heartbeat, 15000, scheduler=scheduler).start()
+
+    加入一个已经存在的组时，第一次调用发生在该组的下一次触发时，
+    所以最多会比单独的`PeriodicCallback`提前一个周期。
+
+    ``jitter``是``0``到``1``之间的比例：每次实际触发时间在理想时间前后
+    ``jitter * callback_time / 2``范围内随机偏移，避免多个进程的同周期任务同时触发。
+    理想时间总是从第一次启动时起按整数个周期计算，所以回调的运行时间、
+    IOLoop的延迟和抖动都不会累积成漂移。
+
+    IOLoop过载、某次触发晚到超过一个周期时，错过的次数计入`missed_ticks`，
+    并调用``on_missed(callback_time, missed)``；默认记录一条警告日志。
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, io_loop=None, jitter=0, on_missed=None):
+        if not 0 <= jitter < 1:
+            raise ValueError("jitter must be in [0, 1)")
+        self.io_loop = io_loop or IOLoop.current()
+        self.jitter = jitter
+        self.on_missed = on_missed
+        self.missed_ticks = 0
+        self._ticks = {}  # callback_time -> _SharedTick
+        self._random = random.Random()
+
+    def __len__(self):
+        """返回当前使用的共享超时的数量。"""
+        return len(self._ticks)
+
+    def add(self, periodic_callback):
+        """把``periodic_callback``加入它的``callback_time``对应的组。
+
+        通常由`PeriodicCallback.start`调用。
+        """
+        tick = self._ticks.get(periodic_callback.callback_time)
+        if tick is None:
+            tick = _SharedTick(periodic_callback.callback_time,
+                               self.io_loop.time())
+            self._ticks[tick.callback_time] = tick
+            self._schedule(tick)
+        tick.members[periodic_callback] = None
+
+    def remove(self, periodic_callback):
+        """把``periodic_callback``移出它所在的组；组为空时取消共享超时。
+
+        通常由`PeriodicCallback.stop`调用。
+        """
+        tick = self._ticks.get(periodic_callback.callback_time)
+        if tick is None:
+            return
+        tick.members.pop(periodic_callback, None)
+        if not tick.members:
+            self.io_loop.remove_timeout(tick.timeout)
+            del self._ticks[tick.callback_time]
+
+    def _schedule(self, tick):
+        deadline = tick.next_time
+        if self.jitter:
+            deadline += (self._random.random() - 0.5) * self.jitter * tick.period
+        tick.timeout = self.io_loop.add_timeout(deadline,
+                                                functools.partial(self._run, tick))
+
+    def _run(self, tick):
+        for periodic_callback in list(tick.members):
+            periodic_callback._run()
+        if self._ticks.get(tick.callback_time) is not tick:
+            # 所有成员都在回调中停止了
+            return
+        tick.next_time += tick.period
+        current_time = self.io_loop.time()
+        if current_time >= tick.next_time:
+            missed = int(math.floor((current_time - tick.next_time) / tick.period)) + 1
+            tick.next_time += missed * tick.period
+            self.missed_ticks += missed
+            if self.on_missed is not None:
+                self.on_missed(tick.callback_time, missed)
+            else:
+                gen_log.warning("Periodic tick of %sms missed %d times; "
+                                "IOLoop is overloaded",
+                                tick.callback_time, missed)
+        self._schedule(tick)
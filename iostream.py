@@ -22,6 +22,8 @@ Contents:
 * `IOStream`: Implementation of BaseIOStream using non-blocking sockets.
 * `SSLIOStream`: SSL-aware version of IOStream.
 * `PipeIOStream`: Pipe-based IOStream implementation.
+* `IOStreamStats`: Optional I/O counters for a stream.
+* `StreamPipe`: Forwards data between two streams (see `pipe_streams`).
 """
 
 from __future__ import absolute_import, division, print_function, with_statement
@@ -33,11 +35,16 @@ import os
 import socket
 import sys
 import re
+import threading
+import time
+import weakref
 
 from tornado.concurrent import TracebackFuture
+from tornado import gen
 from tornado import ioloop
 from tornado.log import gen_log, app_log
 from tornado.netutil import ssl_wrap_socket, ssl_match_hostname, SSLCertificateError, _client_ssl_defaults, _server_ssl_defaults
+from tornado.platform.auto import monotonic_time
 from tornado import stack_context
 from tornado.util import errno_from_exception
 
@@ -52,6 +59,12 @@ except ImportError:
     # ssl is not available on Google App Engine
     ssl = None
 
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+
 # These errnos indicate that a non-blocking operation must be retried
 # at a later time.  On most platforms they're the same value, but on
 # some they differ.
@@ -82,6 +95,37 @@ _ERRNO_INPROGRESS = (errno.EINPROGRESS,)
 if hasattr(errno, "WSAEINPROGRESS"):
     _ERRNO_INPROGRESS += (errno.WSAEINPROGRESS,)
 
+# The most buffers a single sendmsg call may be given.
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = -1
+if _IOV_MAX <= 0:
+    _IOV_MAX = 1024
+_WRITEV_MAX_BYTES = 256 * 1024
+
+# How much of a file write_file reads at a time when it cannot use
+# os.sendfile.
+_FILE_CHUNK_SIZE = 128 * 1024
+
+if hasattr(memoryview, "release"):
+    _release_view = memoryview.release
+else:
+    # Python 2's memoryview has no release(); dropping the last
+    # reference is all we can do.
+    def _release_view(view):
+        pass
+
+# StreamPipe's sockets are already non-blocking; this makes the kernel
+# pipe between them non-blocking too.
+_SPLICE_FLAGS = (getattr(os, "SPLICE_F_MOVE", 0) |
+                 getattr(os, "SPLICE_F_NONBLOCK", 0))
+
+# Open streams, while track_streams is on (see open_streams).
+_tracking_streams = False
+_open_streams = weakref.WeakSet()
+_open_streams_lock = threading.Lock()
+
 
 class StreamClosedError(IOError):
     """Exception raised by `IOStream` methods when the stream is closed.
@@ -107,6 +151,120 @@ class StreamBufferFullError(Exception):
     """
 
 
+class IOStreamStats(object):
+    """I/O counters for one stream, created by `BaseIOStream.enable_stats`.
+
+    * ``reads``, ``bytes_read``: calls to ``read_from_fd`` (including
+      those that found nothing to read) and the bytes they returned
+    * ``writes``, ``bytes_written``: write system calls (``send``,
+      ``sendmsg`` or ``sendfile``) and the bytes they wrote
+    * ``write_blocks``: how many times a write found the socket buffer
+      full; ``write_blocked_time`` is the total time (in seconds) from
+      then until the next write that made progress
+
+    The counters are only updated on the stream's `.IOLoop` thread.
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self):
+        self.clock = monotonic_time or time.time
+        self.reset()
+
+    def reset(self):
+        """Sets all the counters to zero."""
+        self.started = self.clock()
+        self.reads = 0
+        self.bytes_read = 0
+        self.writes = 0
+        self.bytes_written = 0
+        self.write_blocks = 0
+        self.write_blocked_time = 0.0
+        self._blocked_since = None
+
+    def record_write(self, num_bytes):
+        """Records a write system call that wrote ``num_bytes`` bytes."""
+        self.writes += 1
+        if num_bytes:
+            self.bytes_written += num_bytes
+            if self._blocked_since is not None:
+                self.write_blocked_time += self.clock() - self._blocked_since
+                self._blocked_since = None
+        elif self._blocked_since is None:
+            self.write_blocks += 1
+            self._blocked_since = self.clock()
+
+    def snapshot(self):
+        """Returns the counters as a dict."""
+        write_blocked_time = self.write_blocked_time
+        if self._blocked_since is not None:
+            write_blocked_time += self.clock() - self._blocked_since
+        return dict(
+            elapsed=self.clock() - self.started,
+            reads=self.reads,
+            bytes_read=self.bytes_read,
+            writes=self.writes,
+            bytes_written=self.bytes_written,
+            write_blocks=self.write_blocks,
+            write_blocked_time=write_blocked_time)
+
+
+def track_streams(enabled=True):
+    """Turns stream tracking on or off.
+
+    While tracking is on, every stream created turns on its I/O
+    counters (see `BaseIOStream.enable_stats`) and is kept in a weak
+    registry until it is closed, so that `open_streams`,
+    `dump_stream_stats` and `aggregate_stream_stats` can find it.
+    Streams created before tracking was turned on are not tracked.
+
+    .. versionadded:: 4.3
+    """
+    global _tracking_streams
+    _tracking_streams = enabled
+    if not enabled:
+        with _open_streams_lock:
+            _open_streams.clear()
+
+
+def open_streams():
+    """Returns a list of the tracked streams that are still open.
+
+    .. versionadded:: 4.3
+    """
+    with _open_streams_lock:
+        streams = list(_open_streams)
+    return [stream for stream in streams if not stream.closed()]
+
+
+def dump_stream_stats():
+    """Returns `BaseIOStream.stats_snapshot` for every open tracked
+    stream, those holding the most buffer memory first.
+
+    .. versionadded:: 4.3
+    """
+    snapshots = [stream.stats_snapshot() for stream in open_streams()]
+    snapshots.sort(key=lambda s: s['read_buffer_capacity'] +
+                   s['write_buffer_size'], reverse=True)
+    return snapshots
+
+
+def aggregate_stream_stats():
+    """Returns the totals of `dump_stream_stats` over all open tracked
+    streams, with the number of streams in ``streams``.
+
+    .. versionadded:: 4.3
+    """
+    totals = dict(streams=0, read_buffer_size=0, read_buffer_capacity=0,
+                  write_buffer_size=0, reads=0, bytes_read=0, writes=0,
+                  bytes_written=0, write_blocks=0, write_blocked_time=0.0)
+    for snapshot in dump_stream_stats():
+        totals['streams'] += 1
+        for key, value in snapshot.items():
+            if key in totals:
+                totals[key] += value
+    return totals
+
+
 class BaseIOStream(object):
     """A utility class to write to and read from a non-blocking file or socket.
 
@@ -150,12 +308,50 @@ class BaseIOStream(object):
                                    self.max_buffer_size // 2)
         self.max_write_buffer_size = max_write_buffer_size
         self.error = None
-        self._read_buffer = collections.deque()
+        # Incoming data lives in _read_buffer[_read_buffer_pos:
+        # _read_buffer_pos + _read_buffer_size].  The bytearray is kept
+        # larger than that so read_from_fd can fill its tail in place,
+        # and emptied whenever all of the data has been consumed.
+        self._read_buffer = bytearray()
+        self._read_buffer_pos = 0
+        # While a read_into is pending, _read_buffer is the caller's
+        # buffer and the stream's own buffer is kept here.
+        self._user_read_buffer = False
+        self._after_user_read_buffer = None
         self._write_buffer = collections.deque()
         self._read_buffer_size = 0
         self._write_buffer_size = 0
+        # Bytes of _write_buffer[0] already written when writing
+        # with _write_vectored_to_fd (scatter-gather).
+        self._write_buffer_pos = 0
         self._write_buffer_frozen = False
+        self._scatter_gather = False
+        # Files queued by write_file, sent in order after the data
+        # ahead of them in _write_buffer.
+        self._write_files = collections.deque()
+        self._sendfile = False
+        # Whether StreamPipe may move data straight between this
+        # stream's socket and another one with os.splice.
+        self._splice = False
+        # The StreamPipe that owns the fd's events while the stream is
+        # being piped.
+        self._pipe = None
+        # Write flow control (see set_write_watermarks).  Writing is
+        # "paused" from when the buffer grows past the high watermark
+        # until it drains to the low one.
+        self._write_high_water = None
+        self._write_low_water = None
+        self._write_paused = False
+        self._high_water_callback = None
+        self._drain_futures = []
+        # Write corking (see set_write_cork): small writes wait in the
+        # buffer for a flush scheduled with add_callback.
+        self._cork_threshold = None
+        self._cork_pending = False
         self._read_delimiter = None
+        # How much of the read buffer has already been searched for
+        # _read_delimiter without finding it.
+        self._read_scan_pos = 0
         self._read_regex = None
         self._read_max_bytes = None
         self._read_bytes = None
@@ -178,11 +374,61 @@ class BaseIOStream(object):
         self._state = None
         self._pending_callbacks = 0
         self._closed = False
+        # In edge-triggered mode the fd is registered once for both reads
+        # and writes, and we read and write until EAGAIN instead of
+        # changing the registered events.
+        self._edge_triggered = self.io_loop.edge_triggered
+        # I/O counters are opt-in (see enable_stats).
+        self._stats = None
+        if _tracking_streams:
+            self.enable_stats()
+            with _open_streams_lock:
+                _open_streams.add(self)
 
     def fileno(self):
         """Returns the file descriptor for this stream."""
         raise NotImplementedError()
 
+    def enable_stats(self):
+        """Turns on this stream's I/O counters (off by default).
+
+        The counters are an `IOStreamStats` object, returned by
+        `get_stats`.  When they are off, reads and writes only check
+        one attribute.
+
+        .. versionadded:: 4.3
+        """
+        if self._stats is None:
+            self._stats = IOStreamStats()
+
+    def get_stats(self):
+        """Returns the `IOStreamStats` object for this stream, or None
+        if `enable_stats` has not been called.
+
+        .. versionadded:: 4.3
+        """
+        return self._stats
+
+    def stats_snapshot(self):
+        """Returns a dict describing this stream for `dump_stream_stats`.
+
+        It holds the stream's class and file descriptor, the amount of
+        data in the read and write buffers, the memory allocated for
+        the read buffer (``read_buffer_capacity``) and, if they are
+        enabled, the counters from `IOStreamStats.snapshot`.
+
+        .. versionadded:: 4.3
+        """
+        snapshot = dict(
+            stream=self.__class__.__name__,
+            fileno=None if self.closed() else self.fileno(),
+            read_buffer_size=self._read_buffer_size,
+            read_buffer_capacity=len(self._read_buffer),
+            write_buffer_size=self._write_buffer_size)
+        if self._stats is not None:
+            snapshot.update(self._stats.snapshot())
+        return snapshot
+
     def close_fd(self):
         """Closes the file underlying this stream.
 
@@ -198,13 +444,22 @@ class BaseIOStream(object):
         """
         raise NotImplementedError()
 
-    def read_from_fd(self):
-        """Attempts to read from the underlying file.
-
-        Returns ``None`` if there was nothing to read (the socket
-        returned `~errno.EWOULDBLOCK` or equivalent), otherwise
-        returns the data.  When possible, should return no more than
-        ``self.read_chunk_size`` bytes at a time.
+    def read_from_fd(self, buf):
+        """Attempts to read from the underlying file into ``buf``.
+
+        ``buf`` is a writable buffer (a `memoryview` of the read buffer,
+        or of the caller's buffer during `read_into`), normally of at
+        most ``self.read_chunk_size`` bytes.  Returns ``None`` if
+        there was nothing to read (the socket returned
+        `~errno.EWOULDBLOCK` or equivalent), ``0`` at end of file,
+        otherwise returns the number of bytes read into ``buf``.
+        Implementations must not close the stream themselves: the
+        caller does that once it is done with ``buf``.
+
+        .. versionchanged:: 4.3
+           Reads into ``buf`` (e.g. with ``socket.recv_into``) instead of
+           returning a new bytes object, and returns ``0`` at end of file
+           instead of closing the stream.
         """
         raise NotImplementedError()
 
@@ -270,6 +525,7 @@ class BaseIOStream(object):
         future = self._set_read_callback(callback)
         self._read_delimiter = delimiter
         self._read_max_bytes = max_bytes
+        self._read_scan_pos = 0
         try:
             self._try_inline_read()
         except UnsatisfiableReadError as e:
@@ -313,6 +569,50 @@ class BaseIOStream(object):
             raise
         return future
 
+    def read_into(self, buf, callback=None, partial=False):
+        """Asynchronously read a number of bytes into ``buf``.
+
+        ``buf`` is a writable buffer (such as a `bytearray` or a
+        `memoryview` of one) supplied by the caller; data is read into
+        it directly from the socket instead of into a new bytes object.
+        Nothing else may touch ``buf`` until the read completes.
+
+        This reads ``len(buf)`` bytes, or with ``partial=True`` returns as
+        soon as at least one byte is available.  The callback is run (or
+        the returned `.Future` resolves) with the number of bytes read.
+
+        .. versionadded:: 4.3
+        """
+        future = self._set_read_callback(callback)
+        # Data already buffered goes into buf first; whatever is left of
+        # our own buffer is restored when the read completes.
+        pos = self._read_buffer_pos
+        available = self._read_buffer_size
+        n = len(buf)
+        if available >= n:
+            buf[:] = memoryview(self._read_buffer)[pos:pos + n]
+            rest = available - n
+            self._after_user_read_buffer = (
+                self._read_buffer if rest else bytearray(),
+                pos + n if rest else 0, rest)
+            available = n
+        else:
+            buf[:available] = memoryview(self._read_buffer)[pos:pos + available]
+            self._after_user_read_buffer = (bytearray(), 0, 0)
+        self._user_read_buffer = True
+        self._read_buffer = buf
+        self._read_buffer_pos = 0
+        self._read_buffer_size = available
+        self._read_bytes = n
+        self._read_partial = partial
+        try:
+            self._try_inline_read()
+        except:
+            if future is not None:
+                future.add_done_callback(lambda f: f.exception())
+            raise
+        return future
+
     def read_until_close(self, callback=None, streaming_callback=None):
         """Asynchronously reads all data from the socket until it is closed.
 
@@ -366,19 +666,62 @@ class BaseIOStream(object):
         """
         assert isinstance(data, bytes)
         self._check_closed()
+        # With scatter-gather writes a non-empty buffer means the socket
+        # was full when it was last written; the IOLoop will tell us
+        # when it drains, so don't rebuild the iovec on every write.
+        blocked = self._write_blocked()
         # We use bool(_write_buffer) as a proxy for write_buffer_size>0,
         # so never put empty strings in the buffer.
         if data:
             if (self.max_write_buffer_size is not None and
                     self._write_buffer_size + len(data) > self.max_write_buffer_size):
                 raise StreamBufferFullError("Reached maximum write buffer size")
-            # Break up large contiguous strings before inserting them in the
-            # write buffer, so we don't have to recopy the entire thing
-            # as we slice off pieces to send to the socket.
-            WRITE_BUFFER_CHUNK_SIZE = 128 * 1024
-            for i in range(0, len(data), WRITE_BUFFER_CHUNK_SIZE):
-                self._write_buffer.append(data[i:i + WRITE_BUFFER_CHUNK_SIZE])
+            if self._write_files:
+                # Data written after a file waits for the file to be sent.
+                write_buffer = self._write_files[-1].tail
+            else:
+                write_buffer = self._write_buffer
+            if self._scatter_gather:
+                # Partial writes only advance _write_buffer_pos, so large
+                # strings are never recopied.
+                write_buffer.append(data)
+            else:
+                # Break up large contiguous strings before inserting them in the
+                # write buffer, so we don't have to recopy the entire thing
+                # as we slice off pieces to send to the socket.
+                WRITE_BUFFER_CHUNK_SIZE = 128 * 1024
+                for i in range(0, len(data), WRITE_BUFFER_CHUNK_SIZE):
+                    write_buffer.append(data[i:i + WRITE_BUFFER_CHUNK_SIZE])
             self._write_buffer_size += len(data)
+        return self._start_write(callback, blocked)
+
+    def write_file(self, fileobj, offset=0, count=None, callback=None):
+        """Asynchronously write part of a file to this stream.
+
+        Sends ``count`` bytes of ``fileobj`` (a file object opened in
+        binary mode) starting at ``offset``, or everything from
+        ``offset`` to the end of the file if ``count`` is None.  The
+        file is sent after any data already passed to `write`, and data
+        written while it is being sent follows it.  The file must stay
+        open (and must not be truncated) until the write completes.
+
+        `IOStream` uses `os.sendfile` where available so the file's
+        contents never pass through Python; other streams (including
+        `SSLIOStream`) read the file in chunks into the write buffer.
+
+        ``callback`` and the returned `.Future` behave as for `write`.
+
+        .. versionadded:: 4.3
+        """
+        self._check_closed()
+        if count is None:
+            count = os.fstat(fileobj.fileno()).st_size - offset
+        blocked = self._write_blocked()
+        if count > 0:
+            self._write_files.append(_PendingFile(fileobj, offset, count))
+        return self._start_write(callback, blocked)
+
+    def _start_write(self, callback, blocked):
         if callback is not None:
             self._write_callback = stack_context.wrap(callback)
             future = None
@@ -386,12 +729,141 @@ class BaseIOStream(object):
             future = self._write_future = TracebackFuture()
             future.add_done_callback(lambda f: f.exception())
         if not self._connecting:
-            self._handle_write()
-            if self._write_buffer:
+            if blocked:
+                pass
+            elif (self._cork_threshold is not None and
+                  self._write_buffer_size < self._cork_threshold and
+                  not self._write_files):
+                if not self._cork_pending:
+                    self._cork_pending = True
+                    self.io_loop.add_callback(self._flush_cork)
+            else:
+                self._handle_write()
+            if self.writing() and not self._cork_pending:
                 self._add_io_state(self.io_loop.WRITE)
             self._maybe_add_error_listener()
+        self._check_write_watermarks()
         return future
 
+    def _write_blocked(self):
+        # Corked data is waiting for _flush_cork, not for the socket.
+        return (self._scatter_gather and self.writing() and
+                not self._cork_pending)
+
+    def set_write_cork(self, threshold=16384):
+        """Holds back small writes so that they are sent together.
+
+        While corked, `write` only buffers its data and the stream sends
+        everything written during the current `.IOLoop` iteration in
+        one go at the start of the next, or as soon as ``threshold``
+        bytes are waiting.  A response built from several writes
+        (headers, body chunks, the final chunk) then usually needs one
+        system call and goes out in as few packets as possible.  Write
+        callbacks and futures still run once the data has been sent.
+        Passing ``threshold=None`` turns corking off; anything still
+        held back is sent at once.
+
+        This happens entirely in the stream; it is unrelated to the
+        ``TCP_CORK`` socket option.
+
+        .. versionadded:: 4.3
+        """
+        self._cork_threshold = threshold
+        if threshold is None and self._cork_pending:
+            self._flush_cork()
+
+    def _flush_cork(self):
+        if not self._cork_pending:
+            return
+        self._cork_pending = False
+        if self.closed() or self._connecting:
+            return
+        self._handle_write()
+        if self.writing():
+            self._add_io_state(self.io_loop.WRITE)
+        self._maybe_add_error_listener()
+
+    def set_write_watermarks(self, high=None, low=None):
+        """Sets the write buffer limits used for flow control.
+
+        When more than ``high`` bytes are waiting in the write buffer,
+        the high-water callback (see `set_high_water_callback`) is run
+        and `wait_for_drain` blocks until the buffer has drained to
+        ``low`` bytes or fewer.  ``low`` defaults to a quarter of
+        ``high``.  Writes are never refused; it is up to the producer to
+        wait (unlike ``max_write_buffer_size``, which raises
+        `StreamBufferFullError`).  Passing ``high=None`` turns flow
+        control off.
+
+        .. versionadded:: 4.3
+        """
+        if high is None:
+            low = None
+        elif low is None:
+            low = high // 4
+        if high is not None and not 0 <= low <= high:
+            raise ValueError("high (%r) must be >= low (%r) must be >= 0" %
+                             (high, low))
+        self._write_high_water = high
+        self._write_low_water = low
+        if high is None:
+            self._write_paused = False
+        self._check_write_watermarks()
+
+    def set_high_water_callback(self, callback):
+        """Call the given callback when the write buffer grows past the
+        high watermark set with `set_write_watermarks`.
+
+        The callback runs once each time the buffer crosses the high
+        watermark; it is not run again until the buffer has drained to
+        the low watermark.
+
+        .. versionadded:: 4.3
+        """
+        self._high_water_callback = stack_context.wrap(callback)
+
+    def wait_for_drain(self):
+        """Returns a `.Future` that resolves when it is OK to write more.
+
+        With watermarks set (see `set_write_watermarks`) the `.Future`
+        resolves immediately unless the write buffer has grown past the
+        high watermark, in which case it resolves once the buffer has
+        drained to the low watermark.  Without watermarks it resolves
+        when everything written so far has been sent.  If the stream is
+        closed first the `.Future` fails with `StreamClosedError`.
+
+        .. versionadded:: 4.3
+        """
+        future = TracebackFuture()
+        future.add_done_callback(lambda f: f.exception())
+        if self.closed():
+            future.set_exception(StreamClosedError())
+        elif self._write_drained():
+            future.set_result(None)
+        else:
+            self._drain_futures.append(future)
+        return future
+
+    def _write_drained(self):
+        if self._write_high_water is None:
+            return not self.writing()
+        return not self._write_paused
+
+    def _check_write_watermarks(self):
+        if self._write_high_water is not None:
+            if self._write_paused:
+                if self._write_buffer_size <= self._write_low_water:
+                    self._write_paused = False
+            elif self._write_buffer_size > self._write_high_water:
+                self._write_paused = True
+                if self._high_water_callback is not None:
+                    self._run_callback(self._high_water_callback)
+        if self._drain_futures and self._write_drained():
+            futures = self._drain_futures
+            self._drain_futures = []
+            for future in futures:
+                future.set_result(None)
+
     def set_close_callback(self, callback):
         """Call the given callback when the stream is closed.
 
@@ -409,6 +881,12 @@ class BaseIOStream(object):
         exception from `sys.exc_info` (or if ``exc_info`` is a tuple,
         use that instead of `sys.exc_info`).
         """
+        if self._cork_pending and not self.closed():
+            # Send what an uncorked stream would already have sent.
+            if exc_info and not isinstance(exc_info, tuple):
+                exc_info = sys.exc_info()
+            self._cork_pending = False
+            self._handle_write()
         if not self.closed():
             if exc_info:
                 if not isinstance(exc_info, tuple):
@@ -426,6 +904,12 @@ class BaseIOStream(object):
                 self._state = None
             self.close_fd()
             self._closed = True
+            if _tracking_streams:
+                with _open_streams_lock:
+                    _open_streams.discard(self)
+            if self._pipe is not None:
+                pipe, self._pipe = self._pipe, None
+                pipe._finish()
         self._maybe_run_close_callback()
 
     def _maybe_run_close_callback(self):
@@ -445,6 +929,8 @@ class BaseIOStream(object):
             if self._ssl_connect_future is not None:
                 futures.append(self._ssl_connect_future)
                 self._ssl_connect_future = None
+            futures.extend(self._drain_futures)
+            self._drain_futures = []
             for future in futures:
                 if self._is_connreset(self.error):
                     # Treat connection resets as closed connections so
@@ -463,6 +949,7 @@ class BaseIOStream(object):
             # if the IOStream object is kept alive by a reference cycle.
             # TODO: Clear the read buffer too; it currently breaks some tests.
             self._write_buffer = None
+            self._write_files = None
 
     def reading(self):
         """Returns true if we are currently reading from the stream."""
@@ -470,7 +957,7 @@ class BaseIOStream(object):
 
     def writing(self):
         """Returns true if we are currently writing to the stream."""
-        return bool(self._write_buffer)
+        return bool(self._write_buffer) or bool(self._write_files)
 
     def closed(self):
         """Returns true if the stream has been closed."""
@@ -495,6 +982,9 @@ class BaseIOStream(object):
         if self.closed():
             gen_log.warning("Got events for closed stream %s", fd)
             return
+        if self._pipe is not None:
+            self._pipe._handle_events(events)
+            return
         try:
             if self._connecting:
                 # Most IOLoops will report a write failed connect
@@ -519,10 +1009,12 @@ class BaseIOStream(object):
                 # callbacks have had a chance to run.
                 self.io_loop.add_callback(self.close)
                 return
+            if self._edge_triggered:
+                return
             state = self.io_loop.ERROR
             if self.reading():
                 state |= self.io_loop.READ
-            if self.writing():
+            if self.writing() and not self._cork_pending:
                 state |= self.io_loop.WRITE
             if state == self.io_loop.ERROR and self._read_buffer_size == 0:
                 # If the connection is idle, listen for reads too so
@@ -664,6 +1156,16 @@ class BaseIOStream(object):
         return self._read_future
 
     def _run_read_callback(self, size, streaming):
+        if self._user_read_buffer:
+            # The data is already in the caller's buffer; switch back
+            # to our own and report how much was read.
+            (self._read_buffer, self._read_buffer_pos,
+             self._read_buffer_size) = self._after_user_read_buffer
+            self._after_user_read_buffer = None
+            self._user_read_buffer = False
+            result = size
+        else:
+            result = None
         if streaming:
             callback = self._streaming_callback
         else:
@@ -673,10 +1175,12 @@ class BaseIOStream(object):
                 assert callback is None
                 future = self._read_future
                 self._read_future = None
-                future.set_result(self._consume(size))
+                future.set_result(self._consume(size) if result is None
+                                  else result)
         if callback is not None:
             assert (self._read_future is None) or streaming
-            self._run_callback(callback, self._consume(size))
+            self._run_callback(callback, self._consume(size) if result is None
+                               else result)
         else:
             # If we scheduled a callback, we will add the error listener
             # afterwards.  If we didn't, we have to do it now.
@@ -719,11 +1223,35 @@ class BaseIOStream(object):
         """Reads from the socket and appends the result to the read buffer.
 
         Returns the number of bytes read.  Returns 0 if there is nothing
-        to read (i.e. the read returns EWOULDBLOCK or equivalent).  On
-        error closes the socket and raises an exception.
+        to read (i.e. the read returns EWOULDBLOCK or equivalent), closing
+        the stream at end of file.  On error closes the socket and raises
+        an exception.
         """
+        if self._user_read_buffer:
+            # read_into: fill the rest of the caller's buffer.
+            buf = memoryview(self._read_buffer)[self._read_buffer_size:]
+        else:
+            end = self._read_buffer_pos + self._read_buffer_size
+            if len(self._read_buffer) - end < self.read_chunk_size:
+                if self._read_buffer_size:
+                    self._compact_read_buffer()
+                    end = self._read_buffer_size
+                    missing = self.read_chunk_size - (len(self._read_buffer) - end)
+                    if missing > 0:
+                        self._read_buffer.extend(bytearray(missing))
+                else:
+                    self._read_buffer = bytearray(self.read_chunk_size)
+                    self._read_buffer_pos = end = 0
+            buf = memoryview(self._read_buffer)[end:end + self.read_chunk_size]
         try:
-            chunk = self.read_from_fd()
+            try:
+                bytes_read = self.read_from_fd(buf)
+            finally:
+                # The bytearray cannot be resized while this view exists,
+                # and the close() calls below may consume (and shrink) it.
+                # A traceback can still refer to buf, so release it.
+                _release_view(buf)
+                del buf
         except (socket.error, IOError, OSError) as e:
             # ssl.SSLError is a subclass of socket.error
             if self._is_connreset(e):
@@ -734,15 +1262,27 @@ class BaseIOStream(object):
                 return
             self.close(exc_info=True)
             raise
-        if chunk is None:
+        if self._stats is not None:
+            self._stats.reads += 1
+            if bytes_read:
+                self._stats.bytes_read += bytes_read
+        if not bytes_read:
+            if bytes_read == 0:
+                self.close()
             return 0
-        self._read_buffer.append(chunk)
-        self._read_buffer_size += len(chunk)
-        if self._read_buffer_size > self.max_buffer_size:
+        self._read_buffer_size += bytes_read
+        if (self._read_buffer_size > self.max_buffer_size and
+                not self._user_read_buffer):
             gen_log.error("Reached maximum read buffer size")
             self.close()
             raise StreamBufferFullError("Reached maximum read buffer size")
-        return len(chunk)
+        return bytes_read
+
+    def _compact_read_buffer(self):
+        """Moves the unconsumed data to the start of the read buffer."""
+        if self._read_buffer_pos:
+            del self._read_buffer[:self._read_buffer_pos]
+            self._read_buffer_pos = 0
 
     def _run_streaming_callback(self):
         if self._streaming_callback is not None and self._read_buffer_size:
@@ -775,39 +1315,39 @@ class BaseIOStream(object):
             num_bytes = min(self._read_bytes, self._read_buffer_size)
             return num_bytes
         elif self._read_delimiter is not None:
-            # Multi-byte delimiters (e.g. '\r\n') may straddle two
-            # chunks in the read buffer, so we can't easily find them
-            # without collapsing the buffer.  However, since protocols
-            # using delimited reads (as opposed to reads of a known
-            # length) tend to be "line" oriented, the delimiter is likely
-            # to be in the first few chunks.  Merge the buffer gradually
-            # since large merges are relatively expensive and get undone in
-            # _consume().
-            if self._read_buffer:
-                while True:
-                    loc = self._read_buffer[0].find(self._read_delimiter)
-                    if loc != -1:
-                        delimiter_len = len(self._read_delimiter)
-                        self._check_max_bytes(self._read_delimiter,
-                                              loc + delimiter_len)
-                        return loc + delimiter_len
-                    if len(self._read_buffer) == 1:
-                        break
-                    _double_prefix(self._read_buffer)
+            # The buffer is contiguous, so delimiters that straddle two
+            # reads are found without merging anything.
+            if self._read_buffer_size:
+                start = self._read_buffer_pos
+                delimiter_len = len(self._read_delimiter)
+                # Only search the new data, plus enough of the old to
+                # catch a delimiter that straddles the two, so a slowly
+                # arriving message is not rescanned on every read.
+                scan_pos = max(self._read_scan_pos - delimiter_len + 1, 0)
+                loc = self._read_buffer.find(self._read_delimiter,
+                                             start + scan_pos,
+                                             start + self._read_buffer_size)
+                if loc != -1:
+                    loc -= start
+                    self._read_scan_pos = 0
+                    self._check_max_bytes(self._read_delimiter,
+                                          loc + delimiter_len)
+                    return loc + delimiter_len
+                self._read_scan_pos = self._read_buffer_size
                 self._check_max_bytes(self._read_delimiter,
-                                      len(self._read_buffer[0]))
+                                      self._read_buffer_size)
         elif self._read_regex is not None:
-            if self._read_buffer:
-                while True:
-                    m = self._read_regex.search(self._read_buffer[0])
-                    if m is not None:
-                        self._check_max_bytes(self._read_regex, m.end())
-                        return m.end()
-                    if len(self._read_buffer) == 1:
-                        break
-                    _double_prefix(self._read_buffer)
+            if self._read_buffer_size:
+                # Searching from a nonzero pos would change the meaning
+                # of ^ in the pattern, so move the data to the front.
+                self._compact_read_buffer()
+                m = self._read_regex.search(self._read_buffer, 0,
+                                            self._read_buffer_size)
+                if m is not None:
+                    self._check_max_bytes(self._read_regex, m.end())
+                    return m.end()
                 self._check_max_bytes(self._read_regex,
-                                      len(self._read_buffer[0]))
+                                      self._read_buffer_size)
         return None
 
     def _check_max_bytes(self, delimiter, size):
@@ -818,8 +1358,16 @@ class BaseIOStream(object):
                     delimiter, self._read_max_bytes))
 
     def _handle_write(self):
-        while self._write_buffer:
+        while self._write_buffer or self._write_files:
             try:
+                if not self._write_buffer:
+                    self._write_from_file()
+                    continue
+                if self._scatter_gather:
+                    num_bytes = self._write_vectored()
+                    if num_bytes == 0:
+                        break
+                    continue
                 if not self._write_buffer_frozen:
                     # On windows, socket.send blows up if given a
                     # write buffer that's too large, instead of just
@@ -828,6 +1376,8 @@ class BaseIOStream(object):
                     # with more than 128KB at a time.
                     _merge_prefix(self._write_buffer, 128 * 1024)
                 num_bytes = self.write_to_fd(self._write_buffer[0])
+                if self._stats is not None:
+                    self._stats.record_write(num_bytes)
                 if num_bytes == 0:
                     # With OpenSSL, if we couldn't write the entire buffer,
                     # the very same string object must be used on the
@@ -845,6 +1395,8 @@ class BaseIOStream(object):
                 self._write_buffer_size -= num_bytes
             except (socket.error, IOError, OSError) as e:
                 if e.args[0] in _ERRNO_WOULDBLOCK:
+                    if self._stats is not None:
+                        self._stats.record_write(0)
                     self._write_buffer_frozen = True
                     break
                 else:
@@ -856,7 +1408,7 @@ class BaseIOStream(object):
                                         self.fileno(), e)
                     self.close(exc_info=True)
                     return
-        if not self._write_buffer:
+        if not self.writing():
             if self._write_callback:
                 callback = self._write_callback
                 self._write_callback = None
@@ -865,13 +1417,107 @@ class BaseIOStream(object):
                 future = self._write_future
                 self._write_future = None
                 future.set_result(None)
+        self._check_write_watermarks()
+
+    def _write_from_file(self):
+        """Sends the next part of the first file queued by `write_file`.
+
+        Uses `_sendfile_to_fd` when ``self._sendfile`` is true, and
+        otherwise reads a chunk of the file into the write buffer.
+        Once the file is done the data written after it is moved into
+        the write buffer.
+        """
+        pending = self._write_files[0]
+        if self._sendfile:
+            num_bytes = self._sendfile_to_fd(pending.fileobj.fileno(),
+                                             pending.offset, pending.remaining)
+            if self._stats is not None and num_bytes:
+                self._stats.record_write(num_bytes)
+        else:
+            pending.fileobj.seek(pending.offset)
+            chunk = pending.fileobj.read(min(pending.remaining,
+                                             _FILE_CHUNK_SIZE))
+            num_bytes = len(chunk)
+            if num_bytes:
+                self._write_buffer.append(chunk)
+                self._write_buffer_size += num_bytes
+        if not num_bytes:
+            raise IOError("File ended with %d bytes left to write" %
+                          pending.remaining)
+        pending.offset += num_bytes
+        pending.remaining -= num_bytes
+        if not pending.remaining:
+            self._write_files.popleft()
+            self._write_buffer.extend(pending.tail)
+
+    def _sendfile_to_fd(self, in_fd, offset, count):
+        """Attempts to copy ``count`` bytes of the file ``in_fd`` starting
+        at ``offset`` to the underlying file without reading them into
+        Python.
+
+        Only called when ``self._sendfile`` is true.  Returns the number
+        of bytes written, which may be less than ``count``.
+        """
+        raise NotImplementedError()
+
+    def _write_vectored(self):
+        """Writes as much of the write buffer as possible with one call to
+        `_write_vectored_to_fd`, and drops what was written.
+        """
+        write_buffer = self._write_buffer
+        pos = self._write_buffer_pos
+        buffers = []
+        total = 0
+        for chunk in write_buffer:
+            if pos:
+                chunk = memoryview(chunk)[pos:]
+                pos = 0
+            buffers.append(chunk)
+            total += len(chunk)
+            # Collecting more than the kernel will take in one call just
+            # costs time when many small writes are queued.
+            if len(buffers) == _IOV_MAX or total >= _WRITEV_MAX_BYTES:
+                break
+        num_bytes = self._write_vectored_to_fd(buffers)
+        if self._stats is not None:
+            self._stats.record_write(num_bytes)
+        if not num_bytes:
+            return 0
+        self._write_buffer_size -= num_bytes
+        remaining = num_bytes
+        while remaining:
+            size = len(write_buffer[0]) - self._write_buffer_pos
+            if remaining < size:
+                self._write_buffer_pos += remaining
+                break
+            write_buffer.popleft()
+            self._write_buffer_pos = 0
+            remaining -= size
+        return num_bytes
+
+    def _write_vectored_to_fd(self, buffers):
+        """Attempts to write the list of ``buffers`` to the underlying file.
+
+        Only called when ``self._scatter_gather`` is true.  Returns the
+        number of bytes written, which may be less than the total.
+        """
+        raise NotImplementedError()
 
     def _consume(self, loc):
         if loc == 0:
             return b""
-        _merge_prefix(self._read_buffer, loc)
+        assert loc <= self._read_buffer_size
+        pos = self._read_buffer_pos
+        b = memoryview(self._read_buffer)[pos:pos + loc].tobytes()
         self._read_buffer_size -= loc
-        return self._read_buffer.popleft()
+        if self._read_buffer_size:
+            self._read_buffer_pos += loc
+        else:
+            # Everything has been consumed: let go of the storage, so an
+            # idle stream does not hold on to a whole read chunk.
+            self._read_buffer = bytearray()
+            self._read_buffer_pos = 0
+        return b
 
     def _check_closed(self):
         if self.closed():
@@ -917,11 +1563,20 @@ class BaseIOStream(object):
         if self.closed():
             # connection has been closed, so there can be no future events
             return
+        if self._pipe is not None:
+            # The StreamPipe decides which events to listen for.
+            return
         if self._state is None:
+            if self._edge_triggered:
+                state = (ioloop.IOLoop.READ | ioloop.IOLoop.WRITE |
+                         ioloop.IOLoop.EDGE)
             self._state = ioloop.IOLoop.ERROR | state
             with stack_context.NullContext():
                 self.io_loop.add_handler(
                     self.fileno(), self._handle_events, self._state)
+        elif self._edge_triggered:
+            # Already registered for everything.
+            return
         elif not self._state & state:
             self._state = self._state | state
             self.io_loop.update_handler(self.fileno(), self._state)
@@ -987,6 +1642,11 @@ class IOStream(BaseIOStream):
         self.socket = socket
         self.socket.setblocking(False)
         super(IOStream, self).__init__(*args, **kwargs)
+        # Hand the queued chunks to sendmsg together instead of merging
+        # them into one string first.
+        self._scatter_gather = hasattr(self.socket, "sendmsg")
+        self._sendfile = hasattr(os, "sendfile")
+        self._splice = hasattr(os, "splice")
 
     def fileno(self):
         return self.socket
@@ -1000,22 +1660,25 @@ class IOStream(BaseIOStream):
                                        socket.SO_ERROR)
         return socket.error(errno, os.strerror(errno))
 
-    def read_from_fd(self):
+    def read_from_fd(self, buf):
         try:
-            chunk = self.socket.recv(self.read_chunk_size)
+            bytes_read = self.socket.recv_into(buf)
         except socket.error as e:
             if e.args[0] in _ERRNO_WOULDBLOCK:
                 return None
             else:
                 raise
-        if not chunk:
-            self.close()
-            return None
-        return chunk
+        return bytes_read
 
     def write_to_fd(self, data):
         return self.socket.send(data)
 
+    def _write_vectored_to_fd(self, buffers):
+        return self.socket.sendmsg(buffers)
+
+    def _sendfile_to_fd(self, in_fd, offset, count):
+        return os.sendfile(self.socket.fileno(), in_fd, offset, count)
+
     def connect(self, address, callback=None, server_hostname=None):
         """Connects the socket to a remote address without blocking.
 
@@ -1081,7 +1744,8 @@ class IOStream(BaseIOStream):
         self._add_io_state(self.io_loop.WRITE)
         return future
 
-    def start_tls(self, server_side, ssl_options=None, server_hostname=None):
+    def start_tls(self, server_side, ssl_options=None, server_hostname=None,
+                  ssl_session_cache=None):
         """Convert this `IOStream` to an `SSLIOStream`.
 
         This enables protocols that begin in clear-text mode and
@@ -1109,18 +1773,25 @@ class IOStream(BaseIOStream):
         If a close callback is defined on this stream, it will be
         transferred to the new stream.
 
+        For client connections, ``ssl_session_cache`` may be a
+        `.SSLSessionCache` used to resume an earlier session with the
+        same server.
+
         .. versionadded:: 4.0
 
         .. versionchanged:: 4.2
            SSL certificates are validated by default; pass
            ``ssl_options=dict(cert_reqs=ssl.CERT_NONE)`` or a
            suitably-configured `ssl.SSLContext` to disable.
+
+        .. versionchanged:: 4.3
+           Added the ``ssl_session_cache`` argument.
         """
         if (self._read_callback or self._read_future or
                 self._write_callback or self._write_future or
                 self._connect_callback or self._connect_future or
                 self._pending_callbacks or self._closed or
-                self._read_buffer or self._write_buffer):
+                self._read_buffer_size or self.writing()):
             raise ValueError("IOStream is not idle; cannot convert to SSL")
         if ssl_options is None:
             if server_side:
@@ -1141,6 +1812,8 @@ class IOStream(BaseIOStream):
         future = TracebackFuture()
         ssl_stream = SSLIOStream(socket, ssl_options=ssl_options,
                                  io_loop=self.io_loop)
+        if ssl_session_cache is not None and not server_side:
+            ssl_stream._resume_ssl_session(ssl_session_cache, server_hostname)
         # Wrap the original close callback so we can fail our Future as well.
         # If we had an "unwrap" counterpart to this method we would need
         # to restore the original callback after our Future resolves
@@ -1214,14 +1887,39 @@ class SSLIOStream(IOStream):
         """The ``ssl_options`` keyword argument may either be an
         `ssl.SSLContext` object or a dictionary of keywords arguments
         for `ssl.wrap_socket`
+
+        The ``ssl_session_cache`` keyword argument may be a
+        `.SSLSessionCache`; `connect` then resumes an earlier session
+        with the same server when it can, and stores the new session
+        for later connections.
+
+        .. versionchanged:: 4.3
+           Added the ``ssl_session_cache`` argument.
         """
         self._ssl_options = kwargs.pop('ssl_options', _client_ssl_defaults)
+        self._ssl_session_cache = kwargs.pop('ssl_session_cache', None)
         super(SSLIOStream, self).__init__(*args, **kwargs)
         self._ssl_accepting = True
         self._handshake_reading = False
         self._handshake_writing = False
         self._ssl_connect_callback = None
         self._server_hostname = None
+        # The SSLSessionCache key of a client connection whose session
+        # is cached (see _resume_ssl_session).
+        self._ssl_session_key = None
+        # True once the handshake is done and the peer's certificate
+        # has passed _verify_cert; only then is the session cached.
+        self._ssl_verified = False
+        # The handshake and the SSL object's internal buffering rely on
+        # level-triggered notifications.
+        self._edge_triggered = False
+        # OpenSSL needs the very same buffer again after a partial write
+        # (see _write_buffer_frozen), so write one merged chunk at a time.
+        self._scatter_gather = False
+        # The file's contents have to be encrypted, so write_file reads
+        # them into the write buffer.
+        self._sendfile = False
+        self._splice = False
 
         # If the socket is already connected, attempt to start the handshake.
         try:
@@ -1283,8 +1981,50 @@ class SSLIOStream(IOStream):
             if not self._verify_cert(self.socket.getpeercert()):
                 self.close()
                 return
+            self._ssl_verified = True
+            if self._ssl_session_key is not None:
+                self._ssl_session_cache.record_handshake(
+                    self.socket.session_reused)
+                self._save_ssl_session()
             self._run_ssl_connect_callback()
 
+    def _resume_ssl_session(self, cache, server_hostname):
+        """Starts using ``cache`` for this client connection, resuming
+        the cached session for this server if there is one.
+
+        Must be called before the handshake starts.
+        """
+        if not cache.supported:
+            return
+        try:
+            address = self.socket.getpeername()
+        except socket.error:
+            return
+        self._ssl_session_cache = cache
+        self._ssl_session_key = (server_hostname or address[0], address[1])
+        session = cache.get(self._ssl_session_key, self.socket.context)
+        if session is not None:
+            self.socket.session = session
+
+    def _save_ssl_session(self):
+        session = self.socket.session
+        # A TLS 1.3 session can only be resumed once the server has
+        # sent a ticket, which may arrive after the handshake; this is
+        # called again when the stream is closed.
+        if session is not None and (session.has_ticket or
+                                    self.socket.version() != 'TLSv1.3'):
+            self._ssl_session_cache.put(self._ssl_session_key, session,
+                                        self.socket.context)
+
+    def close_fd(self):
+        if self._ssl_session_key is not None and self._ssl_verified:
+            try:
+                self._save_ssl_session()
+            except (socket.error, ValueError):
+                # The connection is already unusable.
+                pass
+        super(SSLIOStream, self).close_fd()
+
     def _run_ssl_connect_callback(self):
         if self._ssl_connect_callback is not None:
             callback = self._ssl_connect_callback
@@ -1362,6 +2102,9 @@ class SSLIOStream(IOStream):
         self.socket = ssl_wrap_socket(self.socket, self._ssl_options,
                                       server_hostname=self._server_hostname,
                                       do_handshake_on_connect=False)
+        if self._ssl_session_cache is not None:
+            self._resume_ssl_session(self._ssl_session_cache,
+                                     self._server_hostname)
         self._add_io_state(old_state)
 
     def wait_for_handshake(self, callback=None):
@@ -1409,7 +2152,7 @@ class SSLIOStream(IOStream):
                 return 0
             raise
 
-    def read_from_fd(self):
+    def read_from_fd(self, buf):
         if self._ssl_accepting:
             # If the handshake hasn't finished yet, there can't be anything
             # to read (attempting to read may or may not raise an exception
@@ -1421,7 +2164,7 @@ class SSLIOStream(IOStream):
             # The recv() method blocks (at least in python 2.6) if it is
             # called when there is nothing to read, so we have to use
             # read() instead.
-            chunk = self.socket.read(self.read_chunk_size)
+            bytes_read = self.socket.read(len(buf), buf)
         except ssl.SSLError as e:
             # SSLError is a subclass of socket.error, so this except
             # block must come first.
@@ -1434,10 +2177,7 @@ class SSLIOStream(IOStream):
                 return None
             else:
                 raise
-        if not chunk:
-            self.close()
-            return None
-        return chunk
+        return bytes_read
 
     def _is_connreset(self, e):
         if isinstance(e, ssl.SSLError) and e.args[0] == ssl.SSL_ERROR_EOF:
@@ -1467,32 +2207,294 @@ class PipeIOStream(BaseIOStream):
     def write_to_fd(self, data):
         return os.write(self.fd, data)
 
-    def read_from_fd(self):
+    def read_from_fd(self, buf):
         try:
-            chunk = os.read(self.fd, self.read_chunk_size)
+            bytes_read = _readinto(self.fd, buf)
         except (IOError, OSError) as e:
             if errno_from_exception(e) in _ERRNO_WOULDBLOCK:
                 return None
             elif errno_from_exception(e) == errno.EBADF:
                 # If the writing half of a pipe is closed, select will
                 # report it as readable but reads will fail with EBADF.
-                self.close(exc_info=True)
-                return None
+                self.error = e
+                return 0
             else:
                 raise
-        if not chunk:
-            self.close()
-            return None
-        return chunk
+        return bytes_read
+
+
+if hasattr(os, 'readv'):
+    def _readinto(fd, buf):
+        return os.readv(fd, [buf])
+else:
+    def _readinto(fd, buf):
+        # Python 2 has no way to read a raw fd into a buffer.
+        data = os.read(fd, len(buf))
+        buf[:len(data)] = data
+        return len(data)
+
+
+def pipe_streams(a, b, chunk_size=65536):
+    """Forwards data in both directions between streams ``a`` and ``b``.
 
+    Shortcut for ``StreamPipe(a, b, chunk_size).start()``: returns a
+    `.Future` that resolves to the `StreamPipe` once either stream has
+    closed (and the other one has been closed too).
 
-def _double_prefix(deque):
-    """Grow by doubling, but don't split the second chunk just because the
-    first one is small.
+    .. versionadded:: 4.3
     """
-    new_len = max(len(deque[0]) * 2,
-                  (len(deque[0]) + len(deque[1])))
-    _merge_prefix(deque, new_len)
+    return StreamPipe(a, b, chunk_size).start()
+
+
+class StreamPipe(object):
+    """Copies everything read from one stream to the other, both ways.
+
+    This is the core of a TCP proxy.  When both streams are plain
+    `IOStream` sockets and `os.splice` is available (Linux, Python
+    3.10+), data is moved from socket to socket through a kernel pipe
+    and never enters Python; ``spliced`` is then true.  Otherwise (for
+    example with an `SSLIOStream`) each direction reads up to
+    ``chunk_size`` bytes at a time and writes them to the other stream.
+
+    Either way a direction stops reading while the other stream can't
+    keep up: a spliced direction holds at most ``chunk_size`` bytes
+    (or the size of the kernel pipe, if smaller) in flight, and the
+    buffered copy waits for `~BaseIOStream.wait_for_drain` after each
+    write, so write watermarks set on the streams are honored.
+
+    When either stream closes, whatever was read from it is delivered
+    and both streams are closed.  ``bytes_a_to_b`` and ``bytes_b_to_a``
+    count the bytes delivered so far.  Neither stream may be read from
+    or written to while it is piped; data already in their buffers is
+    forwarded first.
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, a, b, chunk_size=65536):
+        self.a = a
+        self.b = b
+        self.chunk_size = chunk_size
+        self.spliced = a._splice and b._splice
+        self._transferred = [0, 0]
+        self._channels = []
+        self._future = None
+        self._done = None
+
+    @property
+    def bytes_a_to_b(self):
+        return self._transferred[0]
+
+    @property
+    def bytes_b_to_a(self):
+        return self._transferred[1]
+
+    def start(self):
+        """Starts forwarding.
+
+        Returns a `.Future` that resolves to this object when the pipe
+        is finished.
+        """
+        # (An SSLIOStream's reading() is also true during the
+        # handshake, which is fine.)
+        assert not (BaseIOStream.reading(self.a) or
+                    BaseIOStream.reading(self.b)), \
+            "Can't pipe streams that are being read"
+        if self._future is None:
+            self._future = self._run()
+        return self._future
+
+    @gen.coroutine
+    def _run(self):
+        try:
+            if self.spliced:
+                yield self._flush_buffers()
+                if not (self.a.closed() or self.b.closed()):
+                    self._done = TracebackFuture()
+                    self._attach()
+                    yield self._done
+            else:
+                yield [self._copy(self.a, self.b, 0),
+                       self._copy(self.b, self.a, 1)]
+        except StreamClosedError:
+            pass
+        finally:
+            self.a.close()
+            self.b.close()
+        raise gen.Return(self)
+
+    @gen.coroutine
+    def _copy(self, src, dst, direction):
+        try:
+            while True:
+                data = yield src.read_bytes(self.chunk_size, partial=True)
+                dst.write(data)
+                self._transferred[direction] += len(data)
+                yield dst.wait_for_drain()
+        except StreamClosedError:
+            pass
+        finally:
+            # Stops the other direction too.
+            src.close()
+            dst.close()
+
+    @gen.coroutine
+    def _flush_buffers(self):
+        # Forward what the streams have already read, and wait until
+        # everything written to them is sent, so the sockets are left
+        # to the pipe.  Idle streams may read more in the meantime.
+        streams = [(self.a, self.b, 0), (self.b, self.a, 1)]
+        while True:
+            for src, dst, direction in streams:
+                if src._read_buffer_size:
+                    size = src._read_buffer_size
+                    dst.write(src._consume(size))
+                    self._transferred[direction] += size
+            if not (self.a._read_buffer_size or self.b._read_buffer_size or
+                    self.a.writing() or self.b.writing()):
+                return
+            yield [self.a.write(b""), self.b.write(b"")]
+
+    def _attach(self):
+        for src, dst in [(self.a, self.b), (self.b, self.a)]:
+            pipe_r, pipe_w = os.pipe2(os.O_NONBLOCK | os.O_CLOEXEC)
+            try:
+                capacity = fcntl.fcntl(pipe_w, fcntl.F_GETPIPE_SZ)
+            except (AttributeError, IOError, OSError):
+                capacity = 65536
+            self._channels.append(_SpliceChannel(
+                src, dst, pipe_r, pipe_w, min(self.chunk_size, capacity)))
+        for stream in (self.a, self.b):
+            # Make sure the fd is registered; from now on its events
+            # come to _handle_events.
+            stream._add_io_state(ioloop.IOLoop.READ)
+            stream._pipe = self
+        self._update_state()
+
+    def _handle_events(self, events):
+        if self._done is None or self._done.done():
+            return
+        # In edge-triggered mode a notification only comes after
+        # EAGAIN, so keep going until then.
+        edge_triggered = self.a._edge_triggered or self.b._edge_triggered
+        limit = None if edge_triggered else 16
+        try:
+            for direction, channel in enumerate(self._channels):
+                self._transferred[direction] += channel.pump(limit)
+        except (IOError, OSError) as e:
+            if not self.a._is_connreset(e):
+                gen_log.warning("Error piping streams: %s", e)
+            self._finish()
+            return
+        if events & ioloop.IOLoop.ERROR or any(
+                channel.eof and not channel.pending
+                for channel in self._channels):
+            self._finish()
+            return
+        self._update_state()
+
+    def _update_state(self):
+        states = {self.a: ioloop.IOLoop.ERROR, self.b: ioloop.IOLoop.ERROR}
+        for channel in self._channels:
+            if not channel.eof and channel.pending < channel.capacity:
+                states[channel.src] |= ioloop.IOLoop.READ
+            if channel.pending:
+                states[channel.dst] |= ioloop.IOLoop.WRITE
+        for stream, state in states.items():
+            if stream._edge_triggered or state == stream._state:
+                continue
+            stream._state = state
+            stream.io_loop.update_handler(stream.fileno(), state)
+
+    def _finish(self):
+        if self._done is None or self._done.done():
+            return
+        for channel in self._channels:
+            channel.close()
+        self.a._pipe = self.b._pipe = None
+        self._done.set_result(None)
+
+
+class _SpliceChannel(object):
+    """One direction of a spliced `StreamPipe`: moves data from
+    ``src``'s socket into a kernel pipe, and from there to ``dst``'s.
+    """
+    __slots__ = ('src', 'dst', 'src_fd', 'dst_fd', 'pipe_r', 'pipe_w',
+                 'capacity', 'pending', 'eof')
+
+    def __init__(self, src, dst, pipe_r, pipe_w, capacity):
+        self.src = src
+        self.dst = dst
+        self.src_fd = src.socket.fileno()
+        self.dst_fd = dst.socket.fileno()
+        self.pipe_r = pipe_r
+        self.pipe_w = pipe_w
+        self.capacity = capacity
+        # Bytes in the pipe, waiting to be spliced to dst.
+        self.pending = 0
+        self.eof = False
+
+    def pump(self, limit):
+        """Moves data until both ends would block, or ``limit`` rounds.
+
+        Returns the number of bytes delivered to ``dst``.
+        """
+        delivered = 0
+        rounds = 0
+        while limit is None or rounds < limit:
+            rounds += 1
+            progress = False
+            if self.pending:
+                try:
+                    n = os.splice(self.pipe_r, self.dst_fd, self.pending,
+                                  flags=_SPLICE_FLAGS)
+                except (IOError, OSError) as e:
+                    if errno_from_exception(e) not in _ERRNO_WOULDBLOCK:
+                        raise
+                    n = 0
+                if self.dst._stats is not None:
+                    self.dst._stats.record_write(n)
+                if n:
+                    self.pending -= n
+                    delivered += n
+                    progress = True
+            if not self.eof and self.pending < self.capacity:
+                try:
+                    n = os.splice(self.src_fd, self.pipe_w,
+                                  self.capacity - self.pending,
+                                  flags=_SPLICE_FLAGS)
+                except (IOError, OSError) as e:
+                    if errno_from_exception(e) not in _ERRNO_WOULDBLOCK:
+                        raise
+                    n = None
+                if self.src._stats is not None:
+                    self.src._stats.reads += 1
+                    self.src._stats.bytes_read += n or 0
+                if n == 0:
+                    self.eof = True
+                    progress = True
+                elif n:
+                    self.pending += n
+                    progress = True
+            if not progress:
+                break
+        return delivered
+
+    def close(self):
+        os.close(self.pipe_r)
+        os.close(self.pipe_w)
+
+
+class _PendingFile(object):
+    """A file queued by `BaseIOStream.write_file`, and the data written
+    after it.
+    """
+    __slots__ = ('fileobj', 'offset', 'remaining', 'tail')
+
+    def __init__(self, fileobj, offset, remaining):
+        self.fileobj = fileobj
+        self.offset = offset
+        self.remaining = remaining
+        self.tail = []
 
 
 def _merge_prefix(deque, size):
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+#
+# Measures the throughput of IOLoop.add_callback when worker threads post
+# results back to the IOLoop, and how many times the waker is written.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.callback_benchmark --threads=8
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import threading
+import time
+
+from tornado.ioloop import IOLoop
+from tornado.options import options, define, parse_command_line
+
+define('threads', default=4, help='number of posting threads')
+define('callbacks', default=50000, help='callbacks posted by each thread')
+
+
+def main():
+    parse_command_line()
+    io_loop = IOLoop(make_current=False)
+    total = options.threads * options.callbacks
+    counter = [0]
+    wakes = [0]
+    wake = io_loop._waker.wake
+
+    def counting_wake():
+        wakes[0] += 1
+        wake()
+    io_loop._waker.wake = counting_wake
+
+    def callback():
+        counter[0] += 1
+        if counter[0] == total:
+            io_loop.stop()
+
+    def worker():
+        add_callback = io_loop.add_callback
+        for i in range(options.callbacks):
+            add_callback(callback)
+
+    threads = [threading.Thread(target=worker) for i in range(options.threads)]
+    start = time.time()
+    for t in threads:
+        t.start()
+    io_loop.start()
+    elapsed = time.time() - start
+    for t in threads:
+        t.join()
+    io_loop.close()
+    print('%d callbacks from %d threads in %.3f s (%.0f/s), %d waker writes' % (
+        total, options.threads, elapsed, total / elapsed, wakes[0]))
+
+
+if __name__ == '__main__':
+    main()
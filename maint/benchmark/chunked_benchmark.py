@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# A benchmark of chunked HTTP responses over loopback keep-alive
+# connections.  The handler answers each request with several small
+# chunks, flushing after each one, so every response is made of many
+# stream writes.  The run is repeated with write corking on (see
+# BaseIOStream.set_write_cork) and reports requests per second and the
+# write system calls the server made per response.  Data is sent as it
+# is written, so on loopback the number of packets follows the number
+# of write calls.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.chunked_benchmark --requests=5000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+import time
+
+from tornado import gen
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream, track_streams
+from tornado.netutil import bind_sockets
+from tornado.options import options, define, parse_command_line
+from tornado.web import Application, RequestHandler
+
+define('requests', default=5000, help='requests per connection')
+define('connections', default=4, help='concurrent keep-alive connections')
+define('chunks', default=8, help='chunks written per response')
+define('chunk_size', default=128, help='size of each chunk')
+define('cork_threshold', default=16384,
+       help='write_cork_threshold for the corked run')
+define('repeat', default=3, help='runs per mode; the fastest is reported')
+
+
+class ChunkedHandler(RequestHandler):
+    def get(self):
+        self.application.server_streams.add(self.request.connection.stream)
+        chunk = b'x' * options.chunk_size
+        for i in range(options.chunks):
+            self.write(chunk)
+            self.flush()
+
+
+@gen.coroutine
+def client(io_loop, port):
+    stream = IOStream(socket.socket(), io_loop=io_loop)
+    yield stream.connect(('127.0.0.1', port))
+    for i in range(options.requests):
+        yield stream.write(b'GET / HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        yield stream.read_until(b'\r\n\r\n')
+        yield stream.read_until(b'\r\n0\r\n\r\n')
+    stream.close()
+
+
+def run(cork_threshold):
+    io_loop = IOLoop(make_current=False)
+    app = Application([('/', ChunkedHandler)],
+                      log_function=lambda handler: None)
+    app.server_streams = set()
+    server = HTTPServer(app, io_loop=io_loop,
+                        write_cork_threshold=cork_threshold)
+    [sock] = bind_sockets(0, '127.0.0.1', family=socket.AF_INET)
+    port = sock.getsockname()[1]
+    server.add_sockets([sock])
+
+    @gen.coroutine
+    def main():
+        yield [client(io_loop, port) for i in range(options.connections)]
+    # Count the server's system calls; the clients' are the same in
+    # both modes.
+    track_streams()
+    try:
+        start = time.time()
+        io_loop.run_sync(main)
+        elapsed = time.time() - start
+    finally:
+        track_streams(False)
+    writes = sum(stream.get_stats().writes for stream in app.server_streams)
+    server.stop()
+    io_loop.close(all_fds=True)
+    return elapsed, writes
+
+
+def main():
+    parse_command_line()
+    total = options.requests * options.connections
+    for name, threshold in [('plain', None),
+                            ('corked', options.cork_threshold)]:
+        results = [run(threshold) for i in range(options.repeat)]
+        elapsed, writes = min(results)
+        print('%-6s %0.3f s, %d requests/s, %0.2f writes per response' % (
+            name, elapsed, total / elapsed, writes / total))
+
+
+if __name__ == '__main__':
+    main()
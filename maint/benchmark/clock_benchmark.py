@@ -0,0 +1,87 @@
+#!/usr/bin/env python
+#
+# A microbenchmark of the IOLoop clock under a timeout-heavy workload:
+# every callback sets and cancels a few timeouts relative to IOLoop.time()
+# (as gen.with_timeout and keep-alive handling do), comparing a clock read
+# per call with the cached clock (coarse_time=True), which reads the clock
+# once per iteration and once after each callback.
+# The number of clock reads is reported alongside the run time; the gain
+# in run time depends on how expensive the clock is on the platform
+# (cheap with a vDSO, a real syscall on some virtual machines).
+#
+# Usage:
+#   python -m tornado.maint.benchmark.clock_benchmark --callbacks=200000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import time
+
+from tornado.ioloop import IOLoop
+from tornado.options import options, define, parse_command_line
+from tornado.platform.auto import monotonic_time
+
+define('callbacks', default=200000, help='number of callbacks to run')
+define('batch', default=100, help='callbacks queued per loop iteration')
+define('timeouts', default=4, help='timeouts set and cancelled per callback')
+define('repeat', default=3, help='runs per variant; the fastest is reported')
+
+
+def noop():
+    pass
+
+
+def run(coarse_time, time_func):
+    io_loop = IOLoop(make_current=False, coarse_time=coarse_time,
+                     time_func=time_func)
+    remaining = [options.callbacks]
+
+    def callback():
+        for i in range(options.timeouts):
+            handle = io_loop.call_later(30, noop)
+            io_loop.remove_timeout(handle)
+        remaining[0] -= 1
+        if remaining[0] % options.batch == 0:
+            if remaining[0] <= 0:
+                io_loop.stop()
+                return
+            for i in range(options.batch):
+                io_loop.add_callback(callback)
+
+    for i in range(options.batch):
+        io_loop.add_callback(callback)
+    start = time.time()
+    io_loop.start()
+    elapsed = time.time() - start
+    io_loop.close()
+    return elapsed
+
+
+def count_reads(coarse_time, time_func):
+    reads = [0]
+
+    def counting_time():
+        reads[0] += 1
+        return time_func()
+    run(coarse_time, counting_time)
+    return reads[0]
+
+
+def main():
+    parse_command_line()
+    clocks = [('time.time', time.time)]
+    if monotonic_time is not None:
+        clocks.append(('monotonic', monotonic_time))
+    for clock_name, time_func in clocks:
+        for name, coarse_time in [('precise', False), ('coarse', True)]:
+            elapsed = min(run(coarse_time, time_func)
+                          for i in range(options.repeat))
+            reads = count_reads(coarse_time, time_func)
+            print('%-10s %-8s %0.3f s, %0.3f us per callback, '
+                  '%0.3f clock reads per callback' % (
+                      clock_name, name, elapsed,
+                      elapsed / options.callbacks * 1e6,
+                      reads / options.callbacks))
+
+
+if __name__ == '__main__':
+    main()
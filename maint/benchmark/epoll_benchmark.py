@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+#
+# Counts epoll syscalls made while serving keep-alive HTTP requests, with
+# the EPollIOLoop in its default level-triggered mode and in edge-triggered
+# mode.  Client and server run on the same IOLoop, so the counts include
+# both sides of each connection.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.epoll_benchmark --requests=2000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+import time
+
+from tornado import gen
+from tornado.httpserver import HTTPServer
+from tornado.iostream import IOStream
+from tornado.options import options, define, parse_command_line
+from tornado.platform.epoll import EPollIOLoop
+from tornado.testing import bind_unused_port
+from tornado.web import Application, RequestHandler
+
+define('requests', default=2000, help='number of requests per connection')
+define('connections', default=4, help='number of keep-alive connections')
+
+
+class CountingEpoll(object):
+    """Wraps a select.epoll object and counts the calls made to it."""
+    def __init__(self, impl):
+        self.impl = impl
+        self.counts = dict(register=0, modify=0, unregister=0, poll=0)
+
+    def fileno(self):
+        return self.impl.fileno()
+
+    def close(self):
+        self.impl.close()
+
+    def register(self, fd, events):
+        self.counts['register'] += 1
+        self.impl.register(fd, events)
+
+    def modify(self, fd, events):
+        self.counts['modify'] += 1
+        self.impl.modify(fd, events)
+
+    def unregister(self, fd):
+        self.counts['unregister'] += 1
+        self.impl.unregister(fd)
+
+    def poll(self, timeout):
+        self.counts['poll'] += 1
+        return self.impl.poll(timeout)
+
+
+class CountingEPollIOLoop(EPollIOLoop):
+    def initialize(self, **kwargs):
+        super(CountingEPollIOLoop, self).initialize(**kwargs)
+        self._impl = CountingEpoll(self._impl)
+
+
+class HelloHandler(RequestHandler):
+    def get(self):
+        self.write("Hello, world")
+
+
+@gen.coroutine
+def client(port, io_loop):
+    stream = IOStream(socket.socket(), io_loop=io_loop)
+    yield stream.connect(('127.0.0.1', port))
+    for i in range(options.requests):
+        stream.write(b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        header_data = yield stream.read_until(b"\r\n\r\n")
+        length = int(header_data.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        yield stream.read_bytes(length)
+    stream.close()
+
+
+def run(edge_triggered):
+    io_loop = CountingEPollIOLoop(make_current=False,
+                                  edge_triggered=edge_triggered)
+    sock, port = bind_unused_port()
+    app = Application([('/', HelloHandler)], log_function=lambda handler: None)
+    server = HTTPServer(app, io_loop=io_loop)
+    server.add_socket(sock)
+
+    @gen.coroutine
+    def main():
+        yield [client(port, io_loop) for i in range(options.connections)]
+    start = time.time()
+    io_loop.run_sync(main)
+    elapsed = time.time() - start
+    counts = io_loop._impl.counts
+    server.stop()
+    io_loop.close(all_fds=True)
+    return counts, elapsed
+
+
+def main():
+    parse_command_line()
+    total = options.requests * options.connections
+    for name, edge_triggered in [('level', False), ('edge', True)]:
+        counts, elapsed = run(edge_triggered)
+        ctl = counts['register'] + counts['modify'] + counts['unregister']
+        print('%-5s epoll_ctl: %6d (%.2f per request; modify=%d)  '
+              'epoll_wait: %6d  %.3f s' % (
+                  name, ctl, float(ctl) / total, counts['modify'],
+                  counts['poll'], elapsed))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+#
+# A microbenchmark of HTTP/1.x header parsing: the header block of a
+# typical browser request is parsed with parse_header_block, which works
+# on the bytes in one pass, and with the str-based parser it replaced in
+# HTTP1Connection (decode the whole block as latin1, then split it with
+# HTTPHeaders.parse).  A short curl-style request is measured too.
+#
+# The "lookups" runs parse each block and then look up the headers a
+# request typically needs (those HTTP1Connection and HTTPServerRequest
+# check, plus a cookie), comparing HTTPHeaders with LazyHTTPHeaders
+# (parse_header_block(lazy=True)).  The memory each request's headers
+# keep alive is measured with tracemalloc; for LazyHTTPHeaders this
+# includes the raw header block it holds on to.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.header_benchmark --parses=100000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    # Python 2
+    tracemalloc = None
+
+from tornado.escape import native_str
+from tornado.httputil import HTTPHeaders, parse_header_block
+from tornado.options import options, define, parse_command_line
+
+define('parses', default=100000, help='header blocks parsed per run')
+define('repeat', default=3, help='runs per parser; the fastest is reported')
+
+BROWSER_REQUEST = b"\r\n".join([
+    b"GET /static/app.js?v=123 HTTP/1.1",
+    b"Host: www.example.com",
+    b"Connection: keep-alive",
+    b"Cache-Control: max-age=0",
+    b"User-Agent: Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    b"(KHTML, like Gecko) Chrome/45.0.2454.85 Safari/537.36",
+    b"Accept: text/html,application/xhtml+xml,application/xml;q=0.9,"
+    b"image/webp,*/*;q=0.8",
+    b"Referer: https://www.example.com/index.html",
+    b"Accept-Encoding: gzip, deflate, sdch",
+    b"Accept-Language: en-US,en;q=0.8",
+    b"Cookie: _xsrf=2|fe3b2a5c|0a5b8c2d|1443000000; session=abcdef0123456789",
+    b"If-None-Match: \"5ce0d3a1e8b4f\"",
+    b"If-Modified-Since: Wed, 23 Sep 2015 10:00:00 GMT",
+    b"X-Requested-With: XMLHttpRequest",
+    b"", b""])
+
+CURL_REQUEST = (b"GET / HTTP/1.1\r\nHost: localhost:8888\r\n"
+                b"User-Agent: curl/7.43.0\r\nAccept: */*\r\n\r\n")
+
+
+def str_parser(data):
+    # HTTP1Connection._parse_headers before parse_header_block.
+    data = native_str(data.decode('latin1')).lstrip("\r\n")
+    eol = data.find("\n")
+    start_line = data[:eol].rstrip("\r")
+    headers = HTTPHeaders.parse(data[eol:])
+    return start_line, headers
+
+
+LOOKUPS = ["Connection", "Content-Length", "Transfer-Encoding", "Expect",
+           "Host", "X-Real-Ip", "Cookie"]
+
+
+def eager_lookups(data):
+    start_line, headers = parse_header_block(data)
+    for name in LOOKUPS:
+        headers.get(name)
+    return headers
+
+
+def lazy_lookups(data):
+    start_line, headers = parse_header_block(data, lazy=True)
+    for name in LOOKUPS:
+        headers.get(name)
+    return headers
+
+
+def run(parser, data):
+    start = time.time()
+    for i in range(options.parses):
+        parser(data)
+    return time.time() - start
+
+
+def retained_size(parser, data, count=1000):
+    # Each request gets its own copy of the header block, as it would
+    # from the IOStream.
+    copies = [bytes(bytearray(data)) for i in range(count)]
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    results = []
+    for i in range(count):
+        results.append(parser(copies.pop()))
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size // count
+
+
+def main():
+    parse_command_line()
+    for name, data in [('browser', BROWSER_REQUEST), ('curl', CURL_REQUEST)]:
+        assert str_parser(data) == parse_header_block(data)
+        for parser in [str_parser, parse_header_block]:
+            elapsed = min(run(parser, data) for i in range(options.repeat))
+            print('%-8s %-18s %0.3f s, %0.2f us per parse' % (
+                name, parser.__name__, elapsed,
+                elapsed / options.parses * 1e6))
+        for parser in [eager_lookups, lazy_lookups]:
+            elapsed = min(run(parser, data) for i in range(options.repeat))
+            if tracemalloc is not None:
+                memory = ', %d bytes per request' % retained_size(parser, data)
+            else:
+                memory = ''
+            print('%-8s %-18s %0.3f s, %0.2f us per request%s' % (
+                name, parser.__name__, elapsed,
+                elapsed / options.parses * 1e6, memory))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python
+#
+# A throughput benchmark of IOStream reads over a loopback socket pair.
+# A writer pushes a fixed amount of data through a socket pair while the
+# reader consumes it with read_bytes (fixed-size records), read_into
+# (the same records read into one reused bytearray), read_until
+# (newline-delimited lines) or read_until_close, all on one IOLoop.
+# The "writes" mode queues many small writes before waiting for them,
+# exercising the write buffer rather than the read buffer.  The "trickle"
+# mode sends large \r\n\r\n-terminated messages a few bytes at a time,
+# so each read_until sees its message arrive over many reads.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.iostream_benchmark --megabytes=64
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.options import options, define, parse_command_line
+
+define('megabytes', default=64, help='amount of data to transfer per mode')
+define('record_size', default=4096, help='size of read_bytes records')
+define('line_size', default=100, help='length of read_until lines')
+define('write_size', default=4096, help='size of writes in the writes mode')
+define('message_size', default=65536,
+       help='length of messages in the trickle mode')
+define('trickle_size', default=512,
+       help='size of writes in the trickle mode')
+define('messages', default=64, help='number of messages in the trickle mode')
+define('modes', default='bytes,into,lines,close,writes,trickle',
+       help='comma-separated modes')
+define('repeat', default=3, help='runs per mode; the fastest is reported')
+
+
+def make_streams(io_loop):
+    a, b = socket.socketpair()
+    return IOStream(a, io_loop=io_loop), IOStream(b, io_loop=io_loop)
+
+
+@gen.coroutine
+def writer(stream, payload, total, write_size=None):
+    sent = 0
+    while sent < total:
+        if write_size:
+            for i in range(0, len(payload) - write_size, write_size):
+                stream.write(payload[i:i + write_size])
+            yield stream.write(payload[i + write_size:])
+        else:
+            yield stream.write(payload)
+        sent += len(payload)
+    stream.close()
+
+
+@gen.coroutine
+def trickle_writer(stream, payload, total):
+    # Give the reader a chance to run after every write so the message
+    # arrives in many small reads.
+    sent = 0
+    while sent < total:
+        for i in range(0, len(payload), options.trickle_size):
+            yield stream.write(payload[i:i + options.trickle_size])
+            yield gen.moment
+        sent += len(payload)
+    stream.close()
+
+
+@gen.coroutine
+def read_records(stream, total):
+    received = 0
+    while received < total:
+        data = yield stream.read_bytes(options.record_size)
+        received += len(data)
+    raise gen.Return(received)
+
+
+@gen.coroutine
+def read_records_into(stream, total):
+    buf = bytearray(options.record_size)
+    received = 0
+    while received < total:
+        received += yield stream.read_into(buf)
+    raise gen.Return(received)
+
+
+@gen.coroutine
+def read_lines(stream, total):
+    received = 0
+    while received < total:
+        data = yield stream.read_until(b'\n')
+        received += len(data)
+    raise gen.Return(received)
+
+
+@gen.coroutine
+def read_messages(stream, total):
+    received = 0
+    while received < total:
+        data = yield stream.read_until(b'\r\n\r\n')
+        received += len(data)
+    raise gen.Return(received)
+
+
+@gen.coroutine
+def read_close(stream, total):
+    data = yield stream.read_until_close()
+    raise gen.Return(len(data))
+
+
+def run(mode):
+    total = options.megabytes * 1024 * 1024
+    if mode == 'lines':
+        line = b'x' * (options.line_size - 1) + b'\n'
+        payload = line * (65536 // len(line))
+        reader = read_lines
+    elif mode == 'trickle':
+        payload = b'x' * (options.message_size - 4) + b'\r\n\r\n'
+        reader = read_messages
+        total = min(total, options.messages * len(payload))
+    elif mode == 'writes':
+        payload = b'x' * (1024 * 1024)
+        reader = read_close
+    else:
+        payload = b'x' * 65536
+        reader = {'bytes': read_records,
+                  'into': read_records_into}.get(mode, read_close)
+    total -= total % len(payload)
+    io_loop = IOLoop(make_current=False)
+    server, client = make_streams(io_loop)
+
+    @gen.coroutine
+    def main():
+        read_future = reader(server, total)
+        if mode == 'trickle':
+            yield trickle_writer(client, payload, total)
+        else:
+            yield writer(client, payload, total,
+                         options.write_size if mode == 'writes' else None)
+        received = yield read_future
+        assert received == total, (received, total)
+    start = time.time()
+    io_loop.run_sync(main)
+    elapsed = time.time() - start
+    server.close()
+    io_loop.close()
+    return total, elapsed
+
+
+def main():
+    parse_command_line()
+    for mode in options.modes.split(','):
+        results = [run(mode) for i in range(options.repeat)]
+        total, elapsed = min(results, key=lambda r: r[1])
+        print('%-6s %0.3f s, %0.1f MB/s' % (
+            mode, elapsed, total / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
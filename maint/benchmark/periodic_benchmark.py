@@ -0,0 +1,65 @@
+#!/usr/bin/env python
+#
+# A benchmark of many PeriodicCallbacks sharing one period (e.g. per-session
+# heartbeats), each with its own timeout versus coalesced by a
+# PeriodicScheduler.  Reports the size of the timeout store, the number of
+# IOLoop iterations and the CPU time spent.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.periodic_benchmark --callbacks=5000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import time
+
+from tornado.ioloop import IOLoop, PeriodicCallback, PeriodicScheduler
+from tornado.options import options, define, parse_command_line
+
+define('callbacks', default=5000, help='number of periodic callbacks')
+define('period', default=50, help='callback_time in milliseconds')
+define('duration', default=2.0, help='seconds to run each variant')
+
+try:
+    cpu_time = time.process_time
+except AttributeError:
+    cpu_time = time.clock  # py2
+
+
+def run(scheduler_factory):
+    io_loop = IOLoop(make_current=False)
+    scheduler = scheduler_factory(io_loop) if scheduler_factory else None
+    counter = [0]
+
+    def tick():
+        counter[0] += 1
+    pcs = [PeriodicCallback(tick, options.period, io_loop=io_loop,
+                            scheduler=scheduler)
+           for i in range(options.callbacks)]
+    for pc in pcs:
+        pc.start()
+    timeouts = len(io_loop._timeouts)
+    io_loop.enable_stats()
+    io_loop.call_later(options.duration, io_loop.stop)
+    start = cpu_time()
+    io_loop.start()
+    elapsed = cpu_time() - start
+    iterations = io_loop.get_stats().snapshot()['iterations']
+    for pc in pcs:
+        pc.stop()
+    io_loop.close()
+    return timeouts, iterations, counter[0], elapsed
+
+
+def main():
+    parse_command_line()
+    for name, factory in [('separate', None),
+                          ('shared', PeriodicScheduler)]:
+        timeouts, iterations, calls, elapsed = run(factory)
+        print('%-8s %6d timeouts, %6d iterations, %8d calls, '
+              '%0.3f s cpu, %0.2f us per call' % (
+                  name, timeouts, iterations, calls, elapsed,
+                  elapsed / max(calls, 1) * 1e6))
+
+
+if __name__ == '__main__':
+    main()
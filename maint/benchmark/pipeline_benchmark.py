@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+# A benchmark of HTTP/1.1 pipelining in HTTPServer.  Each client
+# connection writes a window of requests at once and then reads their
+# responses; the handler waits a little before answering, standing in
+# for a call to a backend.  The run is repeated with different
+# pipeline_depth values (1 handles one request at a time, as HTTPServer
+# does by default) and reports requests per second.  Client and server
+# run on the same IOLoop.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.pipeline_benchmark --requests=2000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+import time
+
+from tornado import gen
+from tornado.httpserver import HTTPServer
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream
+from tornado.options import options, define, parse_command_line
+from tornado.testing import bind_unused_port
+from tornado.web import Application, RequestHandler
+
+define('requests', default=2000, help='number of requests per connection')
+define('connections', default=4, help='number of keep-alive connections')
+define('window', default=16, help='requests written at once per connection')
+define('delay', default=0.001, help='seconds each request spends waiting')
+define('depths', default='1,4,16', help='comma-separated pipeline_depths')
+
+
+class DelayHandler(RequestHandler):
+    @gen.coroutine
+    def get(self):
+        yield gen.sleep(options.delay)
+        self.write("Hello, world")
+
+
+@gen.coroutine
+def client(port, io_loop):
+    stream = IOStream(socket.socket(), io_loop=io_loop)
+    yield stream.connect(('127.0.0.1', port))
+    request = b"GET / HTTP/1.1\r\nHost: localhost\r\n\r\n"
+    for i in range(options.requests // options.window):
+        stream.write(request * options.window)
+        for j in range(options.window):
+            header_data = yield stream.read_until(b"\r\n\r\n")
+            length = int(header_data.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+            yield stream.read_bytes(length)
+    stream.close()
+
+
+def run(depth):
+    io_loop = IOLoop(make_current=False)
+    sock, port = bind_unused_port()
+    app = Application([('/', DelayHandler)], log_function=lambda handler: None)
+    server = HTTPServer(app, io_loop=io_loop, pipeline_depth=depth)
+    server.add_socket(sock)
+
+    @gen.coroutine
+    def main():
+        yield [client(port, io_loop) for i in range(options.connections)]
+    start = time.time()
+    io_loop.run_sync(main, timeout=600)
+    elapsed = time.time() - start
+    server.stop()
+    io_loop.close(all_fds=True)
+    return elapsed
+
+
+def main():
+    parse_command_line()
+    total = (options.requests // options.window * options.window *
+             options.connections)
+    for depth in options.depths.split(','):
+        elapsed = run(int(depth))
+        print('pipeline_depth=%-3s %0.3f s, %d requests/s' % (
+            depth, elapsed, total / elapsed))
+
+
+if __name__ == '__main__':
+    main()
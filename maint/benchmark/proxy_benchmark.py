@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+#
+# A throughput benchmark of pipe_streams, the core of a TCP proxy.  A
+# writer sends data over a loopback TCP connection to the proxy, which
+# forwards it over a second connection to a reader, all on one IOLoop.
+# The run is repeated with the proxy's streams forced to the buffered
+# copy (the default for SSL streams) and, where os.splice is available,
+# with splicing.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.proxy_benchmark --megabytes=512
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import os
+import socket
+import time
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import IOStream, StreamPipe
+from tornado.netutil import bind_sockets
+from tornado.options import options, define, parse_command_line
+
+define('megabytes', default=512, help='amount of data to forward per run')
+define('chunk_size', default=65536, help='StreamPipe chunk_size')
+define('write_size', default=1024 * 1024, help='size of the writer\'s writes')
+define('repeat', default=3, help='runs per mode; the fastest is reported')
+
+
+def tcp_pair(io_loop):
+    [listener] = bind_sockets(0, '127.0.0.1', family=socket.AF_INET)
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(listener.getsockname())
+    listener.setblocking(True)
+    server, address = listener.accept()
+    listener.close()
+    return IOStream(server, io_loop=io_loop), IOStream(client, io_loop=io_loop)
+
+
+@gen.coroutine
+def writer(stream, total):
+    payload = b'x' * options.write_size
+    sent = 0
+    while sent < total:
+        yield stream.write(payload)
+        sent += len(payload)
+    stream.close()
+
+
+@gen.coroutine
+def reader(stream):
+    received = [0]
+
+    def count(data):
+        received[0] += len(data)
+    yield stream.read_until_close(streaming_callback=count)
+    raise gen.Return(received[0])
+
+
+def run(splice):
+    total = options.megabytes * 1024 * 1024
+    total -= total % options.write_size
+    io_loop = IOLoop(make_current=False)
+    proxy_in, source = tcp_pair(io_loop)
+    proxy_out, sink = tcp_pair(io_loop)
+    if not splice:
+        proxy_in._splice = proxy_out._splice = False
+    pipe = StreamPipe(proxy_in, proxy_out, options.chunk_size)
+
+    @gen.coroutine
+    def main():
+        read_future = reader(sink)
+        yield [pipe.start(), writer(source, total)]
+        received = yield read_future
+        assert received == total, (received, total)
+    start = time.time()
+    io_loop.run_sync(main)
+    elapsed = time.time() - start
+    assert pipe.spliced == splice
+    io_loop.close(all_fds=True)
+    return elapsed, total
+
+
+def main():
+    parse_command_line()
+    modes = [('buffered', False)]
+    if hasattr(os, 'splice'):
+        modes.append(('spliced', True))
+    for name, splice in modes:
+        results = [run(splice) for i in range(options.repeat)]
+        elapsed, total = min(results)
+        print('%-8s %0.3f s, %0.1f MB/s' % (
+            name, elapsed, total / elapsed / 1024 / 1024))
+
+
+if __name__ == '__main__':
+    main()
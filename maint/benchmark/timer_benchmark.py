@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+#
+# A benchmark of the IOLoop timer stores under a churn-heavy workload:
+# many long-lived connections that each cancel and reschedule their
+# timeout on every request (as gen.with_timeout does for keep-alive
+# connections), while a small fraction of the timeouts actually fire.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.timer_benchmark --connections=200000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import random
+import time
+
+from tornado.ioloop import IOLoop, TimeoutHeap, TimingWheel
+from tornado.options import options, define, parse_command_line
+
+define('connections', default=100000, help='number of pending timeouts')
+define('rounds', default=5, help='number of times every timeout is rescheduled')
+define('fire_ratio', default=0.01, help='fraction of timeouts that come due')
+
+
+def noop():
+    pass
+
+
+def run(store):
+    io_loop = IOLoop(make_current=False, timer_store=store)
+    rng = random.Random(0)
+    handles = [io_loop.call_later(60 + rng.random(), noop)
+               for i in range(options.connections)]
+    start = time.time()
+    for round in range(options.rounds):
+        for i, handle in enumerate(handles):
+            io_loop.remove_timeout(handle)
+            if rng.random() < options.fire_ratio:
+                delay = 0
+            else:
+                delay = 60 + rng.random()
+            handles[i] = io_loop.call_later(delay, noop)
+        # Let the loop run one iteration to fire the due timeouts.
+        io_loop.add_callback(io_loop.stop)
+        io_loop.start()
+    elapsed = time.time() - start
+    io_loop.close()
+    return elapsed
+
+
+def main():
+    parse_command_line()
+    ops = options.connections * options.rounds
+    for name, store in [('heap', TimeoutHeap), ('wheel', TimingWheel)]:
+        elapsed = run(store)
+        print('%-6s %0.3f s total, %0.3f us per reschedule' % (
+            name, elapsed, elapsed / ops * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+#
+# A benchmark of UDPServer over loopback.  An echo server answers every
+# datagram with send_batch; the clients, on the same IOLoop, send
+# windows of datagrams and wait for the replies before sending the next
+# window (a window whose replies don't all arrive within a short timeout
+# counts the missing ones as lost).  The run is repeated with different
+# max_batch values and reports datagrams echoed per second, the average
+# number of datagrams handled per read event and the server's drop
+# counters.
+#
+# Usage:
+#   python -m tornado.maint.benchmark.udp_benchmark --datagrams=100000
+
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+import time
+
+from tornado.ioloop import IOLoop
+from tornado.concurrent import Future
+from tornado import gen
+from tornado.netutil import bind_sockets
+from tornado.options import options, define, parse_command_line
+from tornado.udpserver import DatagramEndpoint, UDPServer
+
+define('datagrams', default=100000, help='datagrams sent per client')
+define('clients', default=4, help='concurrent clients')
+define('window', default=16, help='datagrams in flight per client')
+define('size', default=256, help='datagram size')
+define('batches', default='1,8,32', help='comma-separated max_batch values')
+define('repeat', default=3, help='runs per setting; the fastest is reported')
+
+
+class EchoServer(UDPServer):
+    def handle_datagrams(self, endpoint, datagrams):
+        endpoint.send_batch(datagrams)
+
+
+def bind_udp_socket():
+    [sock] = bind_sockets(0, '127.0.0.1', family=socket.AF_INET,
+                          socktype=socket.SOCK_DGRAM)
+    return sock
+
+
+class Client(object):
+    def __init__(self, io_loop, address):
+        self.io_loop = io_loop
+        self.address = address
+        self.endpoint = DatagramEndpoint(bind_udp_socket(), self.on_batch,
+                                         io_loop=io_loop, zero_copy=True)
+        self.outstanding = 0
+        self.lost = 0
+        self.future = None
+
+    def on_batch(self, datagrams):
+        self.outstanding -= len(datagrams)
+        if self.outstanding <= 0 and self.future is not None:
+            self.future.set_result(None)
+            self.future = None
+
+    @gen.coroutine
+    def run(self):
+        payload = b'x' * options.size
+        window = [(payload, self.address)] * options.window
+        for i in range(options.datagrams // options.window):
+            self.future = Future()
+            self.outstanding = options.window
+            self.endpoint.send_batch(window)
+            try:
+                yield gen.with_timeout(self.io_loop.time() + 0.1,
+                                       self.future, io_loop=self.io_loop)
+            except gen.TimeoutError:
+                self.lost += self.outstanding
+                self.future = None
+        self.endpoint.close()
+
+
+def run(max_batch):
+    io_loop = IOLoop(make_current=False)
+    server = EchoServer(io_loop=io_loop, max_batch=max_batch,
+                        zero_copy=True)
+    server.add_socket(bind_udp_socket())
+    address = server.endpoints[0].socket.getsockname()
+    clients = [Client(io_loop, address) for i in range(options.clients)]
+
+    @gen.coroutine
+    def main():
+        yield [client.run() for client in clients]
+    start = time.time()
+    io_loop.run_sync(main)
+    elapsed = time.time() - start
+    stats = server.get_stats()
+    stats['lost'] = sum(client.lost for client in clients)
+    server.stop()
+    io_loop.close(all_fds=True)
+    return elapsed, stats
+
+
+def main():
+    parse_command_line()
+    total = (options.datagrams // options.window * options.window *
+             options.clients)
+    for max_batch in options.batches.split(','):
+        results = [run(int(max_batch)) for i in range(options.repeat)]
+        elapsed, stats = min(results, key=lambda r: r[0])
+        print('max_batch=%-3s %0.3f s, %d datagrams/s, '
+              '%0.1f datagrams per read, %d lost, %d send drops' % (
+                  max_batch, elapsed, total / elapsed,
+                  stats['received'] / stats['batches'],
+                  stats['lost'], stats['send_dropped']))
+
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,14 @@
 
 from __future__ import absolute_import, division, print_function, with_statement
 
+import collections
 import errno
 import os
 import sys
 import socket
 import stat
+import threading
+import time
 
 from tornado.concurrent import dummy_executor, run_on_executor
 from tornado.ioloop import IOLoop
@@ -102,7 +105,8 @@ _DEFAULT_BACKLOG = 128
 
 
 def bind_sockets(port, address=None, family=socket.AF_UNSPEC,
-                 backlog=_DEFAULT_BACKLOG, flags=None):
+                 backlog=_DEFAULT_BACKLOG, flags=None, reuse_port=False,
+                 socktype=socket.SOCK_STREAM):
     """Creates listening sockets bound to the given port and address.
 
     Returns a list of socket objects (multiple sockets are returned if
@@ -121,7 +125,21 @@ def bind_sockets(port, address=None, family=socket.AF_UNSPEC,
 
     ``flags`` is a bitmask of AI_* flags to `~socket.getaddrinfo`, like
     ``socket.AI_PASSIVE | socket.AI_NUMERICHOST``.
+
+    ``reuse_port`` option sets ``SO_REUSEPORT`` option for every socket
+    in the list, so several sockets (in one process or many) can listen
+    on the same port and the kernel balances connections between them.
+    If your platform doesn't support this option ValueError will be raised.
+
+    ``socktype`` may be `socket.SOCK_DGRAM` to create bound UDP sockets
+    (see `tornado.udpserver`) instead of listening TCP sockets.
+
+    .. versionchanged:: 4.3
+       Added the ``reuse_port`` and ``socktype`` arguments.
     """
+    if reuse_port and not hasattr(socket, "SO_REUSEPORT"):
+        raise ValueError("the platform doesn't support SO_REUSEPORT")
+
     sockets = []
     if address == "":
         address = None
@@ -135,7 +153,7 @@ def bind_sockets(port, address=None, family=socket.AF_UNSPEC,
     if flags is None:
         flags = socket.AI_PASSIVE
     bound_port = None
-    for res in set(socket.getaddrinfo(address, port, family, socket.SOCK_STREAM,
+    for res in set(socket.getaddrinfo(address, port, family, socktype,
                                       0, flags)):
         af, socktype, proto, canonname, sockaddr = res
         if (sys.platform == 'darwin' and address == 'localhost' and
@@ -154,12 +172,16 @@ def bind_sockets(port, address=None, family=socket.AF_UNSPEC,
                 continue
             raise
         set_close_exec(sock.fileno())
-        if os.name != 'nt':
+        # SO_REUSEADDR would let several UDP sockets bind the same
+        # address, so it is only set for TCP.
+        if os.name != 'nt' and socktype == socket.SOCK_STREAM:
             try:
                 sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             except socket.error as e:
                 if e.args[0] != errno.ENOPROTOOPT:
                     raise
+        if reuse_port:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
         if af == socket.AF_INET6:
             # On linux, ipv6 sockets accept ipv4 too by default,
             # but this makes it impossible to bind to both
@@ -181,7 +203,8 @@ def bind_sockets(port, address=None, family=socket.AF_UNSPEC,
         sock.setblocking(0)
         sock.bind(sockaddr)
         bound_port = sock.getsockname()[1]
-        sock.listen(backlog)
+        if socktype == socket.SOCK_STREAM:
+            sock.listen(backlog)
         sockets.append(sock)
     return sockets
 
@@ -450,6 +473,16 @@ class OverrideResolver(Resolver):
 _SSL_CONTEXT_KEYWORDS = frozenset(['ssl_version', 'certfile', 'keyfile',
                                    'cert_reqs', 'ca_certs', 'ciphers'])
 
+# SSLContexts that ssl_wrap_socket built from dict ssl_options, keyed by
+# the options.  Building one reloads the certificates from disk, so they
+# are shared until one of their files changes; the files' modification
+# times are checked at most once per _SSL_CONTEXT_CHECK_INTERVAL seconds.
+# Beyond _SSL_CONTEXT_CACHE_SIZE entries the least recently used is dropped.
+_ssl_context_cache = collections.OrderedDict()
+_ssl_context_cache_lock = threading.Lock()
+_SSL_CONTEXT_CACHE_SIZE = 64
+_SSL_CONTEXT_CHECK_INTERVAL = 1.0
+
 
 def ssl_options_to_context(ssl_options):
     """Try to convert an ``ssl_options`` dictionary to an
@@ -492,8 +525,13 @@ def ssl_wrap_socket(socket, ssl_options, server_hostname=None, **kwargs):
     keyword arguments are passed to ``wrap_socket`` (either the
     `~ssl.SSLContext` method or the `ssl` module function as
     appropriate).
+
+    .. versionchanged:: 4.3
+       The `~ssl.SSLContext` built from a dictionary is reused for later
+       calls with equal options, until the certificate, key or CA file
+       changes on disk.
     """
-    context = ssl_options_to_context(ssl_options)
+    context = _cached_ssl_context(ssl_options)
     if hasattr(ssl, 'SSLContext') and isinstance(context, ssl.SSLContext):
         if server_hostname is not None and getattr(ssl, 'HAS_SNI'):
             # Python doesn't have server-side SNI support so we can't
@@ -505,3 +543,129 @@ def ssl_wrap_socket(socket, ssl_options, server_hostname=None, **kwargs):
             return context.wrap_socket(socket, **kwargs)
     else:
         return ssl.wrap_socket(socket, **dict(context, **kwargs))
+
+
+def _ssl_files_mtime(ssl_options):
+    mtimes = []
+    for name in ('certfile', 'keyfile', 'ca_certs'):
+        path = ssl_options.get(name)
+        if path is not None:
+            try:
+                mtimes.append(os.stat(path).st_mtime)
+            except OSError:
+                mtimes.append(None)
+    return tuple(mtimes)
+
+
+def _cached_ssl_context(ssl_options):
+    """Like `ssl_options_to_context`, but reuses the result for equal
+    dict options (see ``_ssl_context_cache``).
+    """
+    if not isinstance(ssl_options, dict):
+        return ssl_options_to_context(ssl_options)
+    try:
+        key = frozenset(ssl_options.items())
+    except TypeError:
+        # Unhashable option values; don't cache.
+        return ssl_options_to_context(ssl_options)
+    now = time.time()
+    with _ssl_context_cache_lock:
+        entry = _ssl_context_cache.pop(key, None)
+        if entry is not None:
+            # Reinsert to mark the entry as most recently used.
+            _ssl_context_cache[key] = entry
+    if entry is not None:
+        context, mtimes, checked = entry
+        if now - checked < _SSL_CONTEXT_CHECK_INTERVAL:
+            return context
+        if _ssl_files_mtime(ssl_options) == mtimes:
+            with _ssl_context_cache_lock:
+                _ssl_context_cache[key] = (context, mtimes, now)
+            return context
+    # Read the times before loading the files, so that a change made
+    # while loading is noticed next time.
+    mtimes = _ssl_files_mtime(ssl_options)
+    context = ssl_options_to_context(ssl_options)
+    with _ssl_context_cache_lock:
+        _ssl_context_cache.pop(key, None)
+        _ssl_context_cache[key] = (context, mtimes, now)
+        while len(_ssl_context_cache) > _SSL_CONTEXT_CACHE_SIZE:
+            _ssl_context_cache.popitem(last=False)
+    return context
+
+
+class SSLSessionCache(object):
+    """A cache of TLS sessions for client connections, so that later
+    connections to the same server can resume a session instead of
+    doing a full handshake.
+
+    Sessions are kept per ``(host, port)`` for up to ``ttl`` seconds,
+    and the least recently used are dropped beyond ``max_size``
+    entries.  A session is only reused with the `ssl.SSLContext` it
+    was created with.  Pass a cache as ``ssl_session_cache`` to
+    `.SSLIOStream`, `.IOStream.start_tls` or `.TCPClient`.
+
+    `get_stats` reports cache hits and misses and the number of full
+    and resumed handshakes.
+
+    Requires Python 3.6+ (`ssl.SSLSession`); elsewhere the cache is
+    never used.
+
+    .. versionadded:: 4.3
+    """
+    supported = ssl is not None and hasattr(ssl, 'SSLSession')
+
+    def __init__(self, max_size=1000, ttl=300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.handshakes = 0
+        self.resumed_handshakes = 0
+
+    def get(self, key, context):
+        """Returns the cached session for ``key`` if it can be used with
+        ``context``, or None.
+        """
+        entry = self._sessions.pop(key, None)
+        if (entry is None or entry[1] is not context or
+                entry[2] < time.time()):
+            self.misses += 1
+            return None
+        # Reinsert to mark the entry as most recently used.
+        self._sessions[key] = entry
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, session, context):
+        """Stores ``session``, created with ``context``, for ``key``."""
+        if self.max_size <= 0:
+            return
+        self._sessions.pop(key, None)
+        self._sessions[key] = (session, context, time.time() + self.ttl)
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+
+    def discard(self, key):
+        """Forgets the session for ``key``."""
+        self._sessions.pop(key, None)
+
+    def clear(self):
+        """Forgets all sessions."""
+        self._sessions.clear()
+
+    def record_handshake(self, resumed):
+        """Counts a completed handshake, which ``resumed`` a session or not."""
+        self.handshakes += 1
+        if resumed:
+            self.resumed_handshakes += 1
+
+    def get_stats(self):
+        """Returns the cache's counters as a dict."""
+        return dict(sessions=len(self._sessions),
+                    hits=self.hits,
+                    misses=self.misses,
+                    handshakes=self.handshakes,
+                    resumed_handshakes=self.resumed_handshakes,
+                    full_handshakes=self.handshakes - self.resumed_handshakes)
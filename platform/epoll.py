@@ -26,11 +26,38 @@ from __future__ import absolute_import, division, print_function, with_statement
 import select
 
 from tornado.ioloop import PollIOLoop
+from tornado.platform.posix import EventFDWaker
 
 
 class EPollIOLoop(PollIOLoop):
     """
     只是将select.epoll()驱动模型函数赋值给impl参数， 传递给PollIOLOOP中
+
+    ``edge_triggered=True``时开启边缘触发模式：`.IOStream`只在第一次需要监听时
+    用``READ | WRITE | EDGE``注册一次，之后每次都读写到``EAGAIN``为止，
+    自己记录可读写状态，不再在每次读写兴趣变化时调用``epoll_ctl``。
+    其他通过`add_handler`注册的文件描述符（例如监听socket）仍然是水平触发。
+    例如::
+
+        IOLoop.configure(EPollIOLoop, edge_triggered=True)
+
+    如果系统支持，默认使用`~tornado.platform.posix.EventFDWaker`代替管道，
+    否则退回到管道实现的Waker。主线程上的IOLoop需要一个管道给
+    ``signal.set_wakeup_fd``，所以启动时会换回管道实现的Waker；
+    节省文件描述符的只是在其他线程中运行的IOLoop（例如`.IOLoopGroup`）。
     """
-    def initialize(self, **kwargs):
+    def initialize(self, edge_triggered=False, **kwargs):
+        self.edge_triggered = edge_triggered
+        if kwargs.get('waker') is None:
+            kwargs['waker'] = _eventfd_waker()
         super(EPollIOLoop, self).initialize(impl=select.epoll(), **kwargs)
+
+
+def _eventfd_waker():
+    if EventFDWaker is not None:
+        try:
+            return EventFDWaker()
+        except (IOError, OSError):
+            # e.g. ENOSYS on old kernels; use the pipe instead.
+            pass
+    return None
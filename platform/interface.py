@@ -52,7 +52,11 @@ class Waker(object):
         raise NotImplementedError()
 
     def write_fileno(self):
-        """返回此waker的写入文件描述符。"""
+        """返回此waker的写入文件描述符。
+
+        这个文件描述符会传给``signal.set_wakeup_fd``，所以必须能接受单字节的写入；
+        如果不能（例如eventfd），返回None，IOLoop在主线程上启动时会把它换成管道实现的Waker。
+        """
         raise NotImplementedError()
 
     def wake(self):
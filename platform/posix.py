@@ -85,3 +85,39 @@ class Waker(interface.Waker):
     def close(self):
         self.reader.close()
         self.writer.close()
+
+
+if hasattr(os, 'eventfd'):
+    class EventFDWaker(interface.Waker):
+        """
+        基于Linux eventfd的Waker，只占用一个文件描述符，
+        唤醒和清理都只需要一次系统调用。
+
+        eventfd只接受8字节的写入，所以不能用于``signal.set_wakeup_fd``，
+        `write_fileno`返回None；在主线程上启动的IOLoop会把它换成管道。
+        """
+        def __init__(self):
+            self.fd = os.eventfd(0, os.EFD_NONBLOCK | os.EFD_CLOEXEC)
+
+        def fileno(self):
+            return self.fd
+
+        def write_fileno(self):
+            return None
+
+        def wake(self):
+            try:
+                os.eventfd_write(self.fd, 1)
+            except (IOError, OSError):
+                pass
+
+        def consume(self):
+            try:
+                os.eventfd_read(self.fd)
+            except (IOError, OSError):
+                pass
+
+        def close(self):
+            os.close(self.fd)
+else:
+    EventFDWaker = None
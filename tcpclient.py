@@ -137,11 +137,19 @@ class _Connector(object):
 class TCPClient(object):
     """A non-blocking TCP connection factory.
 
+    If ``ssl_session_cache`` (a `.SSLSessionCache`) is given, TLS
+    connections resume earlier sessions with the same server when they
+    can.
+
     .. versionchanged:: 4.1
        The ``io_loop`` argument is deprecated.
+
+    .. versionchanged:: 4.3
+       Added the ``ssl_session_cache`` argument.
     """
-    def __init__(self, resolver=None, io_loop=None):
+    def __init__(self, resolver=None, io_loop=None, ssl_session_cache=None):
         self.io_loop = io_loop or IOLoop.current()
+        self.ssl_session_cache = ssl_session_cache
         if resolver is not None:
             self.resolver = resolver
             self._own_resolver = False
@@ -170,8 +178,9 @@ class TCPClient(object):
         # information here and re-use it on subsequent connections to
         # the same host. (http://tools.ietf.org/html/rfc6555#section-4.2)
         if ssl_options is not None:
-            stream = yield stream.start_tls(False, ssl_options=ssl_options,
-                                            server_hostname=host)
+            stream = yield stream.start_tls(
+                False, ssl_options=ssl_options, server_hostname=host,
+                ssl_session_cache=self.ssl_session_cache)
         raise gen.Return(stream)
 
     def _create_stream(self, max_buffer_size, af, addr):
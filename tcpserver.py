@@ -85,6 +85,16 @@ class TCPServer(object):
        your listening sockets in some way other than
        `~tornado.netutil.bind_sockets`.
 
+    4. `listen_on_group`: multi-threaded::
+
+            group = IOLoopGroup(4)
+            TCPServer.listen_on_group(group, 8888)
+            group.start()
+
+       One server is created per `.IOLoop` in the `.IOLoopGroup`, each
+       with its own ``SO_REUSEPORT`` listening sockets, so the kernel
+       spreads incoming connections across the threads.
+
     .. versionadded:: 3.1
        The ``max_buffer_size`` argument.
     """
@@ -126,6 +136,35 @@ class TCPServer(object):
         sockets = bind_sockets(port, address=address)
         self.add_sockets(sockets)
 
+    @classmethod
+    def listen_on_group(cls, group, port, address="", *args, **kwargs):
+        """Creates one server per `.IOLoop` of ``group`` listening on ``port``.
+
+        Every server gets its own listening sockets bound with
+        ``SO_REUSEPORT`` (see `~tornado.netutil.bind_sockets`), and
+        accepts connections on its own `.IOLoop`.  Other arguments are
+        passed to the constructor of each server, e.g.
+        ``HTTPServer.listen_on_group(group, 8888, "", app)``.  If ``port``
+        is 0, the port picked for the first server is used for the rest.
+
+        May be called before or after `.IOLoopGroup.start`.  Returns the
+        list of servers.
+
+        .. versionadded:: 4.3
+        """
+        servers = []
+        for io_loop in group.loops:
+            sockets = bind_sockets(port, address=address, reuse_port=True)
+            # With port 0 bind_sockets binds all of its sockets to the
+            # port the first one was given, so any of them names the
+            # port to reuse for the remaining loops.
+            port = sockets[0].getsockname()[1]
+            server = cls(*args, io_loop=io_loop, **kwargs)
+            # add_handler is not thread-safe; register from the loop itself.
+            io_loop.add_callback(server.add_sockets, sockets)
+            servers.append(server)
+        return servers
+
     def add_sockets(self, sockets):
         """Makes this server start accepting connections on the given sockets.
 
@@ -40,6 +40,17 @@ class AsyncIOLoopTest(AsyncTestCase):
         asyncio.get_event_loop().call_soon(self.stop)
         self.wait()
 
+    def test_stats_unsupported(self):
+        # Statistics are a PollIOLoop feature; elsewhere they are a no-op.
+        self.io_loop.enable_stats(report_interval=1)
+        self.assertIsNone(self.io_loop.get_stats())
+        self.io_loop.disable_stats()
+
+    def test_watchdog_unsupported(self):
+        self.assertIsNone(self.io_loop.enable_watchdog(0.1))
+        self.assertIsNone(self.io_loop.get_watchdog())
+        self.io_loop.disable_watchdog()
+
     @skipIfNoSingleDispatch
     @gen_test
     def test_asyncio_future(self):
@@ -3,12 +3,14 @@
 
 from __future__ import absolute_import, division, print_function, with_statement
 from tornado import netutil
+from tornado.concurrent import Future
 from tornado.escape import json_decode, json_encode, utf8, _unicode, recursive_unicode, native_str
 from tornado import gen
 from tornado.http1connection import HTTP1Connection
 from tornado.httpserver import HTTPServer
-from tornado.httputil import HTTPHeaders, HTTPMessageDelegate, HTTPServerConnectionDelegate, ResponseStartLine
+from tornado.httputil import HTTPHeaders, HTTPMessageDelegate, HTTPServerConnectionDelegate, ResponseStartLine, parse_header_block
 from tornado.iostream import IOStream
+from tornado.locks import Condition
 from tornado.log import gen_log
 from tornado.netutil import ssl_options_to_context
 from tornado.simple_httpclient import SimpleAsyncHTTPClient
@@ -750,6 +752,11 @@ class KeepAliveTest(AsyncHTTPTestCase):
         self.close()
 
 
+class PipelinedKeepAliveTest(KeepAliveTest):
+    def get_httpserver_options(self):
+        return dict(pipeline_depth=4)
+
+
 class GzipBaseTest(object):
     def get_app(self):
         return Application([('/', EchoHandler)])
@@ -894,6 +901,189 @@ class MaxHeaderSizeTest(AsyncHTTPTestCase):
         self.assertEqual(response.code, 599)
 
 
+class WriteWatermarkTest(AsyncHTTPTestCase):
+    def setUp(self):
+        self.static_path = tempfile.mkdtemp()
+        # Much more than the socket buffers hold, so the file is still
+        # being sent long after the stream drops below its watermarks.
+        with open(os.path.join(self.static_path, "big.bin"), "wb") as f:
+            f.write(b"0123456789abcdef" * (512 * 1024))
+        super(WriteWatermarkTest, self).setUp()
+
+    def tearDown(self):
+        super(WriteWatermarkTest, self).tearDown()
+        shutil.rmtree(self.static_path)
+
+    def get_app(self):
+        class StreamingHandler(RequestHandler):
+            @gen.coroutine
+            def get(self):
+                stream = self.request.connection.stream
+                buffered = []
+                for i in range(64):
+                    self.write(b"x" * 65536)
+                    yield self.flush()
+                    buffered.append(stream._write_buffer_size)
+                # Flushes only wait while the stream is over its high
+                # watermark, so at most one chunk goes past it.
+                self.application.max_buffered = max(buffered)
+        return Application([('/', StreamingHandler)],
+                           static_path=self.static_path)
+
+    def get_httpserver_options(self):
+        return dict(write_high_water=128 * 1024, write_low_water=32 * 1024)
+
+    def test_static_file(self):
+        # StaticFileHandler closes the file once write_file's future
+        # resolves, so that must wait for the whole file to be sent.
+        response = self.fetch("/static/big.bin")
+        response.rethrow()
+        self.assertEqual(response.body, b"0123456789abcdef" * (512 * 1024))
+
+    def test_streaming_response(self):
+        response = self.fetch("/")
+        response.rethrow()
+        self.assertEqual(len(response.body), 64 * 65536)
+        self.assertLessEqual(self._app.max_buffered, 256 * 1024)
+
+
+class WriteCorkTest(AsyncHTTPTestCase):
+    def get_app(self):
+        class ChunkedHandler(RequestHandler):
+            def get(self):
+                stream = self.request.connection.stream
+                stream.enable_stats()
+                self.application.stream = stream
+                for i in range(5):
+                    self.write(b"x" * 100)
+                    self.flush()
+        return Application([('/', ChunkedHandler)])
+
+    def get_httpserver_options(self):
+        return dict(write_cork_threshold=16384)
+
+    def test_chunked_response(self):
+        response = self.fetch("/")
+        response.rethrow()
+        self.assertEqual(response.body, b"x" * 500)
+        # The headers, five chunks and the final chunk all go out in
+        # one write.
+        self.assertEqual(self._app.stream.get_stats().writes, 1)
+
+
+class LazyHeadersTest(AsyncHTTPTestCase):
+    def get_app(self):
+        class HeaderHandler(RequestHandler):
+            def get(self):
+                headers = self.request.headers
+                self.write(dict(
+                    type=type(headers).__name__,
+                    foo=headers.get_list("X-Foo"),
+                    count=len(headers)))
+        return Application([('/', HeaderHandler)])
+
+    def get_httpserver_options(self):
+        return dict(lazy_headers=True)
+
+    def test_lazy_headers(self):
+        headers = HTTPHeaders()
+        headers.add("X-Foo", "1")
+        headers.add("X-Foo", "2")
+        response = self.fetch("/", headers=headers)
+        response.rethrow()
+        result = json_decode(response.body)
+        self.assertEqual(result["type"], "LazyHTTPHeaders")
+        self.assertEqual(result["foo"], ["1", "2"])
+        self.assertGreater(result["count"], 1)
+
+
+class PipelineTest(AsyncHTTPTestCase):
+    def get_app(self):
+        test = self
+
+        class WaitHandler(RequestHandler):
+            @gen.coroutine
+            def get(self, name):
+                test.started.append(name)
+                test.changed.notify_all()
+                yield test.waiters.get(name, gen.moment)
+                self.finish(name)
+
+            def on_connection_close(self):
+                test.closed.append(self.path_args[0])
+                test.changed.notify_all()
+                waiter = test.waiters.get(self.path_args[0])
+                if waiter is not None and not waiter.done():
+                    waiter.set_result(None)
+        return Application([('/(.*)', WaitHandler)])
+
+    def get_httpserver_options(self):
+        return dict(pipeline_depth=2)
+
+    def setUp(self):
+        super(PipelineTest, self).setUp()
+        self.started = []
+        self.closed = []
+        self.changed = Condition()
+        self.waiters = {'a': Future()}
+        self.stream = IOStream(socket.socket(), io_loop=self.io_loop)
+        self.stream.connect(('127.0.0.1', self.get_http_port()), self.stop)
+        self.wait()
+
+    def tearDown(self):
+        self.stream.close()
+        super(PipelineTest, self).tearDown()
+
+    @gen.coroutine
+    def wait_for(self, names, count):
+        while len(names) < count:
+            yield self.changed.wait()
+
+    @gen.coroutine
+    def read_response(self):
+        header_data = yield self.stream.read_until(b'\r\n\r\n')
+        start_line, headers = parse_header_block(header_data)
+        body = yield self.stream.read_bytes(int(headers['Content-Length']))
+        raise gen.Return(body)
+
+    @gen_test
+    def test_in_order(self):
+        self.stream.write(b'GET /a HTTP/1.1\r\n\r\nGET /b HTTP/1.1\r\n\r\n'
+                          b'GET /c HTTP/1.1\r\n\r\n')
+        # b is handled while a waits, but its response is held back,
+        # and c is not read as two requests are in progress.
+        yield self.wait_for(self.started, 2)
+        response = self.read_response()
+        yield gen.sleep(0.01)
+        self.assertEqual(self.started, ['a', 'b'])
+        self.assertFalse(response.done())
+        self.waiters['a'].set_result(None)
+        self.assertEqual((yield response), b'a')
+        self.assertEqual((yield self.read_response()), b'b')
+        self.assertEqual((yield self.read_response()), b'c')
+        self.assertEqual(self.started, ['a', 'b', 'c'])
+
+    @gen_test
+    def test_connection_close(self):
+        self.stream.write(b'GET /a HTTP/1.1\r\n\r\n'
+                          b'GET /b HTTP/1.1\r\nConnection: close\r\n\r\n'
+                          b'GET /c HTTP/1.1\r\n\r\n')
+        yield self.wait_for(self.started, 2)
+        self.waiters['a'].set_result(None)
+        self.assertEqual((yield self.read_response()), b'a')
+        self.assertEqual((yield self.read_response()), b'b')
+        self.assertEqual((yield self.stream.read_until_close()), b'')
+        self.assertEqual(self.started, ['a', 'b'])
+
+    @gen_test
+    def test_client_close(self):
+        self.stream.write(b'GET /a HTTP/1.1\r\n\r\nGET /b HTTP/1.1\r\n\r\n')
+        yield self.wait_for(self.started, 2)
+        self.stream.close()
+        yield self.wait_for(self.closed, 1)
+        self.assertEqual(self.closed, ['a'])
+
+
 @skipOnTravis
 class IdleTimeoutTest(AsyncHTTPTestCase):
     def get_app(self):
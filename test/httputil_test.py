@@ -2,7 +2,7 @@
 
 
 from __future__ import absolute_import, division, print_function, with_statement
-from tornado.httputil import url_concat, parse_multipart_form_data, HTTPHeaders, format_timestamp, HTTPServerRequest, parse_request_start_line
+from tornado.httputil import url_concat, parse_multipart_form_data, HTTPHeaders, format_timestamp, HTTPServerRequest, parse_request_start_line, parse_header_block, HTTPInputError, LazyHTTPHeaders
 from tornado.escape import utf8, native_str
 from tornado.log import gen_log
 from tornado.testing import ExpectLog
@@ -11,6 +11,7 @@ from tornado.util import u
 
 import copy
 import datetime
+import json
 import logging
 import time
 
@@ -299,6 +300,140 @@ Foo: even
             self.assertIsNot(headers.get_list('A'), h1.get_list('A'))
 
 
+class ParseHeaderBlockTest(unittest.TestCase):
+    def check(self, data):
+        # parse_header_block gives the same result as the str-based
+        # parser it replaced.
+        start_line, headers = parse_header_block(data)
+        text = native_str(data.decode('latin1')).lstrip("\r\n")
+        eol = text.find("\n")
+        self.assertEqual(start_line, text[:eol].rstrip("\r"))
+        expected = HTTPHeaders.parse(text[eol:])
+        self.assertEqual(dict(headers), dict(expected))
+        self.assertEqual(sorted(headers.get_all()),
+                         sorted(expected.get_all()))
+        return headers
+
+    def test_common_and_uncommon_names(self):
+        headers = self.check(
+            b"GET / HTTP/1.1\r\nhost: example.com\r\nUSER-AGENT: x\r\n"
+            b"ETag: \"abc\"\r\nX-Custom-thing:  spaced  \r\n"
+            b"content-length:0\r\n\r\n")
+        self.assertEqual(sorted(headers.keys()),
+                         ["Content-Length", "Etag", "Host", "User-Agent",
+                          "X-Custom-Thing"])
+        self.assertEqual(headers["X-Custom-Thing"], "spaced")
+
+    def test_repeated_and_multi_line(self):
+        headers = self.check(
+            b"HTTP/1.1 200 OK\r\nSet-Cookie: a=1\r\nset-cookie: b=2\r\n"
+            b"Foo: bar\r\n baz \r\nFoo: even\r\n\tmore\r\n\r\n")
+        self.assertEqual(headers.get_list("Set-Cookie"), ["a=1", "b=2"])
+        self.assertEqual(headers["Foo"], "bar baz ,even more")
+
+    def test_optional_cr_and_leading_newlines(self):
+        headers = self.check(
+            b"\r\n\nGET / HTTP/1.0\nCRLF: crlf\r\nLF: lf\n"
+            b"CR: cr\rMore: more\r\n\n")
+        self.assertEqual(headers["Cr"], "cr\rMore: more")
+
+    def test_latin1(self):
+        headers = self.check(b"GET / HTTP/1.1\r\nX-Name: caf\xe9\r\n\r\n")
+        self.assertEqual(headers["X-Name"], native_str(u("caf\u00e9")))
+
+    def test_malformed(self):
+        for data in [b"GET / HTTP/1.1\r\nno colon\r\n\r\n",
+                     b"GET / HTTP/1.1\r\n continuation\r\n\r\n"]:
+            with self.assertRaises(HTTPInputError):
+                parse_header_block(data)
+
+
+
+class LazyHTTPHeadersTest(unittest.TestCase):
+    DATA = (b"Host: example.com\r\nAccept: */*\r\nSet-Cookie: a=1\r\n"
+            b"X-Custom:  value \r\nset-cookie: b=2\r\n\r\n")
+
+    def parse(self, data=DATA):
+        return (LazyHTTPHeaders(data),
+                parse_header_block(b"GET / HTTP/1.1\r\n" + data)[1])
+
+    def test_decodes_on_use(self):
+        lazy, eager = self.parse()
+        self.assertEqual(lazy._as_list, {})
+        self.assertEqual(lazy["host"], "example.com")
+        self.assertEqual(lazy.get_list("Set-Cookie"), ["a=1", "b=2"])
+        self.assertEqual(lazy["Set-Cookie"], "a=1,b=2")
+        self.assertTrue("x-custom" in lazy)
+        self.assertFalse("X-Missing" in lazy)
+        self.assertEqual(lazy.get("X-Missing", "default"), "default")
+        self.assertEqual(len(lazy), 4)
+        self.assertEqual(list(lazy), list(eager))
+        self.assertEqual(sorted(lazy._as_list), ["Host", "Set-Cookie"])
+        self.assertEqual(lazy, eager)
+        self.assertEqual(list(lazy.get_all()), list(eager.get_all()))
+        self.assertFalse(lazy._lazy)
+
+    def test_dict_interface(self):
+        lazy, eager = self.parse()
+        self.assertEqual(len(lazy), len(eager))
+        lazy, eager = self.parse()
+        self.assertEqual(sorted(lazy), sorted(eager))
+        lazy, eager = self.parse()
+        self.assertEqual(sorted(lazy.items()), sorted(eager.items()))
+        lazy, eager = self.parse()
+        self.assertEqual(dict(lazy), dict(eager))
+        lazy, eager = self.parse()
+        self.assertTrue(eager == lazy)
+        self.assertFalse(lazy != eager)
+        lazy, eager = self.parse()
+        for headers in [lazy.copy(), copy.copy(lazy), copy.deepcopy(lazy)]:
+            self.assertIsInstance(headers, HTTPHeaders)
+            self.assertEqual(list(headers.get_all()),
+                             list(eager.get_all()))
+
+    def test_serialize(self):
+        # Consumers that work on the dict directly see the decoded
+        # values too.
+        lazy, eager = self.parse()
+        self.assertEqual(json.dumps(lazy), json.dumps(eager))
+        lazy, eager = self.parse()
+        self.assertEqual(dict(lazy), dict(eager))
+        lazy, eager = self.parse()
+        self.assertEqual(dict(**lazy), dict(eager))
+        if hasattr(dict, '__or__'):
+            lazy, eager = self.parse()
+            self.assertEqual(lazy | {}, dict(eager))
+            lazy, eager = self.parse()
+            self.assertEqual({} | lazy, dict(eager))
+        if hasattr(dict, '__reversed__'):
+            lazy, eager = self.parse()
+            self.assertEqual(list(reversed(lazy)), list(reversed(eager)))
+
+    def test_modify(self):
+        lazy, eager = self.parse()
+        for headers in [lazy, eager]:
+            headers.add("Set-Cookie", "c=3")
+            headers["Accept"] = "text/html"
+            del headers["X-Custom"]
+            headers.parse_line("X-New: new")
+            headers.parse_line(" continued")
+        self.assertEqual(lazy.get_list("set-cookie"), ["a=1", "b=2", "c=3"])
+        self.assertEqual(lazy["X-New"], "new continued")
+        self.assertEqual(list(lazy.get_all()), list(eager.get_all()))
+        with self.assertRaises(KeyError):
+            del lazy["X-Custom"]
+
+    def test_multi_line(self):
+        lazy, eager = self.parse(b"Foo: bar\r\n baz\r\nAsdf: qwer\r\n")
+        self.assertEqual(len(lazy._as_list), 2)
+        self.assertEqual(lazy["Foo"], "bar baz")
+        self.assertEqual(list(lazy.get_all()), list(eager.get_all()))
+
+    def test_malformed(self):
+        with self.assertRaises(HTTPInputError):
+            LazyHTTPHeaders(b"Host: example.com\r\nno colon\r\n")
+
+
 
 class FormatTimestampTest(unittest.TestCase):
     # Make sure that all the input types are supported.
@@ -28,6 +28,7 @@ class ImportTest(unittest.TestCase):
         import tornado.simple_httpclient
         import tornado.stack_context
         import tornado.tcpserver
+        import tornado.udpserver
         import tornado.template
         import tornado.testing
         import tornado.util
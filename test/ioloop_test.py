@@ -2,20 +2,30 @@
 
 
 from __future__ import absolute_import, division, print_function, with_statement
+import collections
 import contextlib
 import datetime
 import functools
+import itertools
+import os
+import signal
 import socket
 import sys
 import threading
 import time
 
 from tornado import gen
-from tornado.ioloop import IOLoop, TimeoutError, PollIOLoop, PeriodicCallback
-from tornado.log import app_log
+from tornado.ioloop import IOLoop, IOLoopGroup, BoundedExecutor, ExecutorFull, TimeoutError, PollIOLoop, PeriodicCallback, PeriodicScheduler, TimingWheel, _Timeout, _in_main_thread
+from tornado.log import app_log, gen_log
 from tornado.platform.select import _Select
+from tornado.platform.auto import Waker
+try:
+    from tornado.platform.epoll import EPollIOLoop
+    from tornado.platform.posix import EventFDWaker
+except ImportError:
+    EPollIOLoop = EventFDWaker = None
 from tornado.stack_context import ExceptionStackContext, StackContext, wrap, NullContext
-from tornado.testing import AsyncTestCase, bind_unused_port, ExpectLog
+from tornado.testing import AsyncTestCase, bind_unused_port, ExpectLog, gen_test
 from tornado.test.util import unittest, skipIfNonUnix, skipOnTravis
 
 try:
@@ -158,6 +168,37 @@ class TestIOLoop(AsyncTestCase):
                 self.assertEqual("IOLoop is closing", str(e))
                 break
 
+    def test_add_callback_racing_close(self):
+        # A callback appended just after close() has cleared the queue
+        # must be rejected, not silently dropped, even when the caller
+        # does not need to wake the loop.
+        appending = threading.Event()
+        closed = threading.Event()
+
+        class RacingDeque(collections.deque):
+            def append(self, item):
+                appending.set()
+                closed.wait()
+                super(RacingDeque, self).append(item)
+        other_ioloop = IOLoop()
+        other_ioloop._callbacks = RacingDeque()
+        other_ioloop._waker_pending = True
+        errors = []
+
+        def target():
+            try:
+                other_ioloop.add_callback(lambda: None)
+            except RuntimeError as e:
+                errors.append(e)
+        thread = threading.Thread(target=target)
+        thread.start()
+        appending.wait()
+        other_ioloop.close()
+        closed.set()
+        thread.join()
+        self.assertEqual([str(e) for e in errors], ["IOLoop is closing"])
+        self.assertEqual(len(other_ioloop._callbacks), 0)
+
     def test_handle_callback_exception(self):
         # IOLoop.handle_callback_exception can be overridden to catch
         # exceptions in callbacks.
@@ -405,6 +446,314 @@ class TestIOLoop(AsyncTestCase):
             server.close()
 
 
+class TestIOLoopStats(AsyncTestCase):
+    def test_disabled_by_default(self):
+        self.assertIsNone(self.io_loop.get_stats())
+
+    def test_counts(self):
+        self.io_loop.enable_stats()
+        stats = self.io_loop.get_stats()
+        self.io_loop.add_callback(lambda: None)
+        self.io_loop.add_timeout(self.io_loop.time() - 0.2, lambda: None)
+        self.io_loop.call_later(0.01, self.stop)
+        self.wait()
+        snapshot = stats.snapshot()
+        self.assertGreater(snapshot['iterations'], 0)
+        self.assertGreaterEqual(snapshot['callbacks'], 1)
+        self.assertEqual(snapshot['timeouts'], 2)
+        self.assertEqual(sum(snapshot['lateness']), 2)
+        self.assertGreaterEqual(snapshot['max_lateness'], 0.2)
+        self.assertIsNotNone(snapshot['poll_timeout'])
+        self.io_loop.disable_stats()
+        self.assertIsNone(self.io_loop.get_stats())
+
+    def test_handlers(self):
+        self.io_loop.enable_stats()
+        client, server = socket.socketpair()
+        try:
+            def handler(fd, events):
+                server.recv(1)
+                self.stop()
+            self.io_loop.add_handler(server.fileno(), handler,
+                                     IOLoop.READ)
+            client.send(b'x')
+            self.wait()
+            self.io_loop.remove_handler(server.fileno())
+        finally:
+            client.close()
+            server.close()
+        self.assertGreaterEqual(self.io_loop.get_stats().handlers, 1)
+
+    def test_report(self):
+        reports = []
+
+        def report(snapshot):
+            reports.append(snapshot)
+            if len(reports) == 2:
+                self.stop()
+        self.io_loop.enable_stats(report_interval=0.01, report_callback=report)
+        self.wait()
+        self.io_loop.disable_stats()
+        self.assertGreater(reports[0]['iterations'], 0)
+        # Each report covers only the interval since the previous one.
+        self.assertLess(reports[1]['elapsed'], 1)
+
+
+class TestBlockingWatchdog(AsyncTestCase):
+    def tearDown(self):
+        self.io_loop.disable_watchdog()
+        super(TestBlockingWatchdog, self).tearDown()
+
+    def blocking_callback(self):
+        time.sleep(0.2)
+
+    def test_detect_blocking_callback(self):
+        blocks = []
+        watchdog = self.io_loop.enable_watchdog(
+            0.05, on_block=lambda seconds, stack: blocks.append(stack))
+        self.assertIs(self.io_loop.get_watchdog(), watchdog)
+        self.io_loop.add_callback(self.blocking_callback)
+        self.io_loop.add_callback(self.blocking_callback)
+        self.io_loop.call_later(0.5, self.stop)
+        self.wait()
+        self.assertEqual(len(blocks), 2)
+        self.assertIn('blocking_callback', blocks[0])
+        report = watchdog.report()
+        self.assertEqual(len(report), 1)
+        self.assertEqual(report[0]['count'], 2)
+        self.assertIn('blocking_callback', report[0]['stack'])
+        self.assertGreaterEqual(report[0]['max_time'], 0.05)
+
+    def test_idle_loop_not_reported(self):
+        watchdog = self.io_loop.enable_watchdog(0.02)
+        self.io_loop.call_later(0.2, self.stop)
+        self.wait()
+        self.assertEqual(watchdog.report(), [])
+
+    def test_blocking_log_threshold(self):
+        self.io_loop.set_blocking_log_threshold(0.05)
+        self.io_loop.add_callback(self.blocking_callback)
+        self.io_loop.call_later(0.3, self.stop)
+        with ExpectLog(gen_log, 'IOLoop blocked for'):
+            self.wait()
+        self.io_loop.set_blocking_log_threshold(None)
+        self.assertIsNone(self.io_loop.get_watchdog())
+
+    @unittest.skipIf(not hasattr(signal, 'SIGALRM'), 'SIGALRM not available')
+    def test_blocking_signal_threshold(self):
+        # The watchdog thread delivers the signal; the loop itself no
+        # longer arms an itimer.
+        frames = []
+        old_handler = signal.getsignal(signal.SIGALRM)
+        try:
+            self.io_loop.set_blocking_signal_threshold(
+                0.05, lambda signum, frame: frames.append(frame))
+            self.io_loop.add_callback(self.blocking_callback)
+            self.io_loop.call_later(0.3, self.stop)
+            self.wait()
+            self.io_loop.set_blocking_signal_threshold(None, None)
+        finally:
+            signal.signal(signal.SIGALRM, old_handler)
+        self.assertIsNone(self.io_loop.get_watchdog())
+        self.assertEqual(len(frames), 1)
+        self.assertEqual(frames[0].f_code.co_name, 'blocking_callback')
+
+
+class TestIOLoopTimingWheel(TestIOLoop):
+    # Repeat the IOLoop tests with the timing wheel timer store.
+    def get_new_ioloop(self):
+        return IOLoop(timer_store=TimingWheel)
+
+
+class TestIOLoopCoarseTime(TestIOLoop):
+    # Repeat the IOLoop tests with the per-iteration cached clock.
+    def get_new_ioloop(self):
+        return IOLoop(coarse_time=True)
+
+
+class TestCoarseTime(unittest.TestCase):
+    def setUp(self):
+        self.clock_reads = 0
+        self.io_loop = IOLoop(make_current=False, coarse_time=True,
+                              time_func=self.time_func)
+
+    def tearDown(self):
+        self.io_loop.close()
+
+    def time_func(self):
+        self.clock_reads += 1
+        return time.time()
+
+    def test_cached_within_iteration(self):
+        results = []
+
+        def callback():
+            reads = self.clock_reads
+            first = self.io_loop.time()
+            for i in range(100):
+                self.io_loop.call_later(60, lambda: None)
+            results.append((first, self.io_loop.time(),
+                            self.clock_reads - reads))
+            time.sleep(0.01)
+            results.append(self.io_loop.precise_time() - first)
+            self.io_loop.stop()
+        self.io_loop.add_callback(callback)
+        self.io_loop.start()
+        first, last, reads = results[0]
+        self.assertEqual(first, last)
+        self.assertEqual(reads, 0)
+        self.assertGreaterEqual(results[1], 0.01)
+
+    def test_refreshed_between_iterations(self):
+        times = []
+
+        def callback():
+            times.append(self.io_loop.time())
+            time.sleep(0.01)
+            if len(times) < 2:
+                self.io_loop.add_callback(callback)
+            else:
+                self.io_loop.stop()
+        self.io_loop.add_callback(callback)
+        self.io_loop.start()
+        self.assertGreaterEqual(times[1] - times[0], 0.01)
+
+    def test_refreshed_after_slow_callback(self):
+        times = []
+
+        def slow():
+            times.append(self.io_loop.time())
+            time.sleep(0.05)
+
+        def fast():
+            reads = self.clock_reads
+            times.append(self.io_loop.time())
+            times.append(self.io_loop.time())
+            times.append(self.clock_reads - reads)
+            self.io_loop.stop()
+        # Both callbacks run in the same iteration.
+        self.io_loop.add_callback(slow)
+        self.io_loop.add_callback(fast)
+        self.io_loop.start()
+        self.assertGreaterEqual(times[1] - times[0], 0.05)
+        self.assertEqual(times[1], times[2])
+        self.assertEqual(times[3], 0)
+
+    def test_not_cached_when_stopped(self):
+        self.io_loop.add_callback(self.io_loop.stop)
+        self.io_loop.start()
+        reads = self.clock_reads
+        self.io_loop.time()
+        self.assertEqual(self.clock_reads, reads + 1)
+
+
+class TestTimingWheel(unittest.TestCase):
+    def setUp(self):
+        self.wheel = TimingWheel(resolution=1, wheel_size=4, levels=2)
+        # Stands in for the IOLoop when constructing _Timeout objects.
+        self._timeout_counter = itertools.count()
+
+    def add(self, deadline):
+        timeout = _Timeout(deadline, lambda: None, self)
+        self.wheel.add(timeout)
+        return timeout
+
+    def test_pop_due_in_order(self):
+        self.wheel.pop_due(100)
+        timeouts = [self.add(100 + d) for d in (3.5, 0.5, 2, 0.5, 1)]
+        self.assertEqual(self.wheel.pop_due(100), [])
+        self.assertEqual(self.wheel.pop_due(101),
+                         [timeouts[1], timeouts[3], timeouts[4]])
+        self.assertEqual(self.wheel.pop_due(110), [timeouts[2], timeouts[0]])
+        self.assertEqual(len(self.wheel), 0)
+        self.assertIsNone(self.wheel.next_deadline())
+
+    def test_never_early(self):
+        self.wheel.pop_due(100)
+        timeout = self.add(100.75)
+        self.assertEqual(self.wheel.pop_due(100.5), [])
+        self.assertEqual(self.wheel.next_deadline(), 100.75)
+        self.assertEqual(self.wheel.pop_due(100.75), [timeout])
+
+    def test_remove(self):
+        self.wheel.pop_due(100)
+        t1 = self.add(102)
+        t2 = self.add(103)
+        self.wheel.remove(t1)
+        self.assertEqual(len(self.wheel), 1)
+        self.assertEqual(self.wheel.next_deadline(), 103)
+        self.assertEqual(self.wheel.pop_due(105), [t2])
+        # Removing a timeout that has already run is harmless.
+        self.wheel.remove(t2)
+        self.assertEqual(len(self.wheel), 0)
+
+    def test_cascade_and_overflow(self):
+        self.wheel.pop_due(100)
+        # With 4 slots and 2 levels the wheel spans 16 ticks; later
+        # deadlines go to the overflow bucket.
+        deadlines = [105, 111, 115.5, 140, 1000]
+        timeouts = [self.add(d) for d in deadlines]
+        fired = []
+        now = 100
+        while len(self.wheel):
+            now = max(now + 0.5, self.wheel.next_deadline())
+            for timeout in self.wheel.pop_due(now):
+                self.assertLessEqual(timeout.deadline, now)
+                fired.append((timeout, now))
+        self.assertEqual([t for t, _ in fired], timeouts)
+        for timeout, when in fired:
+            self.assertLess(when - timeout.deadline, 1)
+
+
+class TestIOLoopGroup(AsyncTestCase):
+    def setUp(self):
+        super(TestIOLoopGroup, self).setUp()
+        self.group = IOLoopGroup(3)
+
+    def tearDown(self):
+        self.group.close()
+        super(TestIOLoopGroup, self).tearDown()
+
+    def test_loops_not_current(self):
+        self.assertEqual(len(self.group), 3)
+        self.assertIs(IOLoop.current(), self.io_loop)
+        self.assertIsNone(self.group.current())
+
+    def test_next_loop(self):
+        loops = [self.group.next_loop() for i in range(6)]
+        self.assertEqual(loops, self.group.loops * 2)
+
+    def test_loop_for(self):
+        self.assertIs(self.group.loop_for('a'), self.group.loop_for('a'))
+        self.assertIn(self.group.loop_for(12345), self.group.loops)
+
+    @gen_test
+    def test_run_on(self):
+        self.group.start()
+        for i, io_loop in enumerate(self.group.loops):
+            current = yield self.group.run_on(i, self.group.current)
+            self.assertIs(current, io_loop)
+        name = yield self.group.run_on(
+            self.group.loops[1], lambda: threading.current_thread().name)
+        self.assertEqual(name, 'tornado-ioloop-1')
+
+    @gen_test
+    def test_run_on_coroutine(self):
+        @gen.coroutine
+        def f():
+            yield gen.moment
+            raise gen.Return(IOLoop.current())
+        self.group.start()
+        result = yield self.group.run_on(2, f)
+        self.assertIs(result, self.group.loops[2])
+
+    @gen_test
+    def test_run_on_exception(self):
+        self.group.start()
+        with self.assertRaises(ZeroDivisionError):
+            yield self.group.run_on(0, lambda: 1 / 0)
+
+
 # Deliberately not a subclass of AsyncTestCase so the IOLoop isn't
 # automatically set as current.
 class TestIOLoopCurrent(unittest.TestCase):
@@ -473,12 +822,93 @@ class TestIOLoopAddCallback(AsyncTestCase):
         self.assertEqual(result, (1, 2))
 
 
+class TestIOLoopAddCallbackThreads(AsyncTestCase):
+    def test_many_threads(self):
+        num_threads, num_callbacks = 4, 2000
+        wakes = []
+        wake = self.io_loop._waker.wake
+
+        def counting_wake():
+            wakes.append(None)
+            wake()
+        self.io_loop._waker.wake = counting_wake
+        results = []
+
+        def callback(i):
+            results.append(i)
+            if len(results) == num_threads * num_callbacks:
+                self.stop()
+
+        def target():
+            for i in range(num_callbacks):
+                self.io_loop.add_callback(callback, i)
+        threads = [threading.Thread(target=target) for i in range(num_threads)]
+        for t in threads:
+            t.start()
+        self.wait()
+        for t in threads:
+            t.join()
+        self.assertEqual(len(results), num_threads * num_callbacks)
+        # Wakeups are coalesced to roughly one per loop iteration.
+        self.assertLess(len(wakes), num_threads * num_callbacks)
+
+
 class TestIOLoopAddCallbackFromSignal(TestIOLoopAddCallback):
     # Repeat the add_callback tests using add_callback_from_signal
     def add_callback(self, callback, *args, **kwargs):
         self.io_loop.add_callback_from_signal(callback, *args, **kwargs)
 
 
+@unittest.skipIf(EventFDWaker is None, "eventfd not available")
+class TestEventFDWaker(unittest.TestCase):
+    def setUp(self):
+        self.io_loop = EPollIOLoop()
+
+    def tearDown(self):
+        self.io_loop.close(all_fds=True)
+
+    def test_default_waker(self):
+        self.assertIsInstance(self.io_loop._waker, EventFDWaker)
+        self.assertIsNone(self.io_loop._waker.write_fileno())
+
+    def test_explicit_waker(self):
+        io_loop = EPollIOLoop(waker=Waker())
+        try:
+            self.assertIsInstance(io_loop._waker, Waker)
+        finally:
+            io_loop.close()
+
+    def test_wake_from_thread(self):
+        thread = threading.Thread(
+            target=lambda: self.io_loop.add_callback(self.io_loop.stop))
+        self.io_loop.add_callback(thread.start)
+        self.io_loop.start()
+        thread.join()
+
+    @skipIfNonUnix
+    def test_signal_wakeup(self):
+        # The handler only runs once poll() returns, so this only finishes
+        # if set_wakeup_fd was pointed at a pipe the loop is watching.
+        if not hasattr(signal, 'SIGUSR1') or not _in_main_thread():
+            raise unittest.SkipTest("needs SIGUSR1 on the main thread")
+        old_handler = signal.signal(
+            signal.SIGUSR1,
+            lambda sig, frame: self.io_loop.add_callback_from_signal(
+                self.io_loop.stop))
+        try:
+            timer = threading.Timer(0.05, os.kill, (os.getpid(), signal.SIGUSR1))
+            self.io_loop.add_callback(timer.start)
+            self.io_loop.add_timeout(self.io_loop.time() + 5, self.io_loop.stop)
+            start = time.time()
+            self.io_loop.start()
+            self.assertLess(time.time() - start, 4)
+            # The eventfd was replaced by a pipe rather than joined by one.
+            self.assertIsInstance(self.io_loop._waker, Waker)
+            self.assertEqual(len(self.io_loop._handlers), 1)
+        finally:
+            signal.signal(signal.SIGUSR1, old_handler)
+
+
 @unittest.skipIf(futures is None, "futures module not present")
 class TestIOLoopFutures(AsyncTestCase):
     def test_add_future_threads(self):
@@ -522,6 +952,105 @@ class TestIOLoopFutures(AsyncTestCase):
         self.assertEqual(self.future.exception().args[0], "worker")
 
 
+@unittest.skipIf(futures is None, "futures module not present")
+class TestIOLoopRunInExecutor(AsyncTestCase):
+    @gen_test
+    def test_default_executor(self):
+        result = yield self.io_loop.run_in_executor(None, pow, 2, 10)
+        self.assertEqual(result, 1024)
+        executor = self.io_loop.get_default_executor()
+        self.assertIsInstance(executor, BoundedExecutor)
+        self.assertIs(self.io_loop.get_default_executor(), executor)
+        stats = executor.get_stats()
+        self.assertEqual(stats['submitted'], 1)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+
+    @gen_test
+    def test_exception(self):
+        with self.assertRaises(ZeroDivisionError):
+            yield self.io_loop.run_in_executor(None, lambda: 1 / 0)
+        self.assertEqual(
+            self.io_loop.get_default_executor().get_stats()['failed'], 1)
+
+    @gen_test
+    def test_plain_executor(self):
+        with futures.ThreadPoolExecutor(1) as pool:
+            name = yield self.io_loop.run_in_executor(
+                pool, lambda: threading.current_thread().name)
+        self.assertNotEqual(name, threading.current_thread().name)
+
+    @gen_test
+    def test_set_default_executor(self):
+        with futures.ThreadPoolExecutor(1) as pool:
+            self.io_loop.set_default_executor(pool)
+            self.assertIs(self.io_loop.get_default_executor(), pool)
+            result = yield self.io_loop.run_in_executor(None, len, 'abc')
+        self.assertEqual(result, 3)
+
+    @gen_test
+    def test_bounded_submission(self):
+        release = threading.Event()
+        started = []
+
+        def task(i):
+            started.append(i)
+            release.wait(5)
+            return i
+        with futures.ThreadPoolExecutor(4) as pool:
+            executor = BoundedExecutor(pool, max_pending=2)
+            results = [self.io_loop.run_in_executor(executor, task, i)
+                       for i in range(5)]
+            stats = executor.get_stats()
+            self.assertEqual(stats['pending'], 2)
+            self.assertEqual(stats['waiting'], 3)
+            self.assertEqual(stats['queue_depth'], 5)
+            yield gen.sleep(0.01)
+            # Only max_pending tasks ever reach the pool at once.
+            self.assertEqual(sorted(started), [0, 1])
+            release.set()
+            self.assertEqual((yield results), list(range(5)))
+        stats = executor.get_stats()
+        self.assertEqual(stats['completed'], 5)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertGreater(stats['max_queue_time'], 0)
+        self.assertGreater(stats['max_run_time'], 0)
+
+    @gen_test
+    def test_max_waiting(self):
+        release = threading.Event()
+        with futures.ThreadPoolExecutor(1) as pool:
+            executor = BoundedExecutor(pool, max_pending=1, max_waiting=2)
+            results = [executor.submit(release.wait, 5) for i in range(4)]
+            # One task runs, two wait and the last is turned away.
+            with self.assertRaises(ExecutorFull):
+                yield results[3]
+            self.assertEqual(executor.get_stats()['rejected'], 1)
+            self.assertEqual(executor.get_stats()['waiting'], 2)
+            release.set()
+            self.assertEqual((yield results[:3]), [True] * 3)
+
+    @gen_test
+    def test_shutdown_fails_waiting(self):
+        release = threading.Event()
+        with futures.ThreadPoolExecutor(1) as pool:
+            executor = BoundedExecutor(pool, max_pending=1)
+            running = executor.submit(release.wait, 5)
+            waiting = executor.submit(len, 'abc')
+            release.set()
+            executor.shutdown()
+            with self.assertRaises(RuntimeError):
+                yield waiting
+            self.assertTrue((yield running))
+        self.assertEqual(executor.get_stats()['waiting'], 0)
+
+    def test_close_shuts_down_default_executor(self):
+        io_loop = IOLoop(make_current=False)
+        executor = io_loop.get_default_executor().executor
+        io_loop.close()
+        self.assertRaises(RuntimeError, executor.submit, len, '')
+
+
 class TestIOLoopRunSync(unittest.TestCase):
     def setUp(self):
         self.io_loop = IOLoop()
@@ -605,5 +1134,104 @@ class TestPeriodicCallback(unittest.TestCase):
         self.assertEqual(calls, expected)
 
 
+class TestPeriodicScheduler(unittest.TestCase):
+    def setUp(self):
+        self.io_loop = FakeTimeIOLoop()
+        self.io_loop.make_current()
+
+    def tearDown(self):
+        self.io_loop.close()
+
+    def test_shared_tick(self):
+        scheduler = PeriodicScheduler()
+        calls = []
+        pcs = [PeriodicCallback(functools.partial(calls.append, i), 10000,
+                                scheduler=scheduler)
+               for i in range(100)]
+        for pc in pcs:
+            pc.start()
+        other = PeriodicCallback(lambda: None, 5000, scheduler=scheduler)
+        other.start()
+        self.assertEqual(len(scheduler), 2)
+        self.assertEqual(len(self.io_loop._timeouts), 2)
+        self.io_loop.call_later(25, self.io_loop.stop)
+        self.io_loop.start()
+        self.assertEqual(calls, list(range(100)) * 2)
+        for pc in pcs:
+            pc.stop()
+        other.stop()
+        self.assertEqual(len(scheduler), 0)
+
+    def test_stop_in_callback(self):
+        scheduler = PeriodicScheduler()
+        calls = []
+
+        def cb():
+            calls.append(self.io_loop.time())
+            if len(calls) == 2:
+                pc.stop()
+                self.io_loop.add_callback(self.io_loop.stop)
+        pc = PeriodicCallback(cb, 10000, scheduler=scheduler)
+        pc.start()
+        self.io_loop.start()
+        self.assertEqual(calls, [1010, 1020])
+        self.assertEqual(len(scheduler), 0)
+        self.assertFalse(pc.is_running())
+
+    def test_overrun(self):
+        sleep_durations = [9, 9, 10, 11, 20, 20, 35, 35, 0, 0]
+        expected = [1010, 1020, 1030, 1050, 1070, 1100, 1130, 1170, 1210,
+                    1220, 1230]
+        calls = []
+        missed = []
+
+        def cb():
+            calls.append(self.io_loop.time())
+            if not sleep_durations:
+                self.io_loop.stop()
+                return
+            self.io_loop.sleep(sleep_durations.pop(0))
+        scheduler = PeriodicScheduler(
+            on_missed=lambda callback_time, n: missed.append(n))
+        PeriodicCallback(cb, 10000, scheduler=scheduler).start()
+        self.io_loop.start()
+        self.assertEqual(calls, expected)
+        self.assertEqual(missed, [1, 1, 2, 2, 3, 3])
+        self.assertEqual(scheduler.missed_ticks, 12)
+
+    def test_missed_tick_logged(self):
+        def cb():
+            self.io_loop.sleep(25)
+            self.io_loop.add_callback(self.io_loop.stop)
+        scheduler = PeriodicScheduler()
+        PeriodicCallback(cb, 10000, scheduler=scheduler).start()
+        with ExpectLog(gen_log, "Periodic tick of 10000ms missed 2 times"):
+            self.io_loop.start()
+
+    def test_jitter_does_not_drift(self):
+        calls = []
+
+        def cb():
+            calls.append(self.io_loop.time())
+        scheduler = PeriodicScheduler(jitter=0.5)
+        PeriodicCallback(cb, 10000, scheduler=scheduler).start()
+        self.io_loop.call_later(995, self.io_loop.stop)
+        self.io_loop.start()
+        self.assertEqual(len(calls), 99)
+        for i, t in enumerate(calls):
+            self.assertLessEqual(abs(t - (1010 + 10 * i)), 2.5)
+        self.assertEqual(scheduler.missed_ticks, 0)
+
+    def test_bad_arguments(self):
+        self.assertRaises(ValueError, PeriodicScheduler, jitter=1)
+        scheduler = PeriodicScheduler()
+        other_loop = IOLoop(make_current=False)
+        try:
+            self.assertRaises(ValueError, PeriodicCallback, lambda: None, 10,
+                              io_loop=other_loop, scheduler=scheduler)
+        finally:
+            other_loop.close()
+
+
 if __name__ == "__main__":
     unittest.main()
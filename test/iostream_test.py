@@ -2,10 +2,10 @@ from __future__ import absolute_import, division, print_function, with_statement
 from tornado.concurrent import Future
 from tornado import gen
 from tornado import netutil
-from tornado.iostream import IOStream, SSLIOStream, PipeIOStream, StreamClosedError
+from tornado.iostream import IOStream, SSLIOStream, PipeIOStream, StreamClosedError, StreamPipe, track_streams, open_streams, dump_stream_stats, aggregate_stream_stats
 from tornado.httputil import HTTPHeaders
 from tornado.log import gen_log, app_log
-from tornado.netutil import ssl_wrap_socket
+from tornado.netutil import ssl_wrap_socket, SSLSessionCache
 from tornado.stack_context import NullContext
 from tornado.tcpserver import TCPServer
 from tornado.testing import AsyncHTTPTestCase, AsyncHTTPSTestCase, AsyncTestCase, bind_unused_port, ExpectLog, gen_test
@@ -17,8 +17,14 @@ import os
 import platform
 import socket
 import ssl
+import tempfile
 import sys
 
+try:
+    from tornado.platform.epoll import EPollIOLoop
+except ImportError:
+    EPollIOLoop = None
+
 
 def _server_ssl_options():
     return dict(
@@ -446,6 +452,181 @@ class TestIOStreamMixin(object):
             server.close()
             client.close()
 
+    def test_large_read_until_close(self):
+        # Much more data than read_chunk_size, consumed by a close
+        # that happens inside read_from_fd.
+        server, client = self.make_iostream_pair(read_chunk_size=256)
+        try:
+            client.read_until_close(self.stop)
+            server.write(b"A" * 4096, server.close)
+            data = self.wait()
+            self.assertEqual(data, b"A" * 4096)
+        finally:
+            server.close()
+            client.close()
+
+    def test_read_buffer_reuse(self):
+        # Many small reads share one buffer, and delimiters that straddle
+        # two socket reads are still found.
+        server, client = self.make_iostream_pair(read_chunk_size=256)
+        try:
+            lines = [str(i).encode("ascii") * (i % 300) + b"\r\n"
+                     for i in range(100)]
+            server.write(b"".join(lines))
+            for line in lines:
+                client.read_until(b"\r\n", self.stop)
+                self.assertEqual(self.wait(), line)
+            self.assertEqual(client._read_buffer_size, 0)
+            self.assertEqual(client._read_buffer_pos, 0)
+            self.assertEqual(len(client._read_buffer), 0)
+            server.write(b"xyz\r\nabc")
+            client.read_until_regex(b"^xyz\r\n", self.stop)
+            self.assertEqual(self.wait(), b"xyz\r\n")
+            client.read_bytes(3, self.stop)
+            self.assertEqual(self.wait(), b"abc")
+        finally:
+            server.close()
+            client.close()
+
+    def test_idle_read_buffer_released(self):
+        # A stream with nothing buffered holds no read storage, however
+        # large its last read was.
+        server, client = self.make_iostream_pair()
+        try:
+            server.write(b"A" * 100000 + b"\r\n")
+            client.read_until(b"\r\n", self.stop)
+            self.assertEqual(len(self.wait()), 100002)
+            self.assertEqual(len(client._read_buffer), 0)
+            server.write(b"B" * 1000)
+            client.read_bytes(600, self.stop)
+            self.assertEqual(self.wait(), b"B" * 600)
+            self.assertGreater(len(client._read_buffer), 0)
+            client.read_bytes(400, self.stop)
+            self.assertEqual(self.wait(), b"B" * 400)
+            self.assertEqual(len(client._read_buffer), 0)
+        finally:
+            server.close()
+            client.close()
+
+    def _test_write_file(self, sendfile):
+        server, client = self.make_iostream_pair()
+        try:
+            if not sendfile:
+                server._sendfile = False
+            data = b"".join(str(i).encode("ascii") for i in range(100000))
+            with tempfile.TemporaryFile() as f:
+                f.write(data)
+                f.flush()
+
+                @gen_test
+                def f_test(self):
+                    # Data written before and after the file is sent
+                    # around it.
+                    server.write(b"head")
+                    server.write_file(f, 10, 300000)
+                    write_future = server.write(b"tail")
+                    received = yield client.read_bytes(300008)
+                    self.assertEqual(received,
+                                     b"head" + data[10:300010] + b"tail")
+                    yield write_future
+                    self.assertFalse(server.writing())
+                    yield server.write_file(f, len(data) - 5)
+                    received = yield client.read_bytes(5)
+                    self.assertEqual(received, data[-5:])
+                f_test(self)
+        finally:
+            server.close()
+            client.close()
+
+    def test_write_file(self):
+        self._test_write_file(sendfile=True)
+
+    def test_write_file_buffered(self):
+        self._test_write_file(sendfile=False)
+
+    def test_read_into(self):
+        server, client = self.make_iostream_pair()
+        try:
+            buf = bytearray(10)
+            # Part of the first read is already buffered by read_until.
+            server.write(b"hello\r\n0123")
+            client.read_until(b"\r\n", self.stop)
+            self.assertEqual(self.wait(), b"hello\r\n")
+            client.read_into(buf, self.stop)
+            server.write(b"456789abcdefghij")
+            self.assertEqual(self.wait(), 10)
+            self.assertEqual(buf, b"0123456789")
+            # The same buffer is reused; data left over from the socket
+            # read is kept for the next read.
+            client.read_into(buf, self.stop)
+            self.assertEqual(self.wait(), 10)
+            self.assertEqual(buf, b"abcdefghij")
+            client.read_bytes(3, self.stop)
+            server.write(b"xyz")
+            self.assertEqual(self.wait(), b"xyz")
+        finally:
+            server.close()
+            client.close()
+
+    def test_read_into_partial(self):
+        server, client = self.make_iostream_pair()
+
+        @gen_test
+        def f(self):
+            buf = bytearray(10)
+            server.write(b"hello")
+            n = yield client.read_into(buf, partial=True)
+            self.assertEqual(buf[:n], b"hello")
+            server.write(b"0123456789abc")
+            # A memoryview limits how much of the buffer is filled.
+            n = yield client.read_into(memoryview(buf)[2:6])
+            self.assertEqual(n, 4)
+            self.assertEqual(buf[:6], b"he0123")
+            n = yield client.read_into(buf, partial=True)
+            self.assertEqual(buf[:n], b"456789abc")
+        try:
+            f(self)
+        finally:
+            server.close()
+            client.close()
+
+    def test_write_watermarks(self):
+        server, client = self.make_iostream_pair()
+
+        @gen_test
+        def f(self):
+            high_water = []
+            server.set_write_watermarks(64 * 1024)
+            server.set_high_water_callback(lambda: high_water.append(True))
+            self.assertTrue(server.wait_for_drain().done())
+            data = b"x" * (4 * 1024 * 1024)
+            write_future = server.write(data)
+            # The client isn't reading, so most of the data is buffered.
+            drain_future = server.wait_for_drain()
+            self.assertFalse(drain_future.done())
+            read_future = client.read_bytes(len(data))
+            yield drain_future
+            self.assertLessEqual(server._write_buffer_size, 16 * 1024)
+            self.assertEqual(high_water, [True])
+            yield write_future
+            yield read_future
+            # Without watermarks wait_for_drain waits for every byte.
+            server.set_write_watermarks(None)
+            server.write(data)
+            drain_future = server.wait_for_drain()
+            read_future = client.read_bytes(len(data))
+            yield drain_future
+            self.assertFalse(server.writing())
+            yield read_future
+            server.close()
+            with self.assertRaises(StreamClosedError):
+                yield server.wait_for_drain()
+        try:
+            f(self)
+        finally:
+            server.close()
+            client.close()
+
     def test_streaming_read_until_close_after_close(self):
         # Same as the preceding test but with a streaming_callback.
         # All data should go through the streaming callback,
@@ -491,6 +672,23 @@ class TestIOStreamMixin(object):
             server.close()
             client.close()
 
+    def test_read_until_trickle(self):
+        # The delimiter search resumes where the previous one stopped;
+        # make sure delimiters split across reads are still found.
+        server, client = self.make_iostream_pair()
+        try:
+            results = []
+            server.read_until(b"\r\n\r\n", results.append)
+            for chunk in [b"abc\r", b"\n", b"d\r\n\r", b"\r", b"\n\r", b"\n"]:
+                self.assertEqual(results, [])
+                client.write(chunk)
+                self.io_loop.call_later(0.01, self.stop)
+                self.wait()
+            self.assertEqual(results, [b"abc\r\nd\r\n\r\r\n\r\n"])
+        finally:
+            server.close()
+            client.close()
+
     def test_close_callback_with_pending_read(self):
         # Regression test for a bug that was introduced in 2.3
         # where the IOStream._close_callback would never be called
@@ -545,9 +743,9 @@ class TestIOStreamMixin(object):
             client.write(b'a')
             # Stub out read_from_fd to make it fail.
 
-            def fake_read_from_fd():
+            def fake_read_from_fd(buf):
                 os.close(server.socket.fileno())
-                server.__class__.read_from_fd(server)
+                return server.__class__.read_from_fd(server, buf)
             server.read_from_fd = fake_read_from_fd
             # This log message is from _handle_read (not read_from_fd).
             with ExpectLog(gen_log, "error on read"):
@@ -754,6 +952,41 @@ class TestIOStreamMixin(object):
             server.close()
             client.close()
 
+    def test_pipe_streams(self):
+        server1, client1 = self.make_iostream_pair()
+        server2, client2 = self.make_iostream_pair()
+        data = os.urandom(1024 * 1024)
+
+        @gen_test
+        def f(self):
+            # Data the stream has already read is forwarded first.
+            client1.write(b"hello")
+            self.assertEqual((yield server1.read_bytes(1)), b"h")
+            pipe = StreamPipe(server1, server2, chunk_size=16384)
+            self.assertEqual(pipe.spliced, server1._splice)
+            pipe_future = pipe.start()
+            self.assertEqual((yield client2.read_bytes(4)), b"ello")
+            # Both directions at once, with more data than fits in the
+            # socket buffers.
+            client1.write(data)
+            client2.write(data)
+            received = yield [client2.read_bytes(len(data)),
+                              client1.read_bytes(len(data))]
+            self.assertEqual(received, [data, data])
+            # Closing one end closes the other.
+            client1.close()
+            self.assertIs((yield pipe_future), pipe)
+            self.assertTrue(server1.closed())
+            self.assertTrue(server2.closed())
+            yield client2.read_until_close()
+            self.assertEqual(pipe.bytes_a_to_b, len(data) + 4)
+            self.assertEqual(pipe.bytes_b_to_a, len(data))
+        try:
+            f(self)
+        finally:
+            for stream in (server1, client1, server2, client2):
+                stream.close()
+
     def test_flow_control(self):
         MB = 1024 * 1024
         server, client = self.make_iostream_pair(max_buffer_size=5 * MB)
@@ -793,6 +1026,156 @@ class TestIOStream(TestIOStreamMixin, AsyncTestCase):
     def _make_client_iostream(self, connection, **kwargs):
         return IOStream(connection, **kwargs)
 
+    @unittest.skipIf(not hasattr(socket.socket, "sendmsg"), "sendmsg not available")
+    def test_write_scatter_gather(self):
+        server, client = self.make_iostream_pair()
+        try:
+            self.assertTrue(server._scatter_gather)
+            calls = []
+            write_vectored_to_fd = server._write_vectored_to_fd
+
+            def recording_write(buffers):
+                num_bytes = write_vectored_to_fd(buffers)
+                calls.append((len(buffers), num_bytes))
+                return num_bytes
+            server._write_vectored_to_fd = recording_write
+            # Fill the socket buffer so later writes queue up, then write
+            # many chunks of different sizes and check they arrive intact.
+            chunks = [str(i).encode("ascii") * (i * 97 % 5000)
+                      for i in range(500)]
+            server.write(b"x" * 1024 * 1024)
+            for chunk in chunks:
+                server.write(chunk)
+            expected = b"x" * 1024 * 1024 + b"".join(chunks)
+            client.read_bytes(len(expected), self.stop)
+            self.assertEqual(self.wait(), expected)
+            self.assertTrue(any(n > 1 for n, num_bytes in calls))
+            self.assertEqual(server._write_buffer_size, 0)
+            self.assertEqual(server._write_buffer_pos, 0)
+        finally:
+            server.close()
+            client.close()
+
+    def test_stats(self):
+        server, client = self.make_iostream_pair()
+        try:
+            self.assertIsNone(server.get_stats())
+            server.enable_stats()
+            client.enable_stats()
+            # Fill the socket buffer so the server's writes block.
+            server.write(b"x" * 10 * 1024 * 1024)
+            client.read_bytes(10 * 1024 * 1024, self.stop)
+            self.wait()
+            server_stats = server.get_stats().snapshot()
+            client_stats = client.get_stats().snapshot()
+            self.assertEqual(server_stats['bytes_written'], 10 * 1024 * 1024)
+            self.assertGreater(server_stats['writes'], 1)
+            self.assertGreater(server_stats['write_blocks'], 0)
+            self.assertGreater(server_stats['write_blocked_time'], 0)
+            self.assertEqual(client_stats['bytes_read'], 10 * 1024 * 1024)
+            self.assertGreaterEqual(client_stats['reads'],
+                                    10 * 1024 * 1024 // client.read_chunk_size)
+            self.assertEqual(server_stats['bytes_read'], 0)
+            snapshot = client.stats_snapshot()
+            self.assertEqual(snapshot['stream'], 'IOStream')
+            self.assertEqual(snapshot['fileno'], client.fileno())
+            self.assertEqual(snapshot['read_buffer_size'], 0)
+            self.assertEqual(snapshot['bytes_read'], 10 * 1024 * 1024)
+        finally:
+            server.close()
+            client.close()
+
+    def test_write_cork(self):
+        server, client = self.make_iostream_pair()
+        try:
+            server.enable_stats()
+            server.set_write_cork(threshold=1024)
+            for i in range(10):
+                server.write(b"abc")
+            future = server.write(b"def")
+            self.assertEqual(server.get_stats().writes, 0)
+            self.assertFalse(future.done())
+            client.read_bytes(33, self.stop)
+            self.assertEqual(self.wait(), b"abc" * 10 + b"def")
+            self.assertTrue(future.done())
+            self.assertEqual(server.get_stats().writes, 1)
+            # Reaching the threshold sends everything at once.
+            server.write(b"a" * 1000)
+            server.write(b"b" * 100)
+            self.assertEqual(server.get_stats().writes, 2)
+            client.read_bytes(1100, self.stop)
+            self.wait()
+            # Closing the stream sends what has been held back.
+            server.write(b"bye")
+            server.close()
+            client.read_until_close(self.stop)
+            self.assertEqual(self.wait(), b"bye")
+        finally:
+            server.close()
+            client.close()
+
+    def test_track_streams(self):
+        track_streams()
+        self.addCleanup(track_streams, False)
+        try:
+            self.assertEqual(open_streams(), [])
+            server, client = self.make_iostream_pair()
+            self.assertEqual(set(open_streams()), set([server, client]))
+            client.write(b"abcd")
+            server.read_bytes(2, self.stop)
+            self.wait()
+            # The server has allocated a read buffer and the client has
+            # not, so the server comes first.
+            dump = dump_stream_stats()
+            self.assertEqual(len(dump), 2)
+            self.assertEqual(dump[0]['fileno'], server.fileno())
+            self.assertEqual(dump[0]['read_buffer_size'], 2)
+            totals = aggregate_stream_stats()
+            self.assertEqual(totals['streams'], 2)
+            self.assertEqual(totals['bytes_read'], 4)
+            self.assertEqual(totals['bytes_written'], 4)
+            self.assertEqual(totals['read_buffer_size'], 2)
+            server.close()
+            self.assertEqual(open_streams(), [client])
+        finally:
+            server.close()
+            client.close()
+
+
+@unittest.skipIf(EPollIOLoop is None, "epoll not available")
+class TestIOStreamEdgeTriggered(TestIOStream):
+    # Repeat the IOStream tests with an edge-triggered epoll IOLoop.
+    def get_new_ioloop(self):
+        return EPollIOLoop(edge_triggered=True)
+
+    def test_single_registration(self):
+        calls = []
+        update_handler = self.io_loop.update_handler
+
+        def counting_update_handler(fd, events):
+            calls.append(events)
+            update_handler(fd, events)
+        self.io_loop.update_handler = counting_update_handler
+        server, client = self.make_iostream_pair()
+        try:
+            for i in range(3):
+                client.write(b"ping\r\n")
+                server.read_until(b"\r\n", self.stop)
+                self.assertEqual(self.wait(), b"ping\r\n")
+                server.write(b"pong\r\n")
+                client.read_until(b"\r\n", self.stop)
+                self.assertEqual(self.wait(), b"pong\r\n")
+            self.assertEqual(calls, [])
+        finally:
+            server.close()
+            client.close()
+
+
+@unittest.skipIf(EPollIOLoop is None, "epoll not available")
+class TestIOStreamWebHTTPEdgeTriggered(TestIOStreamWebHTTP):
+    def get_new_ioloop(self):
+        return EPollIOLoop(edge_triggered=True)
+
 
 class TestIOStreamSSL(TestIOStreamMixin, AsyncTestCase):
     def _make_server_iostream(self, connection, **kwargs):
@@ -873,10 +1256,12 @@ class TestIOStreamStartTLS(AsyncTestCase):
         recv_line = yield self.client_stream.read_until(b"\r\n")
         self.assertEqual(line, recv_line)
 
-    def client_start_tls(self, ssl_options=None, server_hostname=None):
+    def client_start_tls(self, ssl_options=None, server_hostname=None,
+                         ssl_session_cache=None):
         client_stream = self.client_stream
         self.client_stream = None
-        return client_stream.start_tls(False, ssl_options, server_hostname)
+        return client_stream.start_tls(False, ssl_options, server_hostname,
+                                       ssl_session_cache)
 
     def server_start_tls(self, ssl_options=None):
         server_stream = self.server_stream
@@ -922,15 +1307,49 @@ class TestIOStreamStartTLS(AsyncTestCase):
         # Test that server_hostname parameter to start_tls is being used.
         # The check_hostname functionality is only available in python 2.7 and
         # up and in python 3.4 and up.
+        cache = SSLSessionCache()
         server_future = self.server_start_tls(_server_ssl_options())
         client_future = self.client_start_tls(
             ssl.create_default_context(),
-            server_hostname=b'127.0.0.1')
+            server_hostname=b'127.0.0.1', ssl_session_cache=cache)
         with ExpectLog(gen_log, "SSL Error"):
             with self.assertRaises(ssl.SSLError):
                 yield client_future
         with self.assertRaises((ssl.SSLError, socket.error)):
             yield server_future
+        self.assertEqual(cache.get_stats()['sessions'], 0)
+
+
+@unittest.skipIf(not SSLSessionCache.supported, 'ssl.SSLSession not present')
+class SSLSessionCacheVerifyTest(AsyncTestCase):
+    @gen_test
+    def test_verify_cert_failure_not_cached(self):
+        # The certificate is trusted, so the handshake succeeds, but it
+        # isn't valid for the hostname; its session must not be cached.
+        sock, port = bind_unused_port()
+        server = TCPServer(ssl_options=_server_ssl_options())
+        server.handle_stream = lambda stream, address: None
+        server.add_socket(sock)
+        context = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        context.verify_mode = ssl.CERT_REQUIRED
+        if hasattr(ssl, 'TLSVersion'):
+            # A TLS 1.2 session can be cached as soon as the handshake
+            # is done; a TLS 1.3 one has to wait for a ticket.
+            context.maximum_version = ssl.TLSVersion.TLSv1_2
+        context.load_verify_locations(
+            os.path.join(os.path.dirname(__file__), 'test.crt'))
+        cache = SSLSessionCache()
+        client = SSLIOStream(socket.socket(), ssl_options=context,
+                             ssl_session_cache=cache)
+        try:
+            with ExpectLog(gen_log, "Invalid SSL certificate"):
+                with self.assertRaises(StreamClosedError):
+                    yield client.connect(('127.0.0.1', port),
+                                         server_hostname='foo.example.com')
+            self.assertEqual(cache.get_stats()['sessions'], 0)
+        finally:
+            server.stop()
+            client.close()
 
 
 class WaitForHandshakeTest(AsyncTestCase):
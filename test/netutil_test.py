@@ -2,12 +2,16 @@ from __future__ import absolute_import, division, print_function, with_statement
 
 import os
 import signal
+import shutil
 import socket
+import ssl
 from subprocess import Popen
 import sys
+import tempfile
 import time
 
-from tornado.netutil import BlockingResolver, ThreadedResolver, is_valid_ip, bind_sockets
+from tornado import netutil
+from tornado.netutil import BlockingResolver, ThreadedResolver, is_valid_ip, bind_sockets, SSLSessionCache
 from tornado.stack_context import ExceptionStackContext
 from tornado.testing import AsyncTestCase, gen_test
 from tornado.test.util import unittest, skipIfNoNetwork
@@ -188,6 +192,98 @@ class IsValidIPTest(unittest.TestCase):
         self.assertTrue(not is_valid_ip('\x00'))
 
 
+@unittest.skipIf(not hasattr(ssl, 'SSLContext'), 'ssl.SSLContext not present')
+class SSLContextCacheTest(unittest.TestCase):
+    def setUp(self):
+        netutil._ssl_context_cache.clear()
+        self.tmpdir = tempfile.mkdtemp()
+        self.ca_certs = os.path.join(self.tmpdir, 'ca.crt')
+        shutil.copy(os.path.join(os.path.dirname(__file__), 'test.crt'),
+                    self.ca_certs)
+
+    def tearDown(self):
+        netutil._ssl_context_cache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_equal_options(self):
+        context = netutil._cached_ssl_context(
+            dict(cert_reqs=ssl.CERT_REQUIRED, ca_certs=self.ca_certs))
+        self.assertIsInstance(context, ssl.SSLContext)
+        self.assertIs(netutil._cached_ssl_context(
+            dict(ca_certs=self.ca_certs, cert_reqs=ssl.CERT_REQUIRED)),
+            context)
+        self.assertIsNot(netutil._cached_ssl_context(
+            dict(cert_reqs=ssl.CERT_NONE, ca_certs=self.ca_certs)),
+            context)
+
+    def test_eviction(self):
+        saved_size = netutil._SSL_CONTEXT_CACHE_SIZE
+        netutil._SSL_CONTEXT_CACHE_SIZE = 2
+        try:
+            options = [dict(ca_certs=self.ca_certs, cert_reqs=cert_reqs)
+                       for cert_reqs in (ssl.CERT_NONE, ssl.CERT_OPTIONAL,
+                                         ssl.CERT_REQUIRED)]
+            first = netutil._cached_ssl_context(options[0])
+            second = netutil._cached_ssl_context(options[1])
+            # Using the first context makes the second the oldest, so
+            # only the second is dropped when a third one is added.
+            self.assertIs(netutil._cached_ssl_context(options[0]), first)
+            netutil._cached_ssl_context(options[2])
+            self.assertEqual(len(netutil._ssl_context_cache), 2)
+            self.assertIs(netutil._cached_ssl_context(options[0]), first)
+            self.assertIsNot(netutil._cached_ssl_context(options[1]), second)
+        finally:
+            netutil._SSL_CONTEXT_CACHE_SIZE = saved_size
+
+    def test_file_changed(self):
+        options = dict(ca_certs=self.ca_certs)
+        context = netutil._cached_ssl_context(options)
+        st = os.stat(self.ca_certs)
+        os.utime(self.ca_certs, (st.st_atime, st.st_mtime + 10))
+        # The file is not checked again straight away.
+        self.assertIs(netutil._cached_ssl_context(options), context)
+        saved_interval = netutil._SSL_CONTEXT_CHECK_INTERVAL
+        netutil._SSL_CONTEXT_CHECK_INTERVAL = 0
+        try:
+            new_context = netutil._cached_ssl_context(options)
+            self.assertIsNot(new_context, context)
+            self.assertIs(netutil._cached_ssl_context(options), new_context)
+        finally:
+            netutil._SSL_CONTEXT_CHECK_INTERVAL = saved_interval
+
+
+class SSLSessionCacheTest(unittest.TestCase):
+    def test_context(self):
+        cache = SSLSessionCache()
+        context, other_context = object(), object()
+        self.assertIsNone(cache.get(('a', 443), context))
+        cache.put(('a', 443), 'session', context)
+        self.assertEqual(cache.get(('a', 443), context), 'session')
+        # Sessions are only used with the context that created them.
+        self.assertIsNone(cache.get(('a', 443), other_context))
+        self.assertIsNone(cache.get(('a', 443), context))
+        self.assertEqual(cache.get_stats()['hits'], 1)
+        self.assertEqual(cache.get_stats()['misses'], 3)
+
+    def test_lru(self):
+        cache = SSLSessionCache(max_size=2)
+        context = object()
+        cache.put('a', 'session a', context)
+        cache.put('b', 'session b', context)
+        cache.get('a', context)
+        cache.put('c', 'session c', context)
+        self.assertIsNone(cache.get('b', context))
+        self.assertEqual(cache.get('a', context), 'session a')
+        self.assertEqual(cache.get('c', context), 'session c')
+
+    def test_expiry(self):
+        cache = SSLSessionCache(ttl=-1)
+        context = object()
+        cache.put('a', 'session a', context)
+        self.assertIsNone(cache.get('a', context))
+        self.assertEqual(cache.get_stats()['sessions'], 0)
+
+
 class TestPortAllocation(unittest.TestCase):
     def test_same_port_allocation(self):
         if 'TRAVIS' in os.environ:
@@ -200,3 +296,17 @@ class TestPortAllocation(unittest.TestCase):
         finally:
             for sock in sockets:
                 sock.close()
+
+    @unittest.skipIf(not hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not supported")
+    def test_reuse_port(self):
+        sockets = bind_sockets(0, '127.0.0.1', reuse_port=True)
+        try:
+            port = sockets[0].getsockname()[1]
+            sockets.extend(bind_sockets(port, '127.0.0.1', reuse_port=True))
+            self.assertEqual(len(sockets), 2)
+            for sock in sockets:
+                self.assertTrue(sock.getsockopt(socket.SOL_SOCKET,
+                                                socket.SO_REUSEPORT))
+        finally:
+            for sock in sockets:
+                sock.close()
@@ -49,6 +49,7 @@ TEST_MODULES = [
     'tornado.test.template_test',
     'tornado.test.testing_test',
     'tornado.test.twisted_test',
+    'tornado.test.udpserver_test',
     'tornado.test.util_test',
     'tornado.test.web_test',
     'tornado.test.websocket_test',
@@ -16,7 +16,7 @@ from tornado.httpclient import AsyncHTTPClient
 from tornado.httputil import HTTPHeaders, ResponseStartLine
 from tornado.ioloop import IOLoop
 from tornado.log import gen_log
-from tornado.netutil import Resolver, bind_sockets
+from tornado.netutil import Resolver, SSLSessionCache, bind_sockets, ssl_options_to_context
 from tornado.simple_httpclient import SimpleAsyncHTTPClient, _default_ca_certs
 from tornado.test.httpclient_test import ChunkHandler, CountdownHandler, HelloWorldHandler
 from tornado.test import httpclient_test
@@ -464,6 +464,31 @@ class SimpleHTTPSClientTestCase(SimpleHTTPClientTestMixin, AsyncHTTPSTestCase):
         self.assertRaises(ssl.SSLError, resp.rethrow)
 
 
+@unittest.skipIf(not SSLSessionCache.supported, 'ssl.SSLSession not present')
+class SSLSessionResumptionTest(AsyncHTTPSTestCase):
+    def get_app(self):
+        return Application([url("/hello", HelloWorldHandler)])
+
+    def get_ssl_options(self):
+        # The server can only resume sessions made with the same context.
+        return ssl_options_to_context(
+            super(SSLSessionResumptionTest, self).get_ssl_options())
+
+    def get_http_client(self):
+        return SimpleAsyncHTTPClient(self.io_loop, force_instance=True)
+
+    def test_session_resumption(self):
+        ctx = ssl.SSLContext(ssl.PROTOCOL_SSLv23)
+        for i in range(3):
+            resp = self.fetch("/hello", ssl_options=ctx,
+                              headers={"Connection": "close"})
+            self.assertEqual(resp.body, b"Hello world!")
+        stats = self.http_client.ssl_session_cache.get_stats()
+        self.assertEqual(stats['handshakes'], 3)
+        self.assertEqual(stats['full_handshakes'], 1)
+        self.assertEqual(stats['resumed_handshakes'], 2)
+
+
 class CreateAsyncHTTPClientTestCase(AsyncTestCase):
     def setUp(self):
         super(CreateAsyncHTTPClientTestCase, self).setUp()
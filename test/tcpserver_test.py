@@ -1,11 +1,14 @@
 import socket
+import threading
 
 from tornado import gen
+from tornado.ioloop import IOLoopGroup
 from tornado.iostream import IOStream
 from tornado.log import app_log
 from tornado.stack_context import NullContext
 from tornado.tcpserver import TCPServer
 from tornado.testing import AsyncTestCase, ExpectLog, bind_unused_port, gen_test
+from tornado.test.util import unittest
 
 
 class TCPServerTest(AsyncTestCase):
@@ -36,3 +39,42 @@ class TCPServerTest(AsyncTestCase):
                 server.stop()
             if client is not None:
                 client.close()
+
+
+@unittest.skipIf(not hasattr(socket, "SO_REUSEPORT"), "SO_REUSEPORT not supported")
+class TCPServerGroupTest(AsyncTestCase):
+    def setUp(self):
+        super(TCPServerGroupTest, self).setUp()
+        self.group = IOLoopGroup(2)
+
+    def tearDown(self):
+        self.group.close(all_fds=True)
+        super(TCPServerGroupTest, self).tearDown()
+
+    @gen_test
+    def test_listen_on_group(self):
+        class TestServer(TCPServer):
+            def handle_stream(self, stream, address):
+                name = threading.current_thread().name
+                stream.write(name.encode('ascii'), callback=stream.close)
+
+        servers = TestServer.listen_on_group(self.group, 0, '127.0.0.1')
+        self.assertEqual([s.io_loop for s in servers], self.group.loops)
+        self.group.start()
+        # Sockets are registered from each loop's own thread.
+        for i in range(len(self.group)):
+            yield self.group.run_on(i, lambda: None)
+        ports = set(sock.getsockname()[1] for server in servers
+                    for sock in server._sockets.values())
+        self.assertEqual(len(ports), 1)
+        port = ports.pop()
+        names = set()
+        for i in range(20):
+            client = IOStream(socket.socket())
+            yield client.connect(('127.0.0.1', port))
+            names.add((yield client.read_until_close()))
+            client.close()
+        # The kernel may not spread 20 connections evenly, but every
+        # connection must have been served by one of the group's threads.
+        self.assertTrue(names)
+        self.assertTrue(names <= set([b'tornado-ioloop-0', b'tornado-ioloop-1']))
@@ -0,0 +1,186 @@
+from __future__ import absolute_import, division, print_function, with_statement
+
+import socket
+
+from tornado.ioloop import IOLoop
+from tornado.log import app_log
+from tornado.netutil import bind_sockets
+from tornado.testing import AsyncTestCase, ExpectLog
+from tornado.test.util import unittest
+from tornado.udpserver import DatagramEndpoint, UDPServer
+
+
+def bind_udp_socket():
+    [sock] = bind_sockets(0, '127.0.0.1', family=socket.AF_INET,
+                          socktype=socket.SOCK_DGRAM)
+    return sock
+
+
+class DatagramEndpointTest(AsyncTestCase):
+    def setUp(self):
+        super(DatagramEndpointTest, self).setUp()
+        self.batches = []
+        self.endpoint = DatagramEndpoint(bind_udp_socket(), self.on_batch,
+                                         io_loop=self.io_loop, max_batch=4,
+                                         max_datagram_size=16)
+        self.address = self.endpoint.socket.getsockname()
+        self.client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.client.bind(('127.0.0.1', 0))
+
+    def tearDown(self):
+        self.endpoint.close()
+        self.client.close()
+        super(DatagramEndpointTest, self).tearDown()
+
+    def on_batch(self, datagrams):
+        # Kept as they are: by default the data is a copy.
+        self.batches.append(datagrams)
+        if sum(len(batch) for batch in self.batches) >= self.expected:
+            self.stop()
+
+    def test_batched_receive(self):
+        for i in range(10):
+            self.client.sendto(b'msg%d' % i, self.address)
+        self.expected = 10
+        self.wait()
+        self.assertEqual([len(batch) for batch in self.batches], [4, 4, 2])
+        data = [d for batch in self.batches for d, address in batch]
+        self.assertEqual(data, [b'msg%d' % i for i in range(10)])
+        self.assertTrue(all(isinstance(d, bytes) for d in data))
+        client_address = self.client.getsockname()
+        self.assertTrue(all(address == client_address
+                            for batch in self.batches
+                            for d, address in batch))
+        stats = self.endpoint.get_stats()
+        self.assertEqual(stats['received'], 10)
+        self.assertEqual(stats['bytes_received'], 40)
+        self.assertEqual(stats['batches'], 3)
+        self.assertEqual(stats['full_batches'], 2)
+        self.assertEqual(stats['largest_batch'], 4)
+        # Only as many buffers as the largest batch are allocated.
+        self.assertEqual(len(self.endpoint._buffers), 4)
+
+    def test_zero_copy(self):
+        # The views point into the pooled buffers, which the next batch
+        # reuses, so they must be copied to be kept.
+        self.endpoint.zero_copy = True
+        kept = []
+
+        def on_batch(datagrams):
+            for data, address in datagrams:
+                self.assertIsInstance(data, memoryview)
+                kept.append((data, bytes(data)))
+            if len(kept) == 2:
+                self.stop()
+        self.endpoint._callback = on_batch
+        self.client.sendto(b'first', self.address)
+        self.io_loop.call_later(0.05, self.client.sendto, b'second',
+                                self.address)
+        self.wait()
+        self.assertEqual([copy for view, copy in kept], [b'first', b'second'])
+        self.assertEqual(kept[0][0].tobytes(), b'secon')
+
+    def test_truncated(self):
+        self.client.sendto(b'x' * 16, self.address)
+        self.client.sendto(b'y' * 17, self.address)
+        self.expected = 2
+        self.wait()
+        data = [d for batch in self.batches for d, address in batch]
+        self.assertEqual(data, [b'x' * 16, b'y' * 16])
+        self.assertEqual(self.endpoint.get_stats()['truncated'], 1)
+
+    def test_callback_error(self):
+        def on_batch(datagrams):
+            self.stop()
+            1 / 0
+        self.endpoint._callback = on_batch
+        with ExpectLog(app_log, "Error in datagram callback"):
+            self.client.sendto(b'a', self.address)
+            self.wait()
+        self.assertFalse(self.endpoint.closed())
+
+    def test_send_batch(self):
+        client_address = self.client.getsockname()
+        sent = self.endpoint.send_batch([(b'a', client_address),
+                                         (b'b', client_address)])
+        self.assertEqual(sent, 2)
+        self.assertEqual(self.client.recvfrom(16), (b'a', self.address))
+        self.assertEqual(self.client.recvfrom(16), (b'b', self.address))
+        stats = self.endpoint.get_stats()
+        self.assertEqual((stats['sent'], stats['bytes_sent']), (2, 2))
+
+    @unittest.skipIf(not hasattr(socket, 'AF_UNIX'), 'needs AF_UNIX')
+    def test_send_queue(self):
+        # Unlike UDP over loopback, a connected unix datagram socket
+        # stops accepting data when the peer's queue is full.  Check
+        # that further datagrams are queued, then dropped, and that the
+        # queue drains once the peer catches up.
+        a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        endpoint = DatagramEndpoint(a, None, io_loop=self.io_loop,
+                                    max_send_queue=8)
+        b.setblocking(False)
+        try:
+            while not endpoint.get_stats()['send_queue']:
+                self.assertTrue(endpoint.sendto(b'x' * 1024))
+            sent = endpoint.get_stats()['sent']
+            for i in range(7):
+                self.assertTrue(endpoint.sendto(b'x' * 1024))
+            self.assertFalse(endpoint.sendto(b'x' * 1024))
+            stats = endpoint.get_stats()
+            self.assertEqual(stats['send_queue'], 8)
+            self.assertEqual(stats['send_queue_peak'], 8)
+            self.assertEqual(stats['send_queued'], 8)
+            self.assertEqual(stats['send_dropped'], 1)
+
+            received = [0]
+
+            def drain(fd, events):
+                while True:
+                    try:
+                        b.recv(2048)
+                    except socket.error:
+                        break
+                    received[0] += 1
+                if received[0] == sent + 8:
+                    self.stop()
+            self.io_loop.add_handler(b, drain, IOLoop.READ)
+            self.wait()
+            self.io_loop.remove_handler(b)
+            stats = endpoint.get_stats()
+            self.assertEqual(stats['send_queue'], 0)
+            self.assertEqual(stats['sent'], sent + 8)
+        finally:
+            endpoint.close()
+            b.close()
+
+
+class UDPServerTest(AsyncTestCase):
+    def test_echo(self):
+        class EchoServer(UDPServer):
+            def handle_datagram(self, endpoint, data, address):
+                endpoint.sendto(data, address)
+
+        server = EchoServer(io_loop=self.io_loop)
+        server.add_socket(bind_udp_socket())
+        address = server.endpoints[0].socket.getsockname()
+        client = DatagramEndpoint(bind_udp_socket(), self.stop,
+                                  io_loop=self.io_loop)
+        try:
+            client.sendto(b'hello', address)
+            [(data, from_address)] = self.wait()
+            self.assertEqual(from_address, address)
+            stats = server.get_stats()
+            self.assertEqual((stats['received'], stats['sent']), (1, 1))
+        finally:
+            client.close()
+            server.stop()
+        self.assertEqual(server.endpoints, [])
+
+    def test_handle_datagram_not_implemented(self):
+        server = UDPServer(io_loop=self.io_loop)
+        with self.assertRaises(NotImplementedError):
+            server.handle_datagrams(None, [(b'', None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ from tornado.concurrent import Future
 from tornado import gen
 from tornado.escape import json_decode, utf8, to_unicode, recursive_unicode, native_str, to_basestring
 from tornado.httputil import format_timestamp
-from tornado.iostream import IOStream
+from tornado.iostream import BaseIOStream, IOStream
 from tornado import locale
 from tornado.log import app_log, gen_log
 from tornado.simple_httpclient import SimpleAsyncHTTPClient
@@ -28,6 +28,14 @@ try:
 except ImportError:
     import urllib as urllib_parse  # py2
 
+try:
+    from unittest import mock  # python 3.3
+except ImportError:
+    try:
+        import mock  # third-party mock package
+    except ImportError:
+        mock = None
+
 wsgi_safe_tests = []
 
 relpath = lambda *a: os.path.join(os.path.dirname(__file__), *a)
@@ -1227,6 +1235,26 @@ class StaticFileWithPathTest(WebTestCase):
         self.assertEqual(response.body, b"H\xc3\xa9llo\n")
 
 
+class StaticFileWriteFileTest(WebTestCase):
+    def get_app_kwargs(self):
+        return dict(static_path=relpath('static'))
+
+    def get_handlers(self):
+        return []
+
+    @unittest.skipIf(mock is None, 'mock package not present')
+    def test_range_write_file(self):
+        # The body is sent from the file by the stream, not read in
+        # chunks by the handler.
+        with mock.patch.object(BaseIOStream, 'write_file', autospec=True,
+                               side_effect=BaseIOStream.write_file) as write_file:
+            response = self.fetch('/static/robots.txt', headers={
+                'Range': 'bytes=5-9'})
+        self.assertEqual(response.code, 206)
+        self.assertEqual(response.body, b"agent")
+        write_file.assert_called_once_with(mock.ANY, mock.ANY, 5, 5)
+
+
 @wsgi_safe
 class CustomStaticFileTest(WebTestCase):
     def get_handlers(self):
@@ -135,6 +135,15 @@ class WebSocketTest(WebSocketBaseTestCase):
         self.assertEqual(response, 'hello')
         yield self.close(ws)
 
+    @gen_test
+    def test_write_message_future(self):
+        ws = yield self.ws_connect('/echo')
+        # The future resolves once the message has been sent.
+        yield ws.write_message('hello')
+        response = yield ws.read_message()
+        self.assertEqual(response, 'hello')
+        yield self.close(ws)
+
     def test_websocket_callbacks(self):
         websocket_connect(
             'ws://127.0.0.1:%d/echo' % self.get_http_port(),
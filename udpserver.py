@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+#
+# Copyright 2015 The Tornado Authors
+#
+# Licensed under the Apache License, Version 2.0 (the "License"); you may
+# not use this file except in compliance with the License. You may obtain
+# a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+# WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+# License for the specific language governing permissions and limitations
+# under the License.
+
+"""A non-blocking, single-threaded UDP server.
+
+.. versionadded:: 4.3
+"""
+from __future__ import absolute_import, division, print_function, with_statement
+
+import collections
+import errno
+import socket
+
+from tornado.log import app_log, gen_log
+from tornado.ioloop import IOLoop
+from tornado.netutil import bind_sockets
+from tornado import process
+from tornado.util import errno_from_exception
+
+_ERRNO_WOULDBLOCK = (errno.EWOULDBLOCK, errno.EAGAIN)
+
+if hasattr(errno, "WSAEWOULDBLOCK"):
+    _ERRNO_WOULDBLOCK += (errno.WSAEWOULDBLOCK,)
+
+# A full socket send buffer shows up as ENOBUFS on some platforms
+# instead of EAGAIN; either way the datagram can be retried later.
+_ERRNO_SEND_RETRY = _ERRNO_WOULDBLOCK + (errno.ENOBUFS,)
+
+# Errors reported by the kernel for an earlier datagram (e.g. an ICMP
+# port unreachable).  They say nothing about the socket itself.
+_ERRNO_DATAGRAM = (errno.ECONNREFUSED, errno.ECONNRESET, errno.EHOSTUNREACH,
+                   errno.ENETUNREACH, errno.EMSGSIZE)
+
+
+class DatagramEndpoint(object):
+    """Reads and writes datagrams on a non-blocking socket.
+
+    ``sock`` is a bound (and possibly connected) datagram socket.  Each
+    time the socket becomes readable, up to ``max_batch`` datagrams are
+    received with ``recvfrom_into`` into a pool of reused buffers, and
+    ``callback`` is called once with a list of ``(data, address)``
+    pairs, ``data`` being a `bytes` copy of the datagram.  Datagrams
+    longer than ``max_datagram_size`` are truncated, and counted as
+    such.
+
+    With ``zero_copy=True`` the copy is skipped and ``data`` is a
+    `memoryview` into a pooled buffer instead.  The next batch is read
+    into the same buffers, so such a view is only valid until the
+    callback returns: a callback that keeps one (in a list, a closure,
+    `.IOLoop.add_callback`...) must copy it with ``bytes(data)`` first,
+    or it will later see other datagrams' contents.  Passing the view
+    to `sendto` or `send_batch` is safe.
+
+    `sendto` and `send_batch` send right away while the socket accepts
+    data.  When it doesn't, datagrams are copied into a send queue of
+    at most ``max_send_queue`` entries that is flushed when the socket
+    is writable again; datagrams that don't fit in the queue are
+    dropped and counted.
+
+    The counters are available from `get_stats`.
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, sock, callback, io_loop=None, max_batch=32,
+                 max_datagram_size=65536, max_send_queue=1024,
+                 zero_copy=False):
+        self.socket = sock
+        self.socket.setblocking(False)
+        self.io_loop = io_loop or IOLoop.current()
+        self.max_batch = max_batch
+        self.max_datagram_size = max_datagram_size
+        self.max_send_queue = max_send_queue
+        self.zero_copy = zero_copy
+        self._callback = callback
+        # One spare byte per buffer tells a datagram that fit exactly
+        # from one that was cut short.
+        self._buffer_size = max_datagram_size + 1
+        self._buffers = []
+        self._send_queue = collections.deque()
+        self._state = IOLoop.READ
+        self._closed = False
+        self.reset_stats()
+        self.io_loop.add_handler(self.socket, self._handle_events, self._state)
+
+    def reset_stats(self):
+        """Sets all the counters returned by `get_stats` to zero."""
+        self.received = 0
+        self.bytes_received = 0
+        self.batches = 0
+        self.full_batches = 0
+        self.largest_batch = 0
+        self.truncated = 0
+        self.receive_errors = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.send_queued = 0
+        self.send_dropped = 0
+        self.send_errors = 0
+        self.send_queue_peak = len(self._send_queue)
+
+    def get_stats(self):
+        """Returns the endpoint's counters as a dict.
+
+        * ``received``, ``bytes_received``: datagrams received and their
+          (possibly truncated) size
+        * ``batches``: callback invocations; ``full_batches`` counts
+          those that stopped at ``max_batch`` with more data possibly
+          waiting, a sign that the endpoint is falling behind
+        * ``largest_batch``: the most datagrams passed to one callback
+        * ``truncated``: datagrams longer than ``max_datagram_size``
+        * ``sent``, ``bytes_sent``: datagrams handed to the kernel
+        * ``send_queued``: datagrams that had to wait in the send queue;
+          ``send_queue``/``send_queue_peak`` are its current and largest
+          length
+        * ``send_dropped``: datagrams dropped because the queue was full
+        * ``receive_errors``, ``send_errors``: errors reported for
+          individual datagrams (such as ``ECONNREFUSED``)
+        """
+        return dict(received=self.received,
+                    bytes_received=self.bytes_received,
+                    batches=self.batches,
+                    full_batches=self.full_batches,
+                    largest_batch=self.largest_batch,
+                    truncated=self.truncated,
+                    receive_errors=self.receive_errors,
+                    sent=self.sent,
+                    bytes_sent=self.bytes_sent,
+                    send_queued=self.send_queued,
+                    send_queue=len(self._send_queue),
+                    send_queue_peak=self.send_queue_peak,
+                    send_dropped=self.send_dropped,
+                    send_errors=self.send_errors)
+
+    def closed(self):
+        """Returns true if the endpoint has been closed."""
+        return self._closed
+
+    def close(self):
+        """Closes the socket, discarding any queued datagrams."""
+        if self._closed:
+            return
+        self._closed = True
+        self.io_loop.remove_handler(self.socket)
+        self.socket.close()
+        self._send_queue.clear()
+        self._buffers = []
+
+    def sendto(self, data, address=None):
+        """Sends one datagram to ``address``.
+
+        ``address`` may be omitted on a connected socket.  Returns False
+        if the datagram had to be dropped because the send queue is
+        full, True otherwise.
+        """
+        if self._closed:
+            raise socket.error(errno.EBADF, "DatagramEndpoint is closed")
+        if not self._send_queue and self._send(data, address):
+            return True
+        if len(self._send_queue) >= self.max_send_queue:
+            self.send_dropped += 1
+            return False
+        if isinstance(data, memoryview):
+            # The view may point into a pooled receive buffer.
+            data = data.tobytes()
+        self._send_queue.append((data, address))
+        self.send_queued += 1
+        if len(self._send_queue) > self.send_queue_peak:
+            self.send_queue_peak = len(self._send_queue)
+        self._update_state()
+        return True
+
+    def send_batch(self, datagrams):
+        """Sends each ``(data, address)`` pair in ``datagrams``.
+
+        Returns how many of them were sent or queued; the rest were
+        dropped (see `sendto`).
+        """
+        accepted = 0
+        for data, address in datagrams:
+            if self.sendto(data, address):
+                accepted += 1
+        return accepted
+
+    def _send(self, data, address):
+        # Returns False if the socket can't take the datagram right now.
+        try:
+            if address is None:
+                self.socket.send(data)
+            else:
+                self.socket.sendto(data, address)
+        except socket.error as e:
+            err = errno_from_exception(e)
+            if err in _ERRNO_SEND_RETRY:
+                return False
+            if err not in _ERRNO_DATAGRAM:
+                raise
+            self.send_errors += 1
+            return True
+        self.sent += 1
+        self.bytes_sent += len(data)
+        return True
+
+    def _flush_send_queue(self):
+        queue = self._send_queue
+        while queue:
+            data, address = queue[0]
+            if not self._send(data, address):
+                break
+            queue.popleft()
+        self._update_state()
+
+    def _update_state(self):
+        state = IOLoop.READ
+        if self._send_queue:
+            state |= IOLoop.WRITE
+        if state != self._state:
+            self._state = state
+            self.io_loop.update_handler(self.socket, state)
+
+    def _handle_events(self, fd, events):
+        if self._closed:
+            return
+        try:
+            if events & IOLoop.WRITE:
+                self._flush_send_queue()
+            if events & IOLoop.READ:
+                self._handle_read()
+        except Exception:
+            gen_log.error("Uncaught exception, closing datagram endpoint",
+                          exc_info=True)
+            self.close()
+
+    def _handle_read(self):
+        recvfrom_into = self.socket.recvfrom_into
+        buffers = self._buffers
+        zero_copy = self.zero_copy
+        batch = []
+        while len(batch) < self.max_batch:
+            # Buffers are handed out in order, so the pool only grows
+            # to the largest batch seen.
+            if len(buffers) > len(batch):
+                buf = buffers[len(batch)]
+            else:
+                buf = bytearray(self._buffer_size)
+                buffers.append(buf)
+            try:
+                nbytes, address = recvfrom_into(buf)
+            except socket.error as e:
+                err = errno_from_exception(e)
+                if err in _ERRNO_WOULDBLOCK:
+                    break
+                if err in _ERRNO_DATAGRAM:
+                    self.receive_errors += 1
+                    continue
+                raise
+            if nbytes > self.max_datagram_size:
+                nbytes = self.max_datagram_size
+                self.truncated += 1
+            self.bytes_received += nbytes
+            data = memoryview(buf)[:nbytes]
+            batch.append((data if zero_copy else data.tobytes(), address))
+        else:
+            self.full_batches += 1
+        if not batch:
+            return
+        self.received += len(batch)
+        self.batches += 1
+        if len(batch) > self.largest_batch:
+            self.largest_batch = len(batch)
+        try:
+            self._callback(batch)
+        except Exception:
+            app_log.error("Error in datagram callback", exc_info=True)
+
+
+class UDPServer(object):
+    r"""A non-blocking, single-threaded UDP server.
+
+    To use `UDPServer`, define a subclass which overrides
+    `handle_datagram`, or `handle_datagrams` to process a whole batch
+    at once::
+
+        class EchoServer(UDPServer):
+            def handle_datagrams(self, endpoint, datagrams):
+                endpoint.send_batch(datagrams)
+
+        server = EchoServer()
+        server.listen(8888)
+        IOLoop.current().start()
+
+    Sockets are set up with `listen`, `bind`/`start` or `add_sockets`
+    exactly as for `.TCPServer`.  Each socket gets a `DatagramEndpoint`
+    (see there for ``max_batch``, ``max_datagram_size``,
+    ``max_send_queue`` and ``zero_copy``); they are listed in
+    ``endpoints``.  With ``zero_copy=True`` the data passed to
+    `handle_datagrams` and `handle_datagram` is a `memoryview` that the
+    next batch overwrites, so it must be copied to be kept.
+
+    .. versionadded:: 4.3
+    """
+    def __init__(self, io_loop=None, max_batch=32, max_datagram_size=65536,
+                 max_send_queue=1024, zero_copy=False):
+        self.io_loop = io_loop
+        self.max_batch = max_batch
+        self.max_datagram_size = max_datagram_size
+        self.max_send_queue = max_send_queue
+        self.zero_copy = zero_copy
+        self.endpoints = []
+        self._pending_sockets = []
+        self._started = False
+
+    def listen(self, port, address=""):
+        """Starts receiving datagrams on the given port.
+
+        This method may be called more than once to listen on multiple
+        ports.  `listen` takes effect immediately; it is not necessary
+        to call `UDPServer.start` afterwards.  It is, however, necessary
+        to start the `.IOLoop`.
+        """
+        sockets = bind_sockets(port, address=address,
+                               socktype=socket.SOCK_DGRAM)
+        self.add_sockets(sockets)
+
+    def add_sockets(self, sockets):
+        """Makes this server start receiving datagrams on the given sockets.
+
+        The ``sockets`` parameter is a list of datagram sockets such as
+        those returned by `~tornado.netutil.bind_sockets` with
+        ``socktype=socket.SOCK_DGRAM``.
+        """
+        if self.io_loop is None:
+            self.io_loop = IOLoop.current()
+
+        for sock in sockets:
+            self.endpoints.append(self._make_endpoint(sock))
+
+    def add_socket(self, socket):
+        """Singular version of `add_sockets`.  Takes a single socket object."""
+        self.add_sockets([socket])
+
+    def bind(self, port, address=None, family=socket.AF_UNSPEC):
+        """Binds this server to the given port on the given address.
+
+        To start the server, call `start`.  ``address`` and ``family``
+        have the same meaning as for `.TCPServer.bind`.
+        """
+        sockets = bind_sockets(port, address=address, family=family,
+                               socktype=socket.SOCK_DGRAM)
+        if self._started:
+            self.add_sockets(sockets)
+        else:
+            self._pending_sockets.extend(sockets)
+
+    def start(self, num_processes=1):
+        """Starts this server in the `.IOLoop`.
+
+        ``num_processes`` has the same meaning as for `.TCPServer.start`.
+        Every process receives from the same sockets, so each datagram
+        is handled by only one of them.
+        """
+        assert not self._started
+        self._started = True
+        if num_processes != 1:
+            process.fork_processes(num_processes)
+        sockets = self._pending_sockets
+        self._pending_sockets = []
+        self.add_sockets(sockets)
+
+    def stop(self):
+        """Stops receiving datagrams and closes the sockets."""
+        for endpoint in self.endpoints:
+            endpoint.close()
+        self.endpoints = []
+
+    def get_stats(self):
+        """Returns the sum of the counters of all the endpoints.
+
+        ``largest_batch`` and ``send_queue_peak`` are the largest of the
+        endpoints' values rather than the sum.
+        """
+        totals = {}
+        for endpoint in self.endpoints:
+            for key, value in endpoint.get_stats().items():
+                if key in ("largest_batch", "send_queue_peak"):
+                    totals[key] = max(totals.get(key, 0), value)
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def handle_datagrams(self, endpoint, datagrams):
+        """Called with each batch of ``(data, address)`` pairs received.
+
+        With ``zero_copy=True`` the data is only valid until this method
+        returns (see `DatagramEndpoint`).  Replies may be sent with
+        ``endpoint.sendto`` or ``endpoint.send_batch``.  The default
+        implementation calls `handle_datagram` for every datagram.
+        """
+        for data, address in datagrams:
+            self.handle_datagram(endpoint, data, address)
+
+    def handle_datagram(self, endpoint, data, address):
+        """Override to handle one datagram received from ``address``."""
+        raise NotImplementedError()
+
+    def _make_endpoint(self, sock):
+        def callback(datagrams):
+            self.handle_datagrams(endpoint, datagrams)
+        endpoint = DatagramEndpoint(
+            sock, callback, io_loop=self.io_loop, max_batch=self.max_batch,
+            max_datagram_size=self.max_datagram_size,
+            max_send_queue=self.max_send_queue, zero_copy=self.zero_copy)
+        return endpoint
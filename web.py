@@ -1780,10 +1780,22 @@ class Application(httputil.HTTPServerConnectionDelegate):
 
         Note that after calling this method you still need to call
         ``IOLoop.current().start()`` to start the server.
+
+        If a ``group`` keyword argument (an `.IOLoopGroup`) is given, one
+        `.HTTPServer` is started on each of its IOLoops using
+        `.TCPServer.listen_on_group` and the list of servers is returned;
+        call ``group.start()`` instead of starting the current IOLoop.
+
+        .. versionchanged:: 4.3
+           Added the ``group`` argument.
         """
         # import is here rather than top level because HTTPServer
         # is not importable on appengine
         from tornado.httpserver import HTTPServer
+        group = kwargs.pop('group', None)
+        if group is not None:
+            return HTTPServer.listen_on_group(group, port, address, self,
+                                              **kwargs)
         server = HTTPServer(self, **kwargs)
         server.listen(port, address)
 
@@ -2269,6 +2281,22 @@ class StaticFileHandler(RequestHandler):
         self.set_header("Content-Length", content_length)
 
         if include_body:
+            if self._can_write_file():
+                # Send the headers first so the output transforms decide
+                # whether they need to see the body.
+                try:
+                    yield self.flush()
+                except iostream.StreamClosedError:
+                    return
+                if not any(transform._transforms_body()
+                           for transform in self._transforms):
+                    with open(self.absolute_path, "rb") as fileobj:
+                        try:
+                            yield self.request.connection.write_file(
+                                fileobj, start or 0, content_length)
+                        except iostream.StreamClosedError:
+                            pass
+                    return
             content = self.get_content(self.absolute_path, start, end)
             if isinstance(content, bytes):
                 content = [content]
@@ -2281,6 +2309,14 @@ class StaticFileHandler(RequestHandler):
         else:
             assert self.request.method == "HEAD"
 
+    def _can_write_file(self):
+        # The body can be sent straight from the file (with sendfile
+        # where possible) unless a subclass serves content from
+        # somewhere else or the connection can't do it.
+        return (self.get_content.__func__ is
+                StaticFileHandler.get_content.__func__ and
+                hasattr(self.request.connection, "write_file"))
+
     def compute_etag(self):
         """Sets the ``Etag`` header based on static url version.
 
@@ -2629,6 +2665,12 @@ class OutputTransform(object):
     def transform_chunk(self, chunk, finishing):
         return chunk
 
+    def _transforms_body(self):
+        # Whether transform_chunk may change the body after
+        # transform_first_chunk has run.  Assume it does unless the
+        # transform says otherwise.
+        return True
+
 
 class GZipContentEncoding(OutputTransform):
     """Applies the gzip content encoding to the response.
@@ -2679,6 +2721,9 @@ class GZipContentEncoding(OutputTransform):
                     del headers["Content-Length"]
         return status_code, headers, chunk
 
+    def _transforms_body(self):
+        return self._gzipping
+
     def transform_chunk(self, chunk, finishing):
         if self._gzipping:
             self._gzip_file.write(chunk)
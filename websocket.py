@@ -205,15 +205,24 @@ class WebSocketHandler(tornado.web.RequestHandler):
 
         If the connection is already closed, raises `WebSocketClosedError`.
 
+        Returns a `.Future` that producers can wait on to avoid buffering
+        without limit for a slow client: it resolves when the connection
+        can take more data (see `.BaseIOStream.wait_for_drain`; the
+        watermarks come from the ``write_high_water`` and
+        ``write_low_water`` arguments to `.HTTPServer`).
+
         .. versionchanged:: 3.2
            `WebSocketClosedError` was added (previously a closed connection
            would raise an `AttributeError`)
+
+        .. versionchanged:: 4.3
+           Returns a `.Future` which can be used for flow control.
         """
         if self.ws_connection is None:
             raise WebSocketClosedError()
         if isinstance(message, dict):
             message = tornado.escape.json_encode(message)
-        self.ws_connection.write_message(message, binary=binary)
+        return self.ws_connection.write_message(message, binary=binary)
 
     def select_subprotocol(self, subprotocols):
         """Invoked when a new WebSocket requests specific subprotocols.
@@ -673,6 +682,7 @@ class WebSocketProtocol13(WebSocketProtocol):
             self.stream.write(frame)
         except StreamClosedError:
             self._abort()
+        return self.stream.wait_for_drain()
 
     def write_message(self, message, binary=False):
         """Sends the given message to the client of this Web Socket."""
@@ -687,7 +697,7 @@ class WebSocketProtocol13(WebSocketProtocol):
         if self._compressor:
             message = self._compressor.compress(message)
             flags |= self.RSV1
-        self._write_frame(True, opcode, message, flags=flags)
+        return self._write_frame(True, opcode, message, flags=flags)
 
     def write_ping(self, data):
         """Send ping frame."""
@@ -968,8 +978,15 @@ class WebSocketClientConnection(simple_httpclient._HTTPConnection):
         self.connect_future.set_result(self)
 
     def write_message(self, message, binary=False):
-        """Sends a message to the WebSocket server."""
-        self.protocol.write_message(message, binary)
+        """Sends a message to the WebSocket server.
+
+        Returns a `.Future` for flow control, as in
+        `WebSocketHandler.write_message`.
+
+        .. versionchanged:: 4.3
+           Returns a `.Future`.
+        """
+        return self.protocol.write_message(message, binary)
 
     def read_message(self, callback=None):
         """Reads a message from the WebSocket server.